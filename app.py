@@ -1,33 +1,35 @@
 import streamlit as st
 import sqlite3
-from app.data.db import connect_database
-from app.data.schema import create_all_tables
-from app.services.user_service import migrate_users_from_file, ensure_default_admin
-from app.data.incidents import migrate_incidents_from_file
-from app.data.tickets import migrate_tickets_from_file, ensure_ticket_schema
-from app.data.datasets import migrate_datasets_metadata_from_file
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from app.services.bootstrap import bootstrap_database
+from app.services.metrics import start_metrics_server, touch_session, PAGE_VIEWS
+from app.services.anomaly import start_anomaly_job
+from app.services.retention import start_retention_job
+from app.services.backup import start_backup_job
+from app.services.maintenance import start_maintenance_job
+from app.services.notifications import start_notification_dispatcher
+from app.data.audit import set_actor
 
-conn = connect_database()
-create_all_tables(conn)
-conn.close()
+# Schema setup and CSV migrations (file-locked, once per process)
+bootstrap_database()
 
-# Migrate users from file
-migrate_users_from_file()
+# Prometheus scrape endpoint (once per process)
+start_metrics_server()
 
-# Ensure default admin exists if no admins are present
-ensure_default_admin()
+# Incident anomaly detection (background thread, once per process)
+start_anomaly_job()
 
-# Ensure tickets table has latest columns (e.g., subject)
-ensure_ticket_schema()
+# Archiving of old closed and soft-deleted rows (off unless RETENTION_INTERVAL is set)
+start_retention_job()
 
-# Migrate incidents from file
-migrate_incidents_from_file()
+# Online snapshots of the database (off unless BACKUP_INTERVAL is set)
+start_backup_job()
 
-# Migrate tickets from file
-migrate_tickets_from_file()
+# Checkpoints, ANALYZE and incremental vacuum while the database is quiet
+start_maintenance_job()
 
-# Migrate datasets_metadata from file
-migrate_datasets_metadata_from_file()
+# Webhook delivery of high-severity incident notifications (off when NOTIFY_POLL_SECONDS=0)
+start_notification_dispatcher()
 
 pg = st.navigation(
     [
@@ -38,6 +40,9 @@ pg = st.navigation(
         st.Page("pages/Cyber.py"),
         st.Page("pages/Tickets.py"),
         st.Page("pages/TicketAnalyzer.py"),
+        st.Page("pages/QueryStats.py"),
+        st.Page("pages/AuditLog.py"),
+        st.Page("pages/Maintenance.py"),
     ]
 )
 
@@ -46,6 +51,17 @@ st.sidebar.page_link("pages/Analyzer.py", label="AI Incident Analyzer")
 st.sidebar.page_link("pages/Cyber.py", label="Cyber Dashboard")
 st.sidebar.page_link("pages/Tickets.py", label="Tickets Dashboard")
 st.sidebar.page_link("pages/TicketAnalyzer.py", label="AI Ticket Analyzer")
+if st.session_state.get("user_role") == "admin":
+    st.sidebar.page_link("pages/QueryStats.py", label="Query Statistics")
+    st.sidebar.page_link("pages/AuditLog.py", label="Audit Log")
+    st.sidebar.page_link("pages/Maintenance.py", label="Database Maintenance")
 
+# Audited writes during this run are attributed to the logged-in user
+set_actor(st.session_state.get("username"))
+
+ctx = get_script_run_ctx()
+if ctx is not None:
+    touch_session(ctx.session_id)
+PAGE_VIEWS.inc(page=pg.url_path or "Dashboard")
 
 pg.run()
@@ -0,0 +1,519 @@
+"""
+Headless REST API over the data layer, for SOAR and other tooling.
+
+    python -m app.api create-token alice --name soar     # prints the token once
+    python -m app.api serve --port 8000 --workers 2
+
+Every /api request except /api/health needs "Authorization: Bearer <token>".
+The token acts as its user: incident and ticket queries apply that user's
+permissions policy, writes are audited under their name, and /api/users is
+admin-only, as is /metrics (the same text as the metrics server on
+METRICS_PORT, which only listens locally).
+
+    GET    /api/incidents?limit=100&before=<id>&status=Open   newest first
+    GET    /api/incidents/export?format=csv|ndjson            streamed
+    GET    /api/incidents/{id}
+    POST   /api/incidents          one object, or a list for a bulk insert
+    PATCH  /api/incidents          {"ids": [...], "filters": {...}, "fields": {...}}
+    PATCH  /api/incidents/{id}     {"field": value, ...}
+    DELETE /api/incidents/{id}     soft delete (restorable until retention runs)
+
+/api/tickets works the same, keyed by ticket_id. /api/datasets and
+/api/users are paged with page/page_size. List pages carry "next_before"
+(the cursor for the following page) and a Link header.
+
+GET responses have an ETag built from the table's cache generation and the
+caller's policy, so a client sending If-None-Match gets 304 without the
+rows being read. Responses over API_GZIP_MIN_BYTES are gzipped when the
+client accepts it.
+"""
+import argparse
+import contextlib
+import hashlib
+import inspect
+import json
+import os
+import time
+from urllib.parse import urlencode
+
+try:
+    from starlette.applications import Starlette
+    from starlette.exceptions import HTTPException
+    from starlette.middleware import Middleware
+    from starlette.middleware.gzip import GZipMiddleware
+    from starlette.responses import JSONResponse, Response, StreamingResponse, PlainTextResponse
+    from starlette.routing import Route
+except ImportError as e:
+    raise RuntimeError("The REST API needs `pip install starlette uvicorn`.") from e
+
+from app.data import aio
+from app.data.aio import offload
+from app.data.audit import set_actor
+from app.data.api_tokens import get_token_user, create_api_token, list_api_tokens, revoke_api_token
+from app.data.cache import get_generation
+from app.data.incidents import INCIDENT_COLUMNS
+from app.data.tickets import TICKET_COLUMNS
+from app.services.bootstrap import bootstrap_database
+from app.services.metrics import API_REQUESTS, API_REQUEST_SECONDS, render_metrics
+from app.services.user_service import register_user
+
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", "8000"))
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", "100"))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", "1000"))
+# Rows accepted by one bulk insert
+API_MAX_BULK = int(os.environ.get("API_MAX_BULK", "10000"))
+# Rows read per query while streaming an export
+API_EXPORT_PAGE_ROWS = int(os.environ.get("API_EXPORT_PAGE_ROWS", "5000"))
+API_GZIP_MIN_BYTES = int(os.environ.get("API_GZIP_MIN_BYTES", "1000"))
+
+# URL name -> how to reach it in the data layer
+RESOURCES = {
+    "incidents": {
+        "table": "cyber_incidents",
+        "key": "id",
+        "columns": INCIDENT_COLUMNS,
+        # The reporter is the token's user on create and never changes after
+        "update_columns": tuple(column for column in INCIDENT_COLUMNS if column != "reported_by"),
+        "key_type": int,
+        "page": aio.get_incidents_page,
+        "get": aio.get_incident_by_id,
+        "insert": aio.insert_incident,
+        "bulk_insert": aio.bulk_insert_incidents,
+        "bulk_update": aio.bulk_update_incidents,
+        "bulk_delete": aio.bulk_delete_incidents,
+    },
+    "tickets": {
+        "table": "it_tickets",
+        "key": "ticket_id",
+        "columns": TICKET_COLUMNS,
+        "update_columns": TICKET_COLUMNS,
+        "key_type": str,
+        "page": aio.get_tickets_page,
+        "get": aio.get_ticket_by_id,
+        "insert": aio.insert_ticket,
+        "bulk_insert": aio.bulk_insert_tickets,
+        "bulk_update": aio.bulk_update_tickets,
+        "bulk_delete": aio.bulk_delete_tickets,
+    },
+}
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+_get_token_user = offload(get_token_user)
+_get_generation = offload(get_generation)
+_register_user = offload(register_user)
+
+
+def _records(df):
+    """
+    DataFrame rows as JSON-ready dicts (NaN becomes None). pandas' C
+    encoder round-trip is several times faster than to_dict on object columns.
+    """
+    return json.loads(df.to_json(orient="records"))
+
+def _int_param(request, name, default, minimum=1, maximum=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPException(400, f"{name} must be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise HTTPException(400, f"{name} must be between {minimum} and {maximum}")
+    return value
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise HTTPException(400, "Request body must be JSON")
+
+async def _user(request):
+    """
+    The username behind the request's bearer token; raises 401 otherwise.
+    Also attributes audited writes made by this request to that user.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    username = await _get_token_user(token.strip()) if scheme.lower() == "bearer" else None
+    if username is None:
+        raise HTTPException(401, "Missing or invalid bearer token")
+    set_actor(username)
+    return username
+
+async def _admin(request):
+    username = await _user(request)
+    user = await aio.get_user_by_username(username)
+    if user is None or user["role"] != "admin":
+        raise HTTPException(403, "Administrators only")
+    return username
+
+async def _conditional(request, table, *parts):
+    """
+    ETag for a GET of `table` data; returns (etag, 304 response or None).
+    The generation changes on every write to the table, so a matching
+    If-None-Match proves the client's copy is current.
+    """
+    generation = await _get_generation(table)
+    raw = repr((table, generation, request.url.path, sorted(request.query_params.multi_items()), parts))
+    etag = f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return etag, Response(status_code=304, headers={"ETag": etag})
+    return etag, None
+
+def _cache_headers(etag):
+    # Clients may keep the body but must revalidate before using it
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def _filters(request, columns):
+    """
+    Column filters from the query string; repeat a parameter to match any of several values.
+    """
+    filters = {}
+    for column in request.query_params:
+        if column in columns or column == "id":
+            values = request.query_params.getlist(column)
+            filters[column] = values if len(values) > 1 else values[0]
+    return filters
+
+def _checked_fields(fields, columns):
+    if not isinstance(fields, dict) or not fields:
+        raise HTTPException(400, "Expected a JSON object of fields")
+    unknown = sorted(set(fields) - set(columns))
+    if unknown:
+        raise HTTPException(400, f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+def _bulk_target(resource, body):
+    """
+    The (ids, filters) of a bulk update body, checked: ids a list of keys of
+    the resource's key type, filters an object, and at least one of them.
+    """
+    ids, filters = body.get("ids"), body.get("filters")
+    if ids is None and filters is None:
+        raise HTTPException(400, 'Expected "ids" and/or "filters"')
+    key_type = resource["key_type"]
+    if ids is not None and (
+        not isinstance(ids, list)
+        or not all(isinstance(key, key_type) and not isinstance(key, bool) for key in ids)
+    ):
+        raise HTTPException(400, f'"ids" must be a list of {"integers" if key_type is int else "strings"}')
+    if filters is not None and not isinstance(filters, dict):
+        raise HTTPException(400, '"filters" must be a JSON object')
+    return ids, filters
+
+def _insert_fields(resource, fields):
+    """
+    Check `fields` against the resource's single-row insert signature: every
+    required argument present and not null. Bulk rows are held to the same rule.
+    """
+    parameters = inspect.signature(resource["insert"]).parameters.values()
+    required = [p.name for p in parameters if p.default is p.empty]
+    missing = [name for name in required if fields.get(name) is None]
+    if missing:
+        optional = [p.name for p in parameters if p.default is not p.empty]
+        raise HTTPException(
+            400, f"Missing {', '.join(missing)}. Required fields: {', '.join(required)}; optional: {', '.join(optional)}"
+        )
+    return fields
+
+
+def _list_rows(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        scope = await aio.get_policy(username, resource["table"])
+        etag, not_modified = await _conditional(request, resource["table"], scope.key)
+        if not_modified:
+            return not_modified
+        limit = _int_param(request, "limit", API_PAGE_SIZE, maximum=API_MAX_PAGE_SIZE)
+        before = _int_param(request, "before", None)
+        try:
+            df = await resource["page"](
+                scope=scope, filters=_filters(request, resource["columns"]), before_id=before, limit=limit
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        headers = _cache_headers(etag)
+        next_before = int(df["id"].iloc[-1]) if len(df) == limit else None
+        if next_before is not None:
+            query = [(k, v) for k, v in request.query_params.multi_items() if k != "before"]
+            headers["Link"] = f'<{request.url.path}?{urlencode(query + [("before", next_before)])}>; rel="next"'
+        return JSONResponse({"items": _records(df), "next_before": next_before}, headers=headers)
+    return endpoint
+
+def _export_rows(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        scope = await aio.get_policy(username, resource["table"])
+        etag, not_modified = await _conditional(request, resource["table"], scope.key)
+        if not_modified:
+            return not_modified
+        fmt = request.query_params.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPException(400, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        filters = _filters(request, resource["columns"])
+        # Validate the filters before the 200 status line goes out
+        try:
+            await resource["page"](scope=scope, filters=filters, limit=1)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+
+        async def body():
+            # One short read per page, so no transaction stays open while the client downloads
+            before = None
+            first = True
+            while True:
+                df = await resource["page"](scope=scope, filters=filters, before_id=before, limit=API_EXPORT_PAGE_ROWS)
+                if df.empty:
+                    break
+                if fmt == "csv":
+                    yield df.to_csv(index=False, header=first)
+                else:
+                    yield df.to_json(orient="records", lines=True).rstrip("\n") + "\n"
+                first = False
+                before = int(df["id"].iloc[-1])
+                if len(df) < API_EXPORT_PAGE_ROWS:
+                    break
+
+        headers = _cache_headers(etag)
+        headers["Content-Disposition"] = f'attachment; filename="{name}.{fmt}"'
+        return StreamingResponse(body(), media_type=EXPORT_FORMATS[fmt], headers=headers)
+    return endpoint
+
+def _get_row(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        scope = await aio.get_policy(username, resource["table"])
+        etag, not_modified = await _conditional(request, resource["table"], scope.key)
+        if not_modified:
+            return not_modified
+        row = await resource["get"](request.path_params["key"], scope=scope)
+        if row is None:
+            raise HTTPException(404, f"No such {name[:-1]}")
+        return JSONResponse(dict(row), headers=_cache_headers(etag))
+    return endpoint
+
+def _create_rows(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        body = await _json_body(request)
+        if isinstance(body, list):
+            if len(body) > API_MAX_BULK:
+                raise HTTPException(413, f"At most {API_MAX_BULK} rows per request")
+            rows = [_insert_fields(resource, _checked_fields(row, resource["columns"])) for row in body]
+            if name == "incidents":
+                # The token's user is the reporter, whatever the body says
+                rows = [{**row, "reported_by": username} for row in rows]
+            created = await resource["bulk_insert"](rows)
+            return JSONResponse({"created": created}, status_code=201)
+
+        fields = _insert_fields(resource, _checked_fields(body, resource["columns"]))
+        if name == "incidents":
+            fields = {**fields, "reported_by": username}
+        try:
+            inspect.signature(resource["insert"]).bind(**fields)
+        except TypeError as e:
+            raise HTTPException(400, f"Invalid fields: {e}")
+        row_id = await resource["insert"](**fields)
+        return JSONResponse({"id": row_id}, status_code=201)
+    return endpoint
+
+def _update_rows(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        body = await _json_body(request)
+        if not isinstance(body, dict):
+            raise HTTPException(400, 'Expected {"ids": [...], "filters": {...}, "fields": {...}}')
+        ids, filters = _bulk_target(resource, body)
+        fields = _checked_fields(body.get("fields"), resource["update_columns"])
+        scope = await aio.get_policy(username, resource["table"])
+        try:
+            updated = await resource["bulk_update"](ids, filters, scope, **fields)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        return JSONResponse({"updated": updated})
+    return endpoint
+
+def _update_row(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        fields = _checked_fields(await _json_body(request), resource["update_columns"])
+        scope = await aio.get_policy(username, resource["table"])
+        updated = await resource["bulk_update"]([request.path_params["key"]], None, scope, **fields)
+        if not updated:
+            raise HTTPException(404, f"No such {name[:-1]}")
+        return JSONResponse({"updated": updated})
+    return endpoint
+
+def _delete_row(name):
+    resource = RESOURCES[name]
+
+    async def endpoint(request):
+        username = await _user(request)
+        scope = await aio.get_policy(username, resource["table"])
+        deleted = await resource["bulk_delete"]([request.path_params["key"]], scope=scope, soft=True)
+        if not deleted:
+            raise HTTPException(404, f"No such {name[:-1]}")
+        return Response(status_code=204)
+    return endpoint
+
+
+async def list_datasets(request):
+    await _user(request)
+    etag, not_modified = await _conditional(request, "datasets_metadata")
+    if not_modified:
+        return not_modified
+    page = _int_param(request, "page", 1)
+    page_size = _int_param(request, "page_size", API_PAGE_SIZE, maximum=API_MAX_PAGE_SIZE)
+    df = await aio.get_all_datasets_metadata()
+    items = _records(df.iloc[(page - 1) * page_size:page * page_size])
+    return JSONResponse({"items": items, "total": len(df), "page": page}, headers=_cache_headers(etag))
+
+async def get_dataset(request):
+    await _user(request)
+    etag, not_modified = await _conditional(request, "datasets_metadata")
+    if not_modified:
+        return not_modified
+    row = await aio.get_dataset_metadata(request.path_params["key"])
+    if row is None:
+        raise HTTPException(404, "No such dataset")
+    return JSONResponse(dict(row), headers=_cache_headers(etag))
+
+async def list_users(request):
+    await _admin(request)
+    etag, not_modified = await _conditional(request, "users")
+    if not_modified:
+        return not_modified
+    page = _int_param(request, "page", 1)
+    page_size = _int_param(request, "page_size", API_PAGE_SIZE, maximum=API_MAX_PAGE_SIZE)
+    df, total = await aio.search_users(
+        request.query_params.get("search"), request.query_params.get("role"), page, page_size
+    )
+    return JSONResponse({"items": _records(df), "total": total, "page": page}, headers=_cache_headers(etag))
+
+async def create_user(request):
+    await _admin(request)
+    body = await _json_body(request)
+    if not isinstance(body, dict) or not body.get("username") or not body.get("password"):
+        raise HTTPException(400, 'Expected {"username": ..., "password": ..., "role": ...}')
+    ok, message = await _register_user(body["username"], body["password"], body.get("role", "user"))
+    return JSONResponse({"message": message}, status_code=201 if ok else 409)
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+async def metrics(request):
+    await _admin(request)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+async def _http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
+class _MetricsMiddleware:
+    """
+    Count and time requests by route template (not raw path, which would
+    give every incident id its own series).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            API_REQUESTS.inc(method=scope["method"], route=path, status=str(status[0]))
+            API_REQUEST_SECONDS.observe(time.perf_counter() - start, route=path)
+
+
+def _routes():
+    routes = [
+        Route("/api/health", health),
+        Route("/metrics", metrics),
+        Route("/api/datasets", list_datasets),
+        Route("/api/datasets/{key:int}", get_dataset),
+        Route("/api/users", list_users, methods=["GET"]),
+        Route("/api/users", create_user, methods=["POST"]),
+    ]
+    for name, resource in RESOURCES.items():
+        key = "{key:int}" if resource["key"] == "id" else "{key}"
+        routes += [
+            Route(f"/api/{name}", _list_rows(name), methods=["GET"]),
+            Route(f"/api/{name}", _create_rows(name), methods=["POST"]),
+            Route(f"/api/{name}", _update_rows(name), methods=["PATCH"]),
+            Route(f"/api/{name}/export", _export_rows(name), methods=["GET"]),
+            Route(f"/api/{name}/{key}", _get_row(name), methods=["GET"]),
+            Route(f"/api/{name}/{key}", _update_row(name), methods=["PATCH"]),
+            Route(f"/api/{name}/{key}", _delete_row(name), methods=["DELETE"]),
+        ]
+    return routes
+
+@contextlib.asynccontextmanager
+async def _lifespan(app):
+    await offload(bootstrap_database)()
+    yield
+
+app = Starlette(
+    routes=_routes(),
+    middleware=[Middleware(_MetricsMiddleware), Middleware(GZipMiddleware, minimum_size=API_GZIP_MIN_BYTES)],
+    exception_handlers={HTTPException: _http_error},
+    lifespan=_lifespan,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the REST API and manage its tokens.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the API with uvicorn")
+    serve.add_argument("--host", default=API_HOST)
+    serve.add_argument("--port", type=int, default=API_PORT)
+    serve.add_argument("--workers", type=int, default=1)
+    create = commands.add_parser("create-token", help="create a token acting as USERNAME")
+    create.add_argument("username")
+    create.add_argument("--name", help="what the token is for")
+    commands.add_parser("list-tokens", help="list tokens (never their values)")
+    revoke = commands.add_parser("revoke-token", help="revoke a token by id")
+    revoke.add_argument("id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            import uvicorn
+        except ImportError as e:
+            raise RuntimeError("Serving the REST API needs `pip install uvicorn`.") from e
+        uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers, access_log=False)
+    elif args.command == "create-token":
+        bootstrap_database()
+        print(create_api_token(args.username, args.name))
+    elif args.command == "list-tokens":
+        print(list_api_tokens().to_string(index=False))
+    elif args.command == "revoke-token":
+        print("Revoked." if revoke_api_token(args.id) else "No active token with that id.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from app.data.db import connect_database, read_frame
+
+def get_ai_usage(username, day):
+    """
+    Return {"requests", "prompt_tokens", "response_tokens"} used by `username`
+    on `day` (YYYY-MM-DD), all zero if there is no row yet.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT requests, prompt_tokens, response_tokens FROM ai_usage
+        WHERE username = ? AND day = ?
+    """, (username, day))
+    row = cursor.fetchone()
+    conn.close()
+    if row is None:
+        return {"requests": 0, "prompt_tokens": 0, "response_tokens": 0}
+    return {"requests": row[0], "prompt_tokens": row[1], "response_tokens": row[2]}
+
+def record_ai_usage(username, day, prompt_tokens, response_tokens):
+    """
+    Add one request's tokens to the user's total for `day`.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO ai_usage (username, day, requests, prompt_tokens, response_tokens)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT(username, day) DO UPDATE SET
+            requests = ai_usage.requests + 1,
+            prompt_tokens = ai_usage.prompt_tokens + excluded.prompt_tokens,
+            response_tokens = ai_usage.response_tokens + excluded.response_tokens
+    """, (username, day, prompt_tokens, response_tokens))
+    conn.commit()
+    conn.close()
+
+def list_ai_usage(day):
+    """
+    Return every user's usage on `day` as a DataFrame, heaviest first.
+    """
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, """
+        SELECT username, requests, prompt_tokens, response_tokens,
+               prompt_tokens + response_tokens AS total_tokens
+        FROM ai_usage WHERE day = ?
+        ORDER BY total_tokens DESC
+    """, (day,))
+    conn.close()
+    return df
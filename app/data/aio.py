@@ -0,0 +1,147 @@
+"""
+Async variants of the data-layer functions.
+
+sqlite3 is blocking, so each call is offloaded to a shared thread pool;
+SQLite releases the GIL while stepping statements, so independent reads
+genuinely overlap. Usage from async code:
+
+    incidents, tickets = await asyncio.gather(aio.get_all_incidents(), aio.get_all_tickets())
+
+and from synchronous code, when several independent loads are needed at
+once (benchmarks/bench_async.py compares it with serial loads):
+
+    results = run_concurrently(incidents=get_all_incidents, tickets=get_all_tickets)
+"""
+import asyncio
+import contextvars
+import inspect
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.data import incidents, tickets, datasets, users, changes, alerts, similarity, ai_usage, permissions, audit, archive, notifications
+
+MAX_WORKERS = int(os.environ.get("DB_ASYNC_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="db-async")
+
+def offload(func):
+    """
+    Wrap a blocking function as a coroutine function run on the DB thread pool.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so e.g. the audit actor carries over
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+    return wrapper
+
+# Incidents
+get_all_incidents = offload(incidents.get_all_incidents)
+get_incidents_page = offload(incidents.get_incidents_page)
+get_incidents_by_ids = offload(incidents.get_incidents_by_ids)
+get_incidents_after = offload(incidents.get_incidents_after)
+get_incident_by_id = offload(incidents.get_incident_by_id)
+insert_incident = offload(incidents.insert_incident)
+update_incident = offload(incidents.update_incident)
+update_incident_status = offload(incidents.update_incident_status)
+delete_incident = offload(incidents.delete_incident)
+restore_incident = offload(incidents.restore_incident)
+get_deleted_incidents = offload(incidents.get_deleted_incidents)
+bulk_insert_incidents = offload(incidents.bulk_insert_incidents)
+bulk_update_incidents = offload(incidents.bulk_update_incidents)
+bulk_delete_incidents = offload(incidents.bulk_delete_incidents)
+
+# Tickets
+get_all_tickets = offload(tickets.get_all_tickets)
+get_tickets_page = offload(tickets.get_tickets_page)
+get_tickets_by_row_ids = offload(tickets.get_tickets_by_row_ids)
+get_ticket_by_id = offload(tickets.get_ticket_by_id)
+insert_ticket = offload(tickets.insert_ticket)
+update_ticket = offload(tickets.update_ticket)
+update_ticket_status = offload(tickets.update_ticket_status)
+delete_ticket = offload(tickets.delete_ticket)
+restore_ticket = offload(tickets.restore_ticket)
+get_deleted_tickets = offload(tickets.get_deleted_tickets)
+bulk_insert_tickets = offload(tickets.bulk_insert_tickets)
+bulk_update_tickets = offload(tickets.bulk_update_tickets)
+bulk_delete_tickets = offload(tickets.bulk_delete_tickets)
+get_ticket_analysis = offload(tickets.get_ticket_analysis)
+save_ticket_analysis = offload(tickets.save_ticket_analysis)
+find_similar_tickets = offload(similarity.find_similar_tickets)
+find_similar_text = offload(similarity.find_similar_text)
+
+# Datasets
+get_all_datasets_metadata = offload(datasets.get_all_datasets_metadata)
+get_dataset_metadata = offload(datasets.get_dataset_metadata)
+insert_dataset_metadata = offload(datasets.insert_dataset_metadata)
+
+# Users
+get_user_by_username = offload(users.get_user_by_username)
+insert_user = offload(users.insert_user)
+list_users = offload(users.list_users)
+search_users = offload(users.search_users)
+update_user_role = offload(users.update_user_role)
+
+# Permissions
+get_policy = offload(permissions.get_policy)
+list_roles = offload(permissions.list_roles)
+list_teams = offload(permissions.list_teams)
+list_grants = offload(permissions.list_grants)
+
+# Change feed
+changes_since = offload(changes.changes_since)
+latest_change_seq = offload(changes.latest_change_seq)
+
+# Alerts
+get_alerts = offload(alerts.get_alerts)
+update_alert_status = offload(alerts.update_alert_status)
+
+async def gather_named(**loaders):
+    """
+    Await zero-argument callables (sync or async) concurrently; returns a dict
+    of their results keyed like `loaders`.
+    """
+    names = list(loaders)
+    coros = []
+    for loader in loaders.values():
+        result = loader if inspect.iscoroutinefunction(loader) else offload(loader)
+        coros.append(result())
+    results = await asyncio.gather(*coros)
+    return dict(zip(names, results))
+
+def run_concurrently(**loaders):
+    """
+    Run independent loads concurrently from synchronous code and return
+    {name: result}. Exceptions propagate to the caller.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_named(**loaders))
+    # Already inside an event loop: fall back to plain threads
+    futures = {name: _executor.submit(loader) for name, loader in loaders.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+# AI usage
+get_ai_usage = offload(ai_usage.get_ai_usage)
+record_ai_usage = offload(ai_usage.record_ai_usage)
+list_ai_usage = offload(ai_usage.list_ai_usage)
+
+# Audit log
+query_audit_log = offload(audit.query_audit_log)
+list_audit_actors = offload(audit.list_audit_actors)
+
+# Archive
+search_archive = offload(archive.search_archive)
+archive_stats = offload(archive.archive_stats)
+
+# Notification outbox
+list_destinations = offload(notifications.list_destinations)
+claim_due = offload(notifications.claim_due)
+mark_delivered = offload(notifications.mark_delivered)
+reschedule = offload(notifications.reschedule)
+release = offload(notifications.release)
+dead_letter = offload(notifications.dead_letter)
+purge_delivered = offload(notifications.purge_delivered)
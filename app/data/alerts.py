@@ -0,0 +1,91 @@
+from app.data.db import connect_database, read_frame
+
+ANOMALY_JOB = "incident_anomaly"
+
+def load_anomaly_state(name=ANOMALY_JOB):
+    """
+    Return (last_id, closed_through, stats, pending) for the anomaly job.
+    stats and pending are DataFrames; closed_through is None before the first run.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_id, closed_through FROM job_watermarks WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    stats = read_frame(conn, "SELECT incident_type, severity, mean, var, hours FROM anomaly_stats")
+    pending = read_frame(conn, "SELECT incident_type, severity, hour, count FROM anomaly_pending")
+    conn.close()
+    if row is None:
+        return 0, None, stats, pending
+    return row[0], row[1], stats, pending
+
+def save_anomaly_run(last_id, closed_through, stats, pending, alerts, name=ANOMALY_JOB):
+    """
+    Persist one run of the anomaly job in a single transaction: the new
+    watermark, the full statistics and pending-hour tables, and any alerts.
+    Alerts for a bucket already flagged are updated in place.
+    stats: (incident_type, severity, mean, var, hours) tuples
+    pending: (incident_type, severity, hour, count) tuples
+    alerts: (incident_type, severity, bucket_start, observed, expected, zscore) tuples
+    """
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO job_watermarks (name, last_id, closed_through) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id, closed_through = excluded.closed_through
+        """, (name, last_id, closed_through))
+        cursor.execute("DELETE FROM anomaly_stats")
+        cursor.executemany("""
+            INSERT INTO anomaly_stats (incident_type, severity, mean, var, hours) VALUES (?, ?, ?, ?, ?)
+        """, stats)
+        cursor.execute("DELETE FROM anomaly_pending")
+        cursor.executemany("""
+            INSERT INTO anomaly_pending (incident_type, severity, hour, count) VALUES (?, ?, ?, ?)
+        """, pending)
+        cursor.executemany("""
+            INSERT INTO alerts (incident_type, severity, bucket_start, observed, expected, zscore)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(incident_type, severity, bucket_start) DO UPDATE SET
+                observed = excluded.observed, expected = excluded.expected, zscore = excluded.zscore
+        """, alerts)
+        conn.commit()
+    finally:
+        conn.close()
+
+def reset_anomaly_state(name=ANOMALY_JOB):
+    """
+    Forget the job's watermark and statistics so the next run re-reads every
+    incident. Existing alerts are kept.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM job_watermarks WHERE name = ?", (name,))
+    cursor.execute("DELETE FROM anomaly_stats")
+    cursor.execute("DELETE FROM anomaly_pending")
+    conn.commit()
+    conn.close()
+
+def get_alerts(status="open", limit=100):
+    """
+    Return the newest alerts (by bucket) as a DataFrame, optionally only those with `status`.
+    """
+    query = "SELECT * FROM alerts"
+    params = []
+    if status:
+        query += " WHERE status = ?"
+        params.append(status)
+    query += " ORDER BY bucket_start DESC, zscore DESC LIMIT ?"
+    params.append(limit)
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, query, params)
+    conn.close()
+    return df
+
+def update_alert_status(alert_id, status):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE alerts SET status = ? WHERE id = ?", (status, alert_id))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
@@ -0,0 +1,63 @@
+"""
+Bearer tokens for the REST API (app/api.py). A token is shown once when it
+is created; the table keeps only its SHA-256, so a leaked database does not
+leak working tokens.
+"""
+import hashlib
+import secrets
+
+from app.data.db import connect_database, read_frame, utc_now
+from app.data.cache import cached
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def create_api_token(username, name=None):
+    """
+    Create a token acting as `username` and return it; it cannot be read back later.
+    """
+    token = secrets.token_urlsafe(32)
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO api_tokens (token_hash, username, name, created_at) VALUES (?, ?, ?, ?)",
+        (_hash(token), username, name, utc_now()),
+    )
+    conn.commit()
+    conn.close()
+    return token
+
+def revoke_api_token(token_id):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(
+        "UPDATE api_tokens SET revoked_at = ? WHERE id = ? AND revoked_at IS NULL", (utc_now(), token_id)
+    )
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def list_api_tokens():
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, "SELECT id, username, name, created_at, revoked_at FROM api_tokens ORDER BY id")
+    conn.close()
+    return df
+
+def _active_tokens():
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT token_hash, username FROM api_tokens WHERE revoked_at IS NULL")
+    tokens = dict(cursor.fetchall())
+    conn.close()
+    return tokens
+
+def get_token_user(token):
+    """
+    The username a token acts as, or None for an unknown or revoked token.
+    Active tokens are cached per process until api_tokens changes.
+    """
+    if not token:
+        return None
+    return cached("api_tokens", _active_tokens).get(_hash(token))
@@ -0,0 +1,161 @@
+"""
+Archive tables for incidents and tickets moved out of the hot tables by the
+retention job (app/services/retention.py).
+
+On SQLite the archive is a separate file (ARCHIVE_DB_PATH, by default next
+to the database) attached to the connection as schema "archive"; on
+PostgreSQL it is the "archive" schema of the same database. Either way the
+tables are archive.cyber_incidents and archive.it_tickets, with the live
+table's columns plus archived_at, and nothing on the hot path reads them.
+"""
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from app.data import db
+from app.data.db import connect_database, get_backend, read_frame, table_columns, build_where_clause, scope_clause, utc_now
+from app.data.similarity import unindex_tickets
+
+ARCHIVE_TABLES = ("cyber_incidents", "it_tickets")
+# Columns matched by the free-text archive search
+SEARCH_COLUMNS = {
+    "cyber_incidents": ("incident_type", "description"),
+    "it_tickets": ("ticket_id", "subject", "description"),
+}
+# Extra cleanup run on the writer's cursor before rows leave a live table
+BEFORE_ARCHIVE = {"it_tickets": unindex_tickets}
+# Rows moved per transaction, and the pause between batches that lets
+# interactive writers take the write lock
+ARCHIVE_BATCH_ROWS = int(os.environ.get("ARCHIVE_BATCH_ROWS", "500"))
+ARCHIVE_BATCH_PAUSE = float(os.environ.get("ARCHIVE_BATCH_PAUSE", "0.05"))
+
+
+def archive_path():
+    if os.environ.get("ARCHIVE_DB_PATH"):
+        return Path(os.environ["ARCHIVE_DB_PATH"])
+    return db.DB_PATH.with_name(f"{db.DB_PATH.stem}_archive{db.DB_PATH.suffix}")
+
+def connect_archive(read_only=False):
+    """
+    Connect to the database with the archive attached as schema "archive".
+    """
+    conn = connect_database(read_only=read_only)
+    get_backend().attach_archive(conn, archive_path(), read_only=read_only)
+    return conn
+
+def _create_index(cursor, name, table, columns, unique=False):
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    # SQLite qualifies the index name, PostgreSQL the table
+    if get_backend().name == "sqlite":
+        cursor.execute(f"CREATE {kind} IF NOT EXISTS archive.{name} ON {table}({columns})")
+    else:
+        cursor.execute(f"CREATE {kind} IF NOT EXISTS {name} ON archive.{table}({columns})")
+
+def _archive_columns(cursor, table):
+    cursor.execute(f"SELECT * FROM archive.{table} WHERE 1 = 0")
+    return [column[0] for column in cursor.description]
+
+def ensure_archive_tables():
+    """
+    Create the archive tables, and add any column the live tables have
+    gained since. Safe to run repeatedly.
+    """
+    conn = connect_archive()
+    cursor = conn.cursor()
+    for table in ARCHIVE_TABLES:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM {table} WHERE 1 = 0")
+        archived = _archive_columns(cursor, table)
+        for column in table_columns(conn, table) + ["archived_at"]:
+            if column not in archived:
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column} TEXT")
+        # Re-archiving the same id (after an interrupted run) is then a no-op
+        _create_index(cursor, f"idx_archive_{table}_id", table, "id", unique=True)
+        _create_index(cursor, f"idx_archive_{table}_archived_at", table, "archived_at")
+    conn.commit()
+    conn.close()
+
+def count_archivable(table, where, params):
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+def archive_rows(table, where, params, batch_rows=ARCHIVE_BATCH_ROWS, pause=ARCHIVE_BATCH_PAUSE):
+    """
+    Move the `table` rows matching `where` into archive.`table`, `batch_rows`
+    at a time. Each batch is copied and committed, then deleted from the
+    live table and committed, so an interrupted run leaves rows in both
+    places rather than in neither; the next run skips the copies it already
+    made. Returns the number of rows moved.
+    """
+    conn = connect_archive()
+    moved = 0
+    try:
+        cursor = conn.cursor()
+        column_list = ", ".join(table_columns(conn, table))
+        while True:
+            cursor.execute(f"SELECT id FROM {table} WHERE {where} ORDER BY id LIMIT ?", list(params) + [batch_rows])
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            id_clause = f"id IN ({', '.join('?' for _ in ids)})"
+            cursor.execute(f"""
+                INSERT INTO archive.{table} ({column_list}, archived_at)
+                SELECT {column_list}, ? FROM {table} WHERE {id_clause}
+                ON CONFLICT DO NOTHING
+            """, [utc_now()] + ids)
+            conn.commit()
+            if table in BEFORE_ARCHIVE:
+                BEFORE_ARCHIVE[table](cursor, ids)
+            cursor.execute(f"DELETE FROM {table} WHERE {id_clause}", ids)
+            conn.commit()
+            moved += len(ids)
+            if len(ids) < batch_rows:
+                break
+            time.sleep(pause)
+    finally:
+        conn.close()
+    return moved
+
+def search_archive(table, text=None, filters=None, scope=None, limit=200):
+    """
+    Search archived rows of `table`, newest first, as a DataFrame. `text` is
+    matched as a substring against SEARCH_COLUMNS, `filters` work like the
+    bulk operations' ({column: value or list}) and `scope` (a permissions
+    Policy) applies as it does to live rows.
+    """
+    conn = connect_archive(read_only=True)
+    try:
+        where, params = build_where_clause(filters, table_columns(conn, table))
+        clauses = [where] if where else []
+        if text:
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS[table]) + ")")
+            params += [f"%{escaped}%"] * len(SEARCH_COLUMNS[table])
+        clauses.append(scope_clause(scope, params))
+        params.append(int(limit))
+        return read_frame(
+            conn, f"SELECT * FROM archive.{table} WHERE {' AND '.join(clauses)} ORDER BY id DESC LIMIT ?", params
+        )
+    finally:
+        conn.close()
+
+def archive_stats():
+    """
+    Live, soft-deleted and archived row counts per table, as a DataFrame.
+    """
+    conn = connect_archive(read_only=True)
+    cursor = conn.cursor()
+    rows = []
+    for table in ARCHIVE_TABLES:
+        cursor.execute(f"SELECT COUNT(*), COUNT(deleted_at) FROM {table}")
+        total, deleted = cursor.fetchone()
+        cursor.execute(f"SELECT COUNT(*), MAX(archived_at) FROM archive.{table}")
+        archived, last_archived = cursor.fetchone()
+        rows.append((table, total - deleted, deleted, archived, last_archived))
+    conn.close()
+    return pd.DataFrame(rows, columns=["table", "live", "soft_deleted", "archived", "last_archived_at"])
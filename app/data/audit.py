@@ -0,0 +1,257 @@
+"""
+Append-only audit log of who created, updated or deleted incidents and
+tickets, with the before/after value of every field that changed.
+
+The write functions in incidents.py and tickets.py read the affected rows
+inside their own transaction and call record_write() once they have
+committed. Entries go onto an in-process queue; a daemon writer thread
+inserts them in batches of up to AUDIT_BATCH_SIZE, or whatever arrived
+within AUDIT_FLUSH_SECONDS, so an audited write costs the caller one
+indexed SELECT instead of a second commit. flush() waits for everything
+queued so far (it also runs at interpreter exit); call it before the
+database goes away, e.g. at the end of a benchmark's temporary directory.
+Entries that still cannot be written after WRITE_ATTEMPTS tries are kept
+in memory and returned by flush() and dropped_entries().
+
+The acting user is taken from set_actor(), which app.py calls on every
+script run with the logged-in username; writes outside a session (CSV
+migrations, CLI tools, jobs) are recorded as SYSTEM_ACTOR.
+"""
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timezone
+
+from app.data.db import connect_database, read_frame
+from app.services.metrics import AUDIT_EVENTS, AUDIT_BATCH_ROWS
+
+# Set AUDIT_LOG=0 to stop recording (nothing is read or queued)
+ENABLED = os.environ.get("AUDIT_LOG", "1") != "0"
+# Set AUDIT_ASYNC=0 to insert entries on the caller's thread as each write records them
+ASYNC = os.environ.get("AUDIT_ASYNC", "1") != "0"
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_SECONDS = float(os.environ.get("AUDIT_FLUSH_SECONDS", "1.0"))
+# Entries waiting beyond this are written synchronously by whoever records them
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", "10000"))
+WRITE_ATTEMPTS = 3
+
+SYSTEM_ACTOR = "system"
+ACTIONS = ("create", "update", "delete")
+# Column identifying an audited row to people, per table
+ENTITY_KEYS = {"cyber_incidents": "id", "it_tickets": "ticket_id"}
+# Bookkeeping columns left out of the diffs
+UNAUDITED_FIELDS = {"id", "created_at"}
+
+_actor = contextvars.ContextVar("audit_actor", default=None)
+_queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_FLUSH = object()
+_writer = None
+_writer_lock = threading.Lock()
+# Entries that could not be written, oldest first (the newest AUDIT_QUEUE_SIZE)
+_dropped = deque(maxlen=AUDIT_QUEUE_SIZE)
+_dropped_total = 0
+
+
+def set_actor(username):
+    """
+    Attribute audited writes made from the current thread (or async task) to `username`.
+    """
+    _actor.set(username or None)
+
+def current_actor():
+    return _actor.get() or SYSTEM_ACTOR
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def diff(before, after):
+    """
+    {field: [before, after]} for every field whose value differs between two
+    row dicts; pass None for the missing side of a create or delete.
+    """
+    before = before or {}
+    after = after or {}
+    return {
+        field: [before.get(field), after.get(field)]
+        for field in dict.fromkeys([*before, *after])
+        if field not in UNAUDITED_FIELDS and before.get(field) != after.get(field)
+    }
+
+def capture(cursor, entity, where, params):
+    """
+    The `entity` rows matching `where` as dicts, read on the writer's cursor
+    before it changes them. Empty when auditing is off.
+    """
+    if not ENABLED:
+        return []
+    cursor.execute(f"SELECT * FROM {entity} WHERE {where}", params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def record_write(entity, action, rows, fields=None):
+    """
+    Queue one audit entry per row. `rows` are the created rows for "create",
+    otherwise the rows as capture() read them before the write; `fields` are
+    the values an "update" set. Updates that changed nothing are not logged.
+    """
+    if not ENABLED or not rows:
+        return
+    key = ENTITY_KEYS[entity]
+    actor = current_actor()
+    occurred_at = _timestamp(datetime.now(timezone.utc))
+    entries = []
+    for row in rows:
+        if action == "create":
+            changes = diff(None, row)
+        elif action == "update":
+            changes = diff(row, {**row, **fields})
+        else:
+            changes = diff(row, None)
+        if changes:
+            entries.append((
+                occurred_at, actor, action, entity, str(row[key]), json.dumps(changes, default=str)
+            ))
+    if entries and not ASYNC:
+        _write(entries)
+        AUDIT_EVENTS.inc(len(entries), result="direct")
+        return
+    for entry in entries:
+        _enqueue(entry)
+
+def _enqueue(entry):
+    _start_writer()
+    try:
+        _queue.put_nowait(entry)
+        AUDIT_EVENTS.inc(result="queued")
+    except queue.Full:
+        # The writer is behind (e.g. the database is locked); don't lose the entry
+        _write([entry])
+        AUDIT_EVENTS.inc(result="direct")
+
+def _write(entries):
+    for attempt in range(1, WRITE_ATTEMPTS + 1):
+        try:
+            conn = connect_database()
+            try:
+                conn.executemany("""
+                    INSERT INTO audit_log (occurred_at, actor, action, entity, entity_id, changes)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, entries)
+                conn.commit()
+            finally:
+                conn.close()
+            AUDIT_BATCH_ROWS.observe(len(entries))
+            return True
+        except Exception as e:
+            if attempt == WRITE_ATTEMPTS:
+                global _dropped_total
+                _dropped.extend(entries)
+                _dropped_total += len(entries)
+                AUDIT_EVENTS.inc(len(entries), result="dropped")
+                described = ", ".join(f"{entry[3]} {entry[4]} {entry[2]}" for entry in entries[:5])
+                more = f" and {len(entries) - 5} more" if len(entries) > 5 else ""
+                print(f"Audit log write failed ({e}); dropped {described}{more}")
+                return False
+            time.sleep(0.1 * 2 ** attempt)
+
+def _run_writer():
+    while True:
+        batch = []
+        item = _queue.get()
+        taken = 1
+        deadline = time.monotonic() + AUDIT_FLUSH_SECONDS
+        while item is not _FLUSH:
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= AUDIT_BATCH_SIZE or remaining <= 0:
+                break
+            try:
+                item = _queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            taken += 1
+        if batch:
+            _write(batch)
+        for _ in range(taken):
+            _queue.task_done()
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            thread = threading.Thread(target=_run_writer, name="audit-writer", daemon=True)
+            thread.start()
+            _writer = thread
+
+def flush():
+    """
+    Block until every entry queued so far has been written. Returns the
+    entries that were dropped meanwhile because the write failed, as
+    (occurred_at, actor, action, entity, entity_id, changes) tuples.
+    """
+    if _writer is None:
+        return []
+    before = _dropped_total
+    _queue.put(_FLUSH)
+    _queue.join()
+    dropped = min(_dropped_total - before, len(_dropped))
+    return list(_dropped)[len(_dropped) - dropped:]
+
+def dropped_entries():
+    """
+    Every entry this process failed to write (the newest AUDIT_QUEUE_SIZE).
+    """
+    return list(_dropped)
+
+atexit.register(flush)
+
+
+def query_audit_log(actor=None, entity=None, entity_id=None, action=None, since=None, until=None, limit=200):
+    """
+    Audit entries matching every given filter, newest first, as a DataFrame.
+    `since` is inclusive and `until` exclusive; both take a date, datetime or
+    ISO string. `changes` holds the JSON {field: [before, after]} diff.
+    """
+    clauses = []
+    params = []
+    for column, value in (("actor", actor), ("entity", entity), ("entity_id", entity_id), ("action", action)):
+        if value:
+            clauses.append(f"{column} = ?")
+            params.append(str(value))
+    if since is not None:
+        clauses.append("occurred_at >= ?")
+        params.append(_timestamp(since))
+    if until is not None:
+        clauses.append("occurred_at < ?")
+        params.append(_timestamp(until))
+    where = " AND ".join(clauses) or "1 = 1"
+    params.append(int(limit))
+
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, f"""
+        SELECT id, occurred_at, actor, action, entity, entity_id, changes FROM audit_log
+        WHERE {where} ORDER BY occurred_at DESC, id DESC LIMIT ?
+    """, params)
+    conn.close()
+    return df
+
+def list_audit_actors():
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT actor FROM audit_log ORDER BY actor")
+    actors = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return actors
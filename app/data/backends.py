@@ -0,0 +1,257 @@
+import re
+import sqlite3
+import pandas as pd
+
+class SQLiteBackend:
+    """
+    Default backend: one sqlite3 connection per call, as the data layer has
+    always done.
+    """
+    name = "sqlite"
+
+    def __init__(self, busy_timeout=30.0):
+        self.busy_timeout = busy_timeout
+
+    def connect(self, path, read_only=False, factory=sqlite3.Connection):
+        if read_only:
+            conn = sqlite3.connect(
+                f"{path.resolve().as_uri()}?mode=ro", uri=True, timeout=self.busy_timeout, factory=factory
+            )
+        else:
+            conn = sqlite3.connect(str(path), timeout=self.busy_timeout, factory=factory)
+        conn.row_factory = sqlite3.Row
+        # Enable foreign keys
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def prepare_database(self, conn):
+        # Lets maintenance hand free pages back in small steps; only takes
+        # effect on a new database (existing ones need one full VACUUM)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        # WAL lets readers in other processes proceed while one process writes
+        conn.execute("PRAGMA journal_mode = WAL;")
+
+    def translate_ddl(self, sql):
+        return sql
+
+    def begin_write(self, conn, table):
+        # Take the write lock up front, so nothing commits between our reads and writes
+        conn.execute("BEGIN IMMEDIATE")
+
+    def create_trigger(self, cursor, name, table, operation, statement):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}
+            AFTER {operation} ON {table}
+            BEGIN
+                {statement};
+            END
+        """)
+
+    def raise_sql(self, message):
+        # Trigger statement that aborts the triggering statement
+        return f"SELECT RAISE(ABORT, '{message}')"
+
+    def attach_archive(self, conn, path, read_only=False):
+        # Archived rows live in a separate file, visible as schema "archive"
+        target = f"{path.resolve().as_uri()}?mode=ro" if read_only else str(path)
+        conn.execute("ATTACH DATABASE ? AS archive", (target,))
+
+    def table_columns(self, conn, table):
+        cursor = conn.execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in cursor.fetchall()]
+
+    def insert_or_ignore_sql(self, table, columns):
+        return f"""
+            INSERT OR IGNORE INTO {table}
+            ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+        """
+
+    def read_frame(self, conn, query, params=None):
+        return pd.read_sql_query(query, conn, params=params)
+
+
+class Row(tuple):
+    """
+    Tuple that can also be indexed by column name, like sqlite3.Row.
+    """
+    def __new__(cls, columns, values):
+        row = super().__new__(cls, values)
+        row._columns = columns
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._columns[key])
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._columns)
+
+
+def _to_pyformat(query):
+    """
+    Rewrite qmark placeholders as psycopg's %s, leaving quoted literals alone.
+    """
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    for i in range(0, len(parts), 2):
+        parts[i] = parts[i].replace("%", "%%").replace("?", "%s")
+    return "".join(parts)
+
+
+class PostgresCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.lastrowid = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        query = _to_pyformat(query)
+        # sqlite3 callers read cursor.lastrowid after an INSERT
+        returning = query.lstrip().upper().startswith("INSERT") and "RETURNING" not in query.upper()
+        if returning:
+            query = query.rstrip().rstrip(";") + " RETURNING *"
+        self._cursor.execute(query, tuple(params or ()))
+        self.lastrowid = None
+        if returning:
+            row = self._cursor.fetchone()
+            if row is not None and "id" in row._columns:
+                self.lastrowid = row["id"]
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(_to_pyformat(query), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class PostgresConnection:
+    """
+    sqlite3.Connection look-alike over a pooled psycopg connection, so the
+    data modules keep their cursor/commit/close flow unchanged.
+    close() hands the connection back to the pool.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self):
+        return PostgresCursor(self._conn.cursor(row_factory=_row_factory))
+
+    def execute(self, query, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query, seq_of_params):
+        return self.cursor().executemany(query, seq_of_params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.rollback()
+            self._pool.putconn(self._conn)
+            self._conn = None
+
+
+def _row_factory(cursor):
+    columns = {col.name: i for i, col in enumerate(cursor.description or ())}
+    return lambda values: Row(columns, values)
+
+
+class PostgresBackend:
+    """
+    PostgreSQL through a psycopg connection pool. Requires the optional
+    `psycopg[binary]` and `psycopg_pool` packages.
+    """
+    name = "postgres"
+
+    def __init__(self, dsn, min_size=1, max_size=10):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "The postgres backend needs `pip install psycopg[binary] psycopg_pool`."
+            ) from e
+        self.dsn = dsn
+        self.pool = ConnectionPool(dsn, min_size=min_size, max_size=max_size, open=True)
+
+    def connect(self, path=None, read_only=False):
+        conn = self.pool.getconn()
+        conn.read_only = read_only
+        return PostgresConnection(self.pool, conn)
+
+    def prepare_database(self, conn):
+        pass
+
+    def begin_write(self, conn, table):
+        # Blocks other writers of `table` (but not readers) until commit
+        conn.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+
+    def translate_ddl(self, sql):
+        sql = re.sub(r"\bseq INTEGER PRIMARY KEY AUTOINCREMENT", "seq BIGSERIAL PRIMARY KEY", sql)
+        sql = re.sub(r"\bbucket INTEGER\b", "bucket BIGINT", sql)
+        sql = re.sub(r"\)\s*WITHOUT ROWID", ")", sql)
+        sql = re.sub(r"\bBLOB\b", "BYTEA", sql)
+        return re.sub(r"\bINTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY", sql)
+
+    def create_trigger(self, cursor, name, table, operation, statement):
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION {name}_fn() RETURNS trigger AS $$
+            BEGIN
+                {statement};
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(f"""
+            CREATE OR REPLACE TRIGGER {name}
+            AFTER {operation} ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {name}_fn()
+        """)
+
+    def raise_sql(self, message):
+        return f"RAISE EXCEPTION '{message}'"
+
+    def attach_archive(self, conn, path=None, read_only=False):
+        # Archived rows live in the "archive" schema of the same database
+        if not read_only:
+            conn.execute("CREATE SCHEMA IF NOT EXISTS archive")
+
+    def table_columns(self, conn, table):
+        cursor = conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            (table,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def insert_or_ignore_sql(self, table, columns):
+        return f"""
+            INSERT INTO {table}
+            ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+            ON CONFLICT DO NOTHING
+        """
+
+    def read_frame(self, conn, query, params=None):
+        cursor = conn.execute(query, params or ())
+        columns = [col.name for col in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
@@ -0,0 +1,53 @@
+import threading
+from app.data.db import connect_database
+from app.services.metrics import CACHE_REQUESTS
+
+# Process-local cache: name -> (generation, value). Other processes signal
+# invalidation by bumping cache_generations through the table triggers.
+_cache = {}
+_lock = threading.Lock()
+
+def get_generation(name):
+    """
+    Return the current generation counter for `name` (0 if never written).
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT generation FROM cache_generations WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def bump_generation(name):
+    """
+    Invalidate `name` in every process, for writes the triggers don't cover.
+    """
+    conn = connect_database()
+    conn.execute("""
+        INSERT INTO cache_generations (name, generation) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET generation = cache_generations.generation + 1
+    """, (name,))
+    conn.commit()
+    conn.close()
+
+def cached(name, loader):
+    """
+    Return loader()'s result, reusing this process's copy until another write
+    to `name` (from any process) bumps its generation.
+    Cached values are shared between sessions and must not be mutated.
+    """
+    generation = get_generation(name)
+    entry = _cache.get(name)
+    if entry and entry[0] == generation:
+        CACHE_REQUESTS.inc(name=name, result="hit")
+        return entry[1]
+    CACHE_REQUESTS.inc(name=name, result="miss")
+
+    value = loader()
+    with _lock:
+        _cache[name] = (generation, value)
+    return value
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,120 @@
+import os
+import pandas as pd
+from app.data.db import connect_database
+
+# change_log rows kept by prune_change_log
+CHANGE_LOG_KEEP = int(os.environ.get("CHANGE_LOG_KEEP", "100000"))
+
+def latest_change_seq(table_name=None):
+    """
+    Return the highest change_log sequence number (0 if the log is empty).
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    if table_name:
+        cursor.execute("SELECT MAX(seq) FROM change_log WHERE table_name = ?", (table_name,))
+    else:
+        cursor.execute("SELECT MAX(seq) FROM change_log")
+    seq = cursor.fetchone()[0]
+    conn.close()
+    return seq or 0
+
+def changes_since(seq, table_name=None, limit=None):
+    """
+    Return change_log rows with a sequence number greater than `seq`, oldest first.
+    """
+    query = "SELECT seq, table_name, row_id, operation, changed_at FROM change_log WHERE seq > ?"
+    params = [seq]
+    if table_name:
+        query += " AND table_name = ?"
+        params.append(table_name)
+    query += " ORDER BY seq"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def prune_change_log(keep_last=CHANGE_LOG_KEEP, batch_size=10000):
+    """
+    Delete all but the newest `keep_last` change_log rows, committing every
+    `batch_size` so writers are never held up for long. Readers further
+    behind than that fall back to a full reload (see sync_frame).
+    Returns the number of rows deleted; run by the maintenance job.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(seq) FROM change_log")
+    newest = cursor.fetchone()[0]
+    count = 0
+    while newest is not None:
+        cursor.execute("""
+            DELETE FROM change_log WHERE seq IN (
+                SELECT seq FROM change_log WHERE seq <= ? ORDER BY seq LIMIT ?
+            )
+        """, (newest - keep_last, batch_size))
+        deleted = cursor.rowcount
+        conn.commit()
+        count += deleted
+        if deleted < batch_size:
+            break
+    conn.close()
+    return count
+
+def oldest_change_seq():
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(seq) FROM change_log")
+    seq = cursor.fetchone()[0]
+    conn.close()
+    return seq or 0
+
+def apply_changes(df, changes, fetch_rows):
+    """
+    Apply change_log rows to a cached DataFrame keyed by "id".
+    `fetch_rows(ids)` must return a DataFrame with the current rows for those ids.
+    Rows deleted since are dropped; inserted/updated rows are re-read and replaced.
+    Returns a new DataFrame ordered by id descending, like the get_all_* loaders.
+    """
+    if not changes:
+        return df
+
+    # Only the last operation per row matters
+    latest = {}
+    for change in changes:
+        latest[change["row_id"]] = change["operation"]
+
+    touched = list(latest)
+    upserted = [row_id for row_id, operation in latest.items() if operation != "DELETE"]
+
+    fresh = fetch_rows(upserted) if upserted else df.iloc[0:0]
+    kept = df[~df["id"].isin(touched)]
+    merged = pd.concat([kept, fresh], ignore_index=True) if not fresh.empty else kept
+    return merged.sort_values("id", ascending=False, ignore_index=True)
+
+def sync_frame(state, table_name, load_all, fetch_rows):
+    """
+    Keep `state` (a dict such as st.session_state) holding an up-to-date frame
+    for `table_name`. The first call loads everything; later calls only apply
+    the changes recorded since the previous sync. Returns the frame.
+    """
+    frame_key = f"{table_name}_frame"
+    seq_key = f"{table_name}_seq"
+
+    seq = state.get(seq_key)
+    if frame_key in state and seq is not None and seq >= oldest_change_seq() - 1:
+        changes = changes_since(seq, table_name)
+        if changes:
+            state[frame_key] = apply_changes(state[frame_key], changes, fetch_rows)
+            state[seq_key] = changes[-1]["seq"]
+        return state[frame_key]
+
+    # Read the watermark first so changes made during the load are replayed next time
+    state[seq_key] = latest_change_seq()
+    state[frame_key] = load_all()
+    return state[frame_key]
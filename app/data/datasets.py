@@ -1,7 +1,44 @@
-import pandas as pd
-from app.data.db import connect_database
+import re
+from app.data.db import connect_database, read_frame, insert_or_ignore_sql, table_columns
 from pathlib import Path
 
+# Columns added after the original table; see ensure_dataset_schema()
+PROFILE_COLUMNS = {
+    "uploaded_by": "TEXT",
+    "file_path": "TEXT",
+    "file_format": "TEXT",
+    "column_count": "INTEGER",
+    "column_profile": "TEXT",
+    "table_name": "TEXT",
+}
+# Tables the application owns, which a dataset load must never replace
+APP_TABLES = {
+    "users", "cyber_incidents", "datasets_metadata", "it_tickets", "change_log",
+    "cache_generations", "job_watermarks", "anomaly_stats", "anomaly_pending", "alerts",
+    "ticket_signatures", "ticket_lsh", "ticket_analyses", "ai_usage",
+    "roles", "teams", "team_members", "grants", "login_failures",
+    "audit_log", "maintenance_log", "api_tokens", "webhook_destinations", "notification_outbox",
+}
+# Rows per executemany batch when loading a file into a table
+LOAD_CHUNK_ROWS = 50000
+
+def ensure_dataset_schema():
+    """
+    Add the profile columns to datasets_metadata for older DBs.
+    Safe to run repeatedly.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+
+    cols = table_columns(conn, "datasets_metadata")
+    for column, column_type in PROFILE_COLUMNS.items():
+        if column not in cols:
+            cursor.execute(f"ALTER TABLE datasets_metadata ADD COLUMN {column} {column_type}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_datasets_file_path ON datasets_metadata(file_path)")
+
+    conn.commit()
+    conn.close()
+
 def insert_dataset_metadata(dataset_name, category, source, last_updated, record_count, file_size_mb):
     conn = connect_database()
     cursor = conn.cursor()
@@ -15,21 +52,73 @@ def insert_dataset_metadata(dataset_name, category, source, last_updated, record
     conn.close()
     return lastid
 
-def get_all_datasets_metadata():
+def save_dataset_profile(record):
+    """
+    Insert or update the datasets_metadata row for record["file_path"]
+    (one row per registered file). `record` maps column names to values;
+    None values leave an existing row's value unchanged. Returns the row id.
+    """
+    columns = [column for column in record if column != "id"]
     conn = connect_database()
-    df = pd.read_sql_query("SELECT * FROM datasets_metadata ORDER BY id DESC", conn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM datasets_metadata WHERE file_path = ?", (record["file_path"],))
+        row = cursor.fetchone()
+        if row:
+            dataset_id = row[0]
+            cursor.execute(
+                f"UPDATE datasets_metadata SET {', '.join(f'{c} = COALESCE(?, {c})' for c in columns)} WHERE id = ?",
+                [record[c] for c in columns] + [dataset_id],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO datasets_metadata ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [record[c] for c in columns],
+            )
+            dataset_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    return dataset_id
+
+def get_all_datasets_metadata():
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, "SELECT * FROM datasets_metadata ORDER BY id DESC")
     conn.close()
     return df
 
+def get_dataset_metadata(dataset_id):
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM datasets_metadata WHERE id = ?", (dataset_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+def dataset_id_for_path(file_path):
+    """
+    Id of the datasets_metadata row registered for `file_path`, or None.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM datasets_metadata WHERE file_path = ?", (str(file_path),))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
 def migrate_datasets_metadata_from_file(file_path="DATA/datasets_metadata.csv"):
     """
     Migrate datasets_metadata from CSV file.
     CSV format: dataset_id,name,rows,columns,uploaded_by,upload_date
-    Table format: dataset_name, category, source, last_updated, record_count, file_size_mb
+    Table format: dataset_name, uploaded_by, source, last_updated, record_count, column_count
+
+    The listing has no file behind it, so size and category stay empty
+    rather than guessed; register the actual files with
+    app/services/dataset_registry.py to fill in a full profile.
     """
     conn = connect_database()
     cursor = conn.cursor()
-    
+
     cursor.execute("SELECT COUNT(*) FROM datasets_metadata")
     if cursor.fetchone()[0] == 0:
         filepath = Path(file_path)
@@ -37,8 +126,12 @@ def migrate_datasets_metadata_from_file(file_path="DATA/datasets_metadata.csv"):
             print(f"Datasets metadata file not found at {file_path}")
             conn.close()
             return 0
-        
+
         migrated = 0
+        insert_sql = insert_or_ignore_sql(
+            "datasets_metadata",
+            ("dataset_name", "uploaded_by", "source", "last_updated", "record_count", "column_count"),
+        )
         with open(filepath, 'r', encoding='utf-8') as f:
             next(f)  # Skip header
             for line in f:
@@ -48,28 +141,19 @@ def migrate_datasets_metadata_from_file(file_path="DATA/datasets_metadata.csv"):
                 parts = line.split(',')
                 if len(parts) < 6:
                     continue
-                
+
                 dataset_id, name, rows, columns, uploaded_by, upload_date = parts
-                
-                # Map CSV columns to table columns
-                dataset_name = name
-                category = uploaded_by  # Using uploaded_by as category
-                source = "CSV Import"
-                last_updated = upload_date
-                record_count = int(rows) if rows.isdigit() else 0
-                file_size_mb = float(columns) / 1000 if columns.isdigit() else 0.0  # Approximate
-                
+
+                record_count = int(rows) if rows.isdigit() else None
+                column_count = int(columns) if columns.isdigit() else None
+
                 try:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO datasets_metadata
-                        (dataset_name, category, source, last_updated, record_count, file_size_mb)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (dataset_name, category, source, last_updated, record_count, file_size_mb))
+                    cursor.execute(insert_sql, (name, uploaded_by, "CSV Import", upload_date, record_count, column_count))
                     if cursor.rowcount:
                         migrated += 1
                 except Exception as e:
                     print(f"Error migrating dataset {name}: {e}")
-        
+
         conn.commit()
         print(f"Migrated {migrated} datasets from {filepath.name}")
         conn.close()
@@ -78,10 +162,66 @@ def migrate_datasets_metadata_from_file(file_path="DATA/datasets_metadata.csv"):
         conn.close()
         return 0
 
-def load_csv_to_table(csv_path, table_name, if_exists='append'):
-    import pandas as pd
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+def _sql_type(dtype):
+    if dtype.kind in "biu":
+        return "INTEGER"
+    if dtype.kind == "f":
+        return "REAL"
+    return "TEXT"
+
+def load_chunks_to_table(chunks, table_name, column_types=None, if_exists="fail"):
+    """
+    Load an iterable of DataFrame chunks into `table_name` with executemany,
+    committing per chunk so memory stays at one chunk however large the
+    source is. `column_types` ({column: SQL type}) declares the table; by
+    default the types are taken from the first chunk. `if_exists` is "fail",
+    "replace" or "append", as in DataFrame.to_sql. Returns the rows loaded.
+    """
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table_name):
+        raise ValueError(f"Invalid table name: {table_name}")
+    if table_name.lower() in APP_TABLES:
+        raise ValueError(f"{table_name} is an application table.")
+    if if_exists not in ("fail", "replace", "append"):
+        raise ValueError(f"Unknown if_exists: {if_exists}")
+
     conn = connect_database()
-    df = pd.read_csv(csv_path)
-    df.to_sql(name=table_name, con=conn, if_exists=if_exists, index=False)
-    conn.close()
-    return len(df)
\ No newline at end of file
+    try:
+        cursor = conn.cursor()
+        exists = bool(table_columns(conn, table_name))
+        if exists and if_exists == "fail":
+            raise ValueError(f"Table {table_name} already exists.")
+        if exists and if_exists == "replace":
+            cursor.execute(f"DROP TABLE {table_name}")
+            exists = False
+
+        loaded = 0
+        insert_sql = None
+        for chunk in chunks:
+            if insert_sql is None:
+                if not exists:
+                    types = column_types or {c: _sql_type(chunk[c].dtype) for c in chunk.columns}
+                    cursor.execute(f"CREATE TABLE {table_name} ({', '.join(f'{_quote(c)} {types[c]}' for c in chunk.columns)})")
+                insert_sql = (
+                    f"INSERT INTO {table_name} ({', '.join(_quote(c) for c in chunk.columns)}) "
+                    f"VALUES ({', '.join('?' for _ in chunk.columns)})"
+                )
+            # Dates become ISO strings and NaN/NaT become NULL
+            for column in chunk.columns:
+                if chunk[column].dtype.kind == "M":
+                    chunk[column] = chunk[column].dt.strftime("%Y-%m-%d %H:%M:%S")
+            rows = chunk.astype(object).where(chunk.notna(), None)
+            cursor.executemany(insert_sql, rows.itertuples(index=False, name=None))
+            conn.commit()
+            loaded += len(chunk)
+        conn.commit()
+    finally:
+        conn.close()
+    return loaded
+
+def load_csv_to_table(csv_path, table_name, if_exists='append', chunksize=LOAD_CHUNK_ROWS):
+    import pandas as pd
+    with pd.read_csv(csv_path, chunksize=chunksize) as chunks:
+        return load_chunks_to_table(chunks, table_name, if_exists=if_exists)
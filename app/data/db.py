@@ -1,17 +1,181 @@
-import sqlite3
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
+from app.data import querylog
+from app.data.backends import SQLiteBackend
 
 DB_DIR = Path(__file__).resolve().parents[2] / "DATA"
 DB_DIR.mkdir(parents=True, exist_ok=True)
-DB_PATH = DB_DIR / "intelligence_platform.db"
+# Every replica of the app on a host must point at the same file; DB_PATH in
+# the environment overrides the default. DB_READ_PATH optionally points
+# readers at a read replica (e.g. a litestream/rsync copy).
+DB_PATH = Path(os.environ["DB_PATH"]) if os.environ.get("DB_PATH") else DB_DIR / "intelligence_platform.db"
+READ_DB_PATH = Path(os.environ["DB_READ_PATH"]) if os.environ.get("DB_READ_PATH") else None
 
-def connect_database(db_path=DB_PATH):
+# Seconds a connection waits on another process's write lock before failing
+BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "30"))
+
+# SQLite caps the number of "?" placeholders per statement, so set-based
+# operations on id lists are split into chunks of this size.
+MAX_PARAMS_PER_QUERY = 500
+
+_backend = None
+
+def get_backend():
+    """
+    Return the storage backend selected by DB_BACKEND ("sqlite" by default,
+    or "postgres" with DATABASE_URL set).
+    """
+    global _backend
+    if _backend is None:
+        if os.environ.get("DB_BACKEND", "sqlite") == "postgres":
+            from app.data.backends import PostgresBackend
+            _backend = PostgresBackend(os.environ["DATABASE_URL"])
+        else:
+            _backend = SQLiteBackend(busy_timeout=BUSY_TIMEOUT)
+    return _backend
+
+def set_backend(backend):
+    """
+    Swap the active backend (used by the conformance and benchmark scripts).
+    """
+    global _backend
+    _backend = backend
+
+def connect_database(db_path=None, read_only=False):
+    """
+    Connect to the configured database (SQLite creates the file if missing).
+    With read_only=True the connection is opened read-only, against
+    DB_READ_PATH when configured, so readers never take write locks.
+    Returns a sqlite3.Connection (or a compatible wrapper for other backends).
+    """
+    if read_only:
+        path = Path(db_path or READ_DB_PATH or DB_PATH)
+    else:
+        path = Path(db_path or DB_PATH)
+    backend = get_backend()
+    if querylog.ENABLED and backend.name == "sqlite":
+        return backend.connect(path, read_only=read_only, factory=querylog.InstrumentedConnection)
+    return backend.connect(path, read_only=read_only)
+
+def read_frame(conn, query, params=None):
+    """
+    Run a SELECT and return the result as a pandas DataFrame.
+    """
+    return get_backend().read_frame(conn, query, params)
+
+def table_columns(conn, table):
+    return get_backend().table_columns(conn, table)
+
+def translate_ddl(sql):
+    """
+    Adapt CREATE TABLE statements written for SQLite to the active backend.
+    """
+    return get_backend().translate_ddl(sql)
+
+def begin_write(conn, table):
+    """
+    Start a transaction on `conn` that holds off other writers to `table`
+    until it commits, e.g. before reading MAX(id) to find the rows it inserts.
+    """
+    get_backend().begin_write(conn, table)
+
+def insert_or_ignore_sql(table, columns):
+    """
+    INSERT statement that skips rows violating a unique constraint.
+    """
+    return get_backend().insert_or_ignore_sql(table, columns)
+
+@contextmanager
+def file_lock(lock_path):
+    """
+    Hold an exclusive OS-level lock on `lock_path` for the duration of the block.
+    Used to serialise work across processes sharing the database.
+    """
+    with open(lock_path, "a+") as handle:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+def utc_now():
+    """
+    The current UTC time as an ISO string, for timestamp columns compared as text.
+    """
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def chunked(items, size=MAX_PARAMS_PER_QUERY):
+    """
+    Yield successive lists of at most `size` items.
+    """
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def build_set_clause(fields, allowed):
+    """
+    Build "col = ?, col = ?" and its params from a dict of column values.
+    Columns not listed in `allowed` raise ValueError; None values are skipped.
+    """
+    updates = []
+    params = []
+    for column, value in fields.items():
+        if column not in allowed:
+            raise ValueError(f"Unknown column: {column}")
+        if value is None:
+            continue
+        updates.append(f"{column} = ?")
+        params.append(value)
+    return ", ".join(updates), params
+
+def build_where_clause(filters, allowed):
+    """
+    Build an AND-ed WHERE clause from a dict of column filters.
+    A list/tuple/set value becomes "col IN (...)", anything else "col = ?".
+    """
+    conditions = []
+    params = []
+    for column, value in (filters or {}).items():
+        if column not in allowed:
+            raise ValueError(f"Unknown column: {column}")
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            if not values:
+                conditions.append("0")
+                continue
+            placeholders = ", ".join("?" for _ in values)
+            conditions.append(f"{column} IN ({placeholders})")
+            params.extend(values)
+        else:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    return " AND ".join(conditions), params
+
+def scope_clause(scope, params):
     """
-    Connect to the SQLite database (creates file if missing).
-    Returns a sqlite3.Connection object.
+    SQL condition limiting a query to the rows `scope` (a compiled
+    permissions policy, see app/data/permissions.py) may see; its parameters
+    are appended to `params`. A None or unrestricted scope allows every row.
     """
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
-    # Enable foreign keys
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn 
\ No newline at end of file
+    if scope is None or scope.where is None:
+        return "1 = 1"
+    params.extend(scope.params)
+    return f"({scope.where})"
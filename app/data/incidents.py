@@ -1,5 +1,37 @@
 import pandas as pd
-from app.data.db import connect_database
+from app.data.db import (
+    connect_database, read_frame, insert_or_ignore_sql, table_columns, chunked,
+    build_set_clause, build_where_clause, scope_clause, utc_now, begin_write,
+)
+from app.data.audit import capture, record_write
+from app.data.notifications import queue_incident_events
+
+INCIDENT_COLUMNS = ("date", "incident_type", "severity", "status", "description", "reported_by", "assigned_to")
+
+def ensure_incident_schema():
+    """
+    Add missing columns (e.g., assigned_to, deleted_at) to cyber_incidents for
+    older DBs, and the indexes the permission filters and retention use.
+    Safe to run repeatedly.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+
+    cols = table_columns(conn, "cyber_incidents")
+
+    if "assigned_to" not in cols:
+        cursor.execute("ALTER TABLE cyber_incidents ADD COLUMN assigned_to TEXT")
+    if "deleted_at" not in cols:
+        cursor.execute("ALTER TABLE cyber_incidents ADD COLUMN deleted_at TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_incidents_reported_by ON cyber_incidents(reported_by)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_incidents_assigned_to ON cyber_incidents(assigned_to)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_incidents_status_date ON cyber_incidents(status, date)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_incidents_deleted_at ON cyber_incidents(deleted_at) WHERE deleted_at IS NOT NULL"
+    )
+
+    conn.commit()
+    conn.close()
 
 def migrate_incidents_from_file(file_path="DATA/cyber_incidents.csv"):
     conn = connect_database()
@@ -7,57 +39,134 @@ def migrate_incidents_from_file(file_path="DATA/cyber_incidents.csv"):
     
     cursor.execute("SELECT COUNT(*) FROM cyber_incidents")
     if cursor.fetchone()[0] == 0:
+        insert_sql = insert_or_ignore_sql(
+            "cyber_incidents", ("date", "incident_type", "severity", "status", "description")
+        )
         with open(file_path, 'r') as f:
             next(f)  # Skip the header line
             for line in f:
                 incident_id, timestamp, severity, category, status, description = line.strip().split(',')
-                cursor.execute("""
-                    INSERT OR IGNORE INTO cyber_incidents
-                    (date, incident_type, severity, status, description)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (timestamp, category, severity, status, description))
+                cursor.execute(insert_sql, (timestamp, category, severity, status, description))
     conn.commit()
     conn.close()
 
-def insert_incident(date, incident_type, severity, status, description, reported_by=None):
+def insert_incident(date, incident_type, severity, status, description, reported_by=None, assigned_to=None):
     conn = connect_database()
     cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO cyber_incidents
-        (date, incident_type, severity, status, description, reported_by)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (date, incident_type, severity, status, description, reported_by))
-    conn.commit()
+        (date, incident_type, severity, status, description, reported_by, assigned_to)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (date, incident_type, severity, status, description, reported_by, assigned_to))
     lastid = cursor.lastrowid
+    queue_incident_events(cursor, "incident.created", "id = ?", [lastid])
+    conn.commit()
     conn.close()
+    record_write("cyber_incidents", "create", [{
+        "id": lastid, "date": date, "incident_type": incident_type, "severity": severity, "status": status,
+        "description": description, "reported_by": reported_by, "assigned_to": assigned_to,
+    }])
     return lastid
 
-def get_all_incidents():
-    conn = connect_database()
-    df = pd.read_sql_query("SELECT * FROM cyber_incidents ORDER BY id DESC", conn)
+def get_all_incidents(scope=None):
+    """
+    Return every incident `scope` (a permissions policy; None for all) may see, newest first.
+    Soft-deleted incidents are left out.
+    """
+    params = []
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
+    df = read_frame(
+        conn, f"SELECT * FROM cyber_incidents WHERE deleted_at IS NULL AND {where} ORDER BY id DESC", params
+    )
     conn.close()
     return df
 
-def get_incident_by_id(incident_id):
-    conn = connect_database()
+def get_incidents_page(scope=None, filters=None, before_id=None, limit=100):
+    """
+    One page of live incidents, newest first, as a DataFrame: those `scope`
+    may see that match `filters` ({column: value or list}) and have an id
+    below `before_id`. Pass a page's last id as `before_id` for the next one.
+    """
+    where, params = build_where_clause(filters, INCIDENT_COLUMNS + ("id",))
+    clauses = [where] if where else []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(int(before_id))
+    clauses.append(scope_clause(scope, params))
+    params.append(int(limit))
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, f"""
+        SELECT * FROM cyber_incidents WHERE deleted_at IS NULL AND {' AND '.join(clauses)}
+        ORDER BY id DESC LIMIT ?
+    """, params)
+    conn.close()
+    return df
+
+def get_incidents_by_ids(row_ids, scope=None):
+    """
+    Return the cyber_incidents rows whose integer primary key is in `row_ids` as a DataFrame.
+    """
+    conn = connect_database(read_only=True)
+    frames = []
+    for chunk in chunked(row_ids):
+        placeholders = ", ".join("?" for _ in chunk)
+        params = list(chunk)
+        where = scope_clause(scope, params)
+        frames.append(read_frame(
+            conn,
+            f"SELECT * FROM cyber_incidents WHERE id IN ({placeholders}) AND deleted_at IS NULL AND {where} ORDER BY id DESC",
+            params,
+        ))
+    conn.close()
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def get_incidents_after(last_id, columns=("id", "date", "incident_type", "severity")):
+    """
+    Return incidents with an id greater than `last_id`, oldest first, as a DataFrame.
+    """
+    conn = connect_database(read_only=True)
+    df = read_frame(
+        conn, f"SELECT {', '.join(columns)} FROM cyber_incidents WHERE id > ? ORDER BY id", (last_id,)
+    )
+    conn.close()
+    return df
+
+def get_incident_by_id(incident_id, scope=None):
+    params = [incident_id]
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cyber_incidents WHERE id = ?", (incident_id,))
+    cursor.execute(f"SELECT * FROM cyber_incidents WHERE id = ? AND deleted_at IS NULL AND {where}", params)
     row = cursor.fetchone()
     conn.close()
     return row
 
-def update_incident_status(incident_id, new_status):
+def _target(incident_id, scope):
+    # The incident, if `scope` may see it
+    params = [incident_id]
+    return f"id = ? AND {scope_clause(scope, params)}", params
+
+def update_incident_status(incident_id, new_status, scope=None):
+    where, target_params = _target(incident_id, scope)
     conn = connect_database()
     cursor = conn.cursor()
-    cursor.execute("UPDATE cyber_incidents SET status = ? WHERE id = ?", (new_status, incident_id))
-    conn.commit()
+    before = capture(cursor, "cyber_incidents", where, target_params)
+    cursor.execute(f"UPDATE cyber_incidents SET status = ? WHERE {where}", [new_status] + target_params)
     count = cursor.rowcount
+    if count:
+        queue_incident_events(cursor, "incident.updated", "id = ?", [incident_id])
+    conn.commit()
     conn.close()
+    record_write("cyber_incidents", "update", before, {"status": new_status})
     return count 
 
-def update_incident(incident_id, date=None, incident_type=None, severity=None, status=None, description=None, reported_by=None):
+def update_incident(incident_id, date=None, incident_type=None, severity=None, status=None, description=None, reported_by=None, assigned_to=None, scope=None):
     """ 
     Update an incident. Only provided fields will be updated.
+    Returns 0 if the incident is outside `scope`.
     """
     conn = connect_database()
     cursor = conn.cursor()
@@ -83,24 +192,191 @@ def update_incident(incident_id, date=None, incident_type=None, severity=None, s
     if reported_by is not None:
         updates.append("reported_by = ?")
         params.append(reported_by)
+    if assigned_to is not None:
+        updates.append("assigned_to = ?")
+        params.append(assigned_to)
     
     if updates:
-        params.append(incident_id)
-        query = f"UPDATE cyber_incidents SET {', '.join(updates)} WHERE id = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        fields = {update.split(" = ")[0]: value for update, value in zip(updates, params)}
+        where, target_params = _target(incident_id, scope)
+        before = capture(cursor, "cyber_incidents", where, target_params)
+        query = f"UPDATE cyber_incidents SET {', '.join(updates)} WHERE {where}"
+        cursor.execute(query, params + target_params)
         count = cursor.rowcount
+        if count:
+            queue_incident_events(cursor, "incident.updated", "id = ?", [incident_id])
+        conn.commit()
     else:
         count = 0
     
     conn.close()
+    if count:
+        record_write("cyber_incidents", "update", before, fields)
     return count 
 
-def delete_incident(incident_id):
+def delete_incident(incident_id, soft=False, scope=None):
+    """
+    Delete an incident. With soft=True it is only tombstoned (deleted_at set):
+    hidden from every query, restorable, and archived by the retention job.
+    Returns 0 if the incident is outside `scope`.
+    """
+    where, target_params = _target(incident_id, scope)
     conn = connect_database()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM cyber_incidents WHERE id = ?", (incident_id,))
+    before = capture(cursor, "cyber_incidents", where, target_params)
+    if soft:
+        deleted_at = utc_now()
+        cursor.execute(
+            f"UPDATE cyber_incidents SET deleted_at = ? WHERE {where} AND deleted_at IS NULL", [deleted_at] + target_params
+        )
+    else:
+        cursor.execute(f"DELETE FROM cyber_incidents WHERE {where}", target_params)
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    if soft and count:
+        record_write("cyber_incidents", "update", before, {"deleted_at": deleted_at})
+    elif not soft:
+        record_write("cyber_incidents", "delete", before)
+    return count
+
+def restore_incident(incident_id, scope=None):
+    """
+    Undo a soft delete. Returns 0 if the incident is not tombstoned or is
+    outside `scope`.
+    """
+    where, target_params = _target(incident_id, scope)
+    where += " AND deleted_at IS NOT NULL"
+    conn = connect_database()
+    cursor = conn.cursor()
+    before = capture(cursor, "cyber_incidents", where, target_params)
+    cursor.execute(f"UPDATE cyber_incidents SET deleted_at = NULL WHERE {where}", target_params)
     conn.commit()
     count = cursor.rowcount
     conn.close()
+    record_write("cyber_incidents", "update", before, {"deleted_at": None})
+    return count
+
+def get_deleted_incidents(scope=None):
+    """
+    Return the soft-deleted incidents `scope` may see, most recently deleted first.
+    """
+    params = []
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
+    df = read_frame(
+        conn, f"SELECT * FROM cyber_incidents WHERE deleted_at IS NOT NULL AND {where} ORDER BY deleted_at DESC", params
+    )
+    conn.close()
+    return df
+
+def bulk_insert_incidents(incidents):
+    """
+    Insert many incidents in a single transaction.
+    `incidents` is an iterable of dicts keyed by INCIDENT_COLUMNS.
+    Returns the number of rows inserted.
+    """
+    rows = [tuple(incident.get(column) for column in INCIDENT_COLUMNS) for incident in incidents]
+    if not rows:
+        return 0
+
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        # Other writers wait until commit, so every id above previous_max is one of ours
+        begin_write(conn, "cyber_incidents")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cyber_incidents")
+        previous_max = cursor.fetchone()[0]
+        cursor.executemany(f"""
+            INSERT INTO cyber_incidents
+            ({', '.join(INCIDENT_COLUMNS)})
+            VALUES ({', '.join('?' for _ in INCIDENT_COLUMNS)})
+        """, rows)
+        created = capture(cursor, "cyber_incidents", "id > ?", [previous_max])
+        queue_incident_events(cursor, "incident.created", "id > ?", [previous_max])
+        conn.commit()
+    finally:
+        conn.close()
+    record_write("cyber_incidents", "create", created)
+    return len(rows)
+
+def _bulk_where(incident_ids, filters, scope=None):
+    if incident_ids is None and not filters:
+        raise ValueError("Provide incident_ids or filters for a bulk operation.")
+    where, params = build_where_clause(filters, INCIDENT_COLUMNS + ("id",))
+    scope_params = []
+    # Soft-deleted incidents are never targeted
+    allowed = f"deleted_at IS NULL AND {scope_clause(scope, scope_params)}"
+    where = f"{where} AND {allowed}" if where else allowed
+    if incident_ids is None:
+        return [(where, params + scope_params)]
+    # One statement per chunk of ids keeps each query under the parameter limit
+    clauses = []
+    for chunk in chunked(incident_ids):
+        id_clause = f"id IN ({', '.join('?' for _ in chunk)})"
+        clauses.append((f"{id_clause} AND {where}", list(chunk) + params + scope_params))
+    return clauses
+
+def bulk_update_incidents(incident_ids=None, filters=None, scope=None, **fields):
+    """
+    Update many incidents in one transaction.
+    Targets rows by `incident_ids`, by `filters` ({column: value or list}), or both,
+    and never touches rows outside `scope`.
+    Only provided (non-None) fields are updated. Returns the number of rows changed.
+    """
+    if "date" in fields and fields["date"] is not None:
+        fields["date"] = str(fields["date"])
+    set_clause, set_params = build_set_clause(fields, INCIDENT_COLUMNS)
+    clauses = _bulk_where(incident_ids, filters, scope)
+    if not set_clause:
+        return 0
+
+    conn = connect_database()
+    count = 0
+    before = []
+    updated_ids = []
+    try:
+        cursor = conn.cursor()
+        for where, params in clauses:
+            before += capture(cursor, "cyber_incidents", where, params)
+            # The update may change the columns `where` filters on, so note the ids first
+            cursor.execute(f"SELECT id FROM cyber_incidents WHERE {where}", params)
+            updated_ids += [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"UPDATE cyber_incidents SET {set_clause} WHERE {where}", set_params + params)
+            count += cursor.rowcount
+        for chunk in chunked(updated_ids):
+            queue_incident_events(cursor, "incident.updated", f"id IN ({', '.join('?' for _ in chunk)})", chunk)
+        conn.commit()
+    finally:
+        conn.close()
+    record_write("cyber_incidents", "update", before, {column: value for column, value in fields.items() if value is not None})
+    return count
+
+def bulk_delete_incidents(incident_ids=None, filters=None, scope=None, soft=False):
+    """
+    Delete many incidents in one transaction, targeted like bulk_update_incidents;
+    soft=True tombstones them like delete_incident. Returns the number of rows deleted.
+    """
+    clauses = _bulk_where(incident_ids, filters, scope)
+    deleted_at = utc_now()
+
+    conn = connect_database()
+    count = 0
+    before = []
+    try:
+        cursor = conn.cursor()
+        for where, params in clauses:
+            before += capture(cursor, "cyber_incidents", where, params)
+            if soft:
+                cursor.execute(f"UPDATE cyber_incidents SET deleted_at = ? WHERE {where}", [deleted_at] + params)
+            else:
+                cursor.execute(f"DELETE FROM cyber_incidents WHERE {where}", params)
+            count += cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if soft:
+        record_write("cyber_incidents", "update", before, {"deleted_at": deleted_at})
+    else:
+        record_write("cyber_incidents", "delete", before)
     return count
@@ -0,0 +1,54 @@
+from app.data.db import connect_database
+
+def record_login_failure(keys, failed_at):
+    """
+    Record one failed login against each throttle key.
+    """
+    conn = connect_database()
+    conn.executemany(
+        "INSERT INTO login_failures (throttle_key, failed_at) VALUES (?, ?)",
+        [(key, failed_at) for key in keys],
+    )
+    conn.commit()
+    conn.close()
+
+def recent_login_failures(keys, since, limit):
+    """
+    Return {key: [failed_at, ...]} with up to `limit` of each key's failures
+    after `since`, newest first. Keys without any are left out.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    found = {}
+    for key in keys:
+        cursor.execute("""
+            SELECT failed_at FROM login_failures
+            WHERE throttle_key = ? AND failed_at > ?
+            ORDER BY failed_at DESC LIMIT ?
+        """, (key, since, limit))
+        times = [row[0] for row in cursor.fetchall()]
+        if times:
+            found[key] = times
+    conn.close()
+    return found
+
+def clear_login_failures(key):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM login_failures WHERE throttle_key = ?", (key,))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def prune_login_failures(before):
+    """
+    Delete failures older than `before` (a UNIX timestamp).
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM login_failures WHERE failed_at < ?", (before,))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
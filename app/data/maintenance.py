@@ -0,0 +1,248 @@
+"""
+Storage maintenance for the SQLite database: WAL checkpoints, PRAGMA
+optimize and ANALYZE, incremental vacuum, and the page and fragmentation
+figures for the Maintenance admin page. When each task runs is decided by
+app/services/maintenance.py.
+
+Maintenance connections wait at most MAINTENANCE_LOCK_TIMEOUT_MS for a lock,
+so a busy database makes maintenance skip a step rather than queue in front
+of interactive writers, and vacuuming is done in steps sized to hold the
+write lock for about MAINTENANCE_STEP_MS.
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from app.data import db
+from app.data.db import connect_database, read_frame
+
+MAINTENANCE_LOCK_TIMEOUT_MS = int(os.environ.get("MAINTENANCE_LOCK_TIMEOUT_MS", "100"))
+MAINTENANCE_STEP_MS = float(os.environ.get("MAINTENANCE_STEP_MS", "50"))
+MAINTENANCE_STEP_PAUSE = float(os.environ.get("MAINTENANCE_STEP_PAUSE", "0.05"))
+# Rows sampled per index by ANALYZE and PRAGMA optimize (0: read everything)
+MAINTENANCE_ANALYSIS_LIMIT = int(os.environ.get("MAINTENANCE_ANALYSIS_LIMIT", "1000"))
+MAINTENANCE_LOG_DAYS = 30
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def _connect():
+    conn = connect_database()
+    conn.execute(f"PRAGMA busy_timeout = {MAINTENANCE_LOCK_TIMEOUT_MS}")
+    return conn
+
+def _is_locked(error):
+    return "locked" in str(error) or "busy" in str(error)
+
+def _wal_path():
+    return Path(f"{db.DB_PATH}-wal")
+
+def database_stats():
+    """
+    Page size and counts, free pages and WAL size of the database, as a dict.
+    """
+    conn = connect_database(db.DB_PATH, read_only=True)
+    cursor = conn.cursor()
+    stats = {}
+    for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+        cursor.execute(f"PRAGMA {pragma}")
+        stats[pragma] = cursor.fetchone()[0]
+    conn.close()
+    stats["auto_vacuum"] = AUTO_VACUUM_MODES.get(stats["auto_vacuum"], stats["auto_vacuum"])
+    stats["file_bytes"] = db.DB_PATH.stat().st_size
+    stats["wal_bytes"] = _wal_path().stat().st_size if _wal_path().exists() else 0
+    stats["free_percent"] = round(100 * stats["freelist_count"] / max(stats["page_count"], 1), 2)
+    return stats
+
+def table_stats():
+    """
+    Pages, size, fill and fragmentation of every table and index, largest
+    first, as a DataFrame. fragmented_percent is the share of leaf pages not
+    stored right after the previous leaf in key order, i.e. the seeks a full
+    scan makes. Reads every page, so it is only run on request. Raises
+    RuntimeError if this SQLite build has no dbstat table.
+    """
+    conn = connect_database(db.DB_PATH, read_only=True)
+    try:
+        # dbstat walks each b-tree depth-first, so leaves come in key order
+        cursor = conn.execute("SELECT name, pageno, pagetype, unused, pgsize FROM dbstat")
+    except sqlite3.OperationalError as e:
+        conn.close()
+        raise RuntimeError(f"Page statistics need SQLite's dbstat table: {e}")
+    totals = {}
+    last_leaf = {}
+    for name, pageno, pagetype, unused, pgsize in cursor:
+        entry = totals.setdefault(name, {"pages": 0, "bytes": 0, "unused": 0, "leaves": 0, "jumps": 0})
+        entry["pages"] += 1
+        entry["bytes"] += pgsize
+        entry["unused"] += unused
+        if pagetype == "leaf":
+            if name in last_leaf and pageno != last_leaf[name] + 1:
+                entry["jumps"] += 1
+            last_leaf[name] = pageno
+            entry["leaves"] += 1
+    conn.close()
+    rows = [
+        (
+            name, entry["pages"], round(entry["bytes"] / 1e6, 2),
+            round(100 * (1 - entry["unused"] / entry["bytes"]), 1),
+            round(100 * entry["jumps"] / max(entry["leaves"] - 1, 1), 1),
+        )
+        for name, entry in totals.items()
+    ]
+    df = pd.DataFrame(rows, columns=["name", "pages", "size_mb", "fill_percent", "fragmented_percent"])
+    return df.sort_values("pages", ascending=False, ignore_index=True)
+
+def checkpoint(mode="PASSIVE"):
+    """
+    Run a WAL checkpoint. PASSIVE copies what it can without waiting on
+    anyone; TRUNCATE also resets the WAL file, waiting at most the lock
+    timeout for readers. Returns {"busy", "wal_frames", "checkpointed"}.
+    """
+    conn = _connect()
+    try:
+        busy, wal_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.close()
+    return {"busy": bool(busy), "wal_frames": wal_frames, "checkpointed": checkpointed}
+
+def optimize(analysis_limit=MAINTENANCE_ANALYSIS_LIMIT):
+    """
+    PRAGMA optimize: re-analyzes only the tables whose statistics the
+    planner has found to be stale.
+    """
+    conn = _connect()
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+def analyze(analysis_limit=MAINTENANCE_ANALYSIS_LIMIT, pause=MAINTENANCE_STEP_PAUSE):
+    """
+    ANALYZE every table, one at a time so the write lock is only held for
+    one table's statistics. Tables that are locked are skipped until the
+    next run. Returns {"analyzed": [...], "skipped": [...]}.
+    """
+    conn = _connect()
+    result = {"analyzed": [], "skipped": []}
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()]
+        for table in tables:
+            try:
+                conn.execute(f'ANALYZE "{table}"')
+                conn.commit()
+                result["analyzed"].append(table)
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e):
+                    raise
+                result["skipped"].append(table)
+            time.sleep(pause)
+    finally:
+        conn.close()
+    return result
+
+def incremental_vacuum(max_seconds=60, step_ms=MAINTENANCE_STEP_MS, pause=MAINTENANCE_STEP_PAUSE):
+    """
+    Hand free pages back to the filesystem in steps of about `step_ms` of
+    write lock each, for at most `max_seconds`. A no-op unless the database
+    uses auto_vacuum = INCREMENTAL. Returns {"freed_pages", "steps",
+    "max_step_ms", "remaining"}.
+    """
+    conn = _connect()
+    pages = 64
+    result = {"freed_pages": 0, "steps": 0, "max_step_ms": 0.0, "remaining": 0}
+    deadline = time.monotonic() + max_seconds
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            result["remaining"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return result
+        while time.monotonic() < deadline:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            batch = min(pages, free)
+            start = time.perf_counter()
+            try:
+                conn.execute(f"PRAGMA incremental_vacuum({batch})").fetchall()
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e):
+                    raise
+                time.sleep(pause)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            result["freed_pages"] += batch
+            result["steps"] += 1
+            result["max_step_ms"] = round(max(result["max_step_ms"], elapsed_ms), 1)
+            # Size the next step to hold the lock for about step_ms
+            pages = max(8, min(pages * 2, int(batch * step_ms / max(elapsed_ms, 0.1))))
+            time.sleep(pause)
+        result["remaining"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    return result
+
+def enable_incremental_vacuum():
+    """
+    Switch an existing database to auto_vacuum = INCREMENTAL. This needs one
+    full VACUUM, which rewrites the whole file and locks out writers until it
+    finishes, so it is only run on request (the maintenance CLI).
+    """
+    conn = connect_database()
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+def record_run(task, started_at, seconds, detail=None):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO maintenance_log (task, started_at, seconds, detail) VALUES (?, ?, ?, ?)",
+        (task, started_at, round(seconds, 3), json.dumps(detail) if detail is not None else None),
+    )
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=MAINTENANCE_LOG_DAYS)).isoformat(timespec="seconds")
+    cursor.execute("DELETE FROM maintenance_log WHERE started_at < ?", (cutoff,))
+    conn.commit()
+    conn.close()
+
+def last_run_at(task):
+    """
+    When `task` last ran, as an ISO string, or None.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(started_at) FROM maintenance_log WHERE task = ?", (task,))
+    started_at = cursor.fetchone()[0]
+    conn.close()
+    return started_at
+
+def recent_runs(limit=100):
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, """
+        SELECT task, started_at, seconds, detail FROM maintenance_log
+        ORDER BY started_at DESC, id DESC LIMIT ?
+    """, (int(limit),))
+    conn.close()
+    return df
+
+def recent_write_at(writes):
+    """
+    changed_at of the `writes`-th most recent incident or ticket change, or
+    None if there have been fewer; read through change_log's primary key.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT changed_at FROM change_log ORDER BY seq DESC LIMIT 1 OFFSET ?", (max(int(writes) - 1, 0),))
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] if row else None
+
@@ -0,0 +1,292 @@
+"""
+Webhook destinations and the notification outbox.
+
+Incident writes call queue_incident_events() on their own cursor before
+committing, so an incident and its notifications commit (or roll back)
+together. Only incidents whose severity is in NOTIFY_SEVERITIES are queued,
+one outbox row per enabled destination. While a row is still pending, a
+newer event for the same incident updates its payload instead of adding a
+row (coalescing), so a burst of edits is delivered as one notification
+carrying the latest state.
+
+The dispatcher (app/services/notifications.py) claims due rows with
+claim_due(), and settles them with mark_delivered(), reschedule() or
+dead_letter().
+"""
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.data.db import connect_database, read_frame, utc_now, chunked
+
+NOTIFY_SEVERITIES = tuple(
+    s.strip() for s in os.environ.get("NOTIFY_SEVERITIES", "High,Critical").split(",") if s.strip()
+)
+STATUSES = ("pending", "sending", "delivered", "dead")
+
+
+def add_destination(name, url, secret=None, batch_size=50):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO webhook_destinations (name, url, secret, batch_size, created_at) VALUES (?, ?, ?, ?, ?)",
+        (name, url, secret, int(batch_size), utc_now()),
+    )
+    conn.commit()
+    lastid = cursor.lastrowid
+    conn.close()
+    return lastid
+
+def set_destination_enabled(name, enabled):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE webhook_destinations SET enabled = ? WHERE name = ?", (1 if enabled else 0, name))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def list_destinations(enabled_only=False):
+    """
+    Destinations as a list of dicts (name, url, secret, batch_size, enabled).
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    where = " WHERE enabled = 1" if enabled_only else ""
+    cursor.execute(f"SELECT name, url, secret, batch_size, enabled FROM webhook_destinations{where} ORDER BY name")
+    rows = [dict(zip(("name", "url", "secret", "batch_size", "enabled"), row)) for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+def queue_incident_events(cursor, event, where, params):
+    """
+    Queue `event` ("incident.created" / "incident.updated") for the
+    cyber_incidents rows matching `where` whose severity warrants a
+    notification, on the writer's cursor and inside its transaction.
+    Returns the number of outbox rows added or coalesced. Changes the
+    cursor's rowcount and lastrowid, so read those first.
+    """
+    cursor.execute("SELECT name FROM webhook_destinations WHERE enabled = 1")
+    destinations = [row[0] for row in cursor.fetchall()]
+    if not destinations or not NOTIFY_SEVERITIES:
+        return 0
+    severities = ", ".join("?" for _ in NOTIFY_SEVERITIES)
+    cursor.execute(
+        f"SELECT * FROM cyber_incidents WHERE ({where}) AND severity IN ({severities})",
+        list(params) + list(NOTIFY_SEVERITIES),
+    )
+    columns = [column[0] for column in cursor.description]
+    incidents = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if not incidents:
+        return 0
+
+    now = time.time()
+    created_at = utc_now()
+    rows = []
+    for incident in incidents:
+        payload = json.dumps(incident, default=str)
+        for destination in destinations:
+            rows.append((destination, event, f"incident:{incident['id']}", payload, now, created_at))
+    # A pending notification for the same incident keeps its event and
+    # place in the queue but takes the newest payload
+    cursor.executemany("""
+        INSERT INTO notification_outbox (destination, event, coalesce_key, payload, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (destination, coalesce_key) WHERE status = 'pending'
+        DO UPDATE SET payload = excluded.payload, coalesced = notification_outbox.coalesced + 1
+    """, rows)
+    return len(rows)
+
+def claim_due(max_rows, lease_seconds=60):
+    """
+    Claim up to max_rows[destination] due rows per enabled destination, oldest
+    first, for one dispatcher. Claimed rows are 'sending' until settled or
+    until their lease runs out (a dispatcher that died mid-send), after
+    which any dispatcher may claim them again.
+    Returns {destination: [row dicts]}.
+    """
+    now = time.time()
+    token = uuid.uuid4().hex
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM notification_outbox WHERE status = 'sending' AND lease_until < ?", (now,))
+        expired = [row[0] for row in cursor.fetchall()]
+        if expired:
+            _requeue(cursor, expired, "sending", "claim_token = NULL", [[] for _ in expired])
+        ids = []
+        for destination, limit in max_rows.items():
+            cursor.execute("""
+                SELECT id FROM notification_outbox
+                WHERE destination = ? AND status = 'pending' AND next_attempt_at <= ?
+                ORDER BY id LIMIT ?
+            """, (destination, now, int(limit)))
+            ids += [row[0] for row in cursor.fetchall()]
+        if not ids:
+            conn.commit()
+            return {}
+        for chunk in chunked(ids):
+            cursor.execute(f"""
+                UPDATE notification_outbox SET status = 'sending', claim_token = ?, lease_until = ?
+                WHERE status = 'pending' AND id IN ({', '.join('?' for _ in chunk)})
+            """, [token, now + lease_seconds] + chunk)
+        conn.commit()
+        cursor.execute("""
+            SELECT id, destination, event, coalesce_key, payload, attempts, coalesced, created_at
+            FROM notification_outbox WHERE claim_token = ? ORDER BY id
+        """, (token,))
+        columns = [column[0] for column in cursor.description]
+        claimed = {}
+        for row in cursor.fetchall():
+            entry = dict(zip(columns, row))
+            claimed.setdefault(entry["destination"], []).append(entry)
+    finally:
+        conn.close()
+    return claimed
+
+def _requeue(cursor, ids, from_status, set_clause, params):
+    """
+    Return rows still in `from_status` to 'pending', also setting
+    `set_clause` with `params` (one list per id). A newer event for the same incident may have been queued
+    while a row was claimed; its payload is folded into the returning row,
+    which keeps its event and place in the queue.
+    """
+    # Statements only (no SELECT first), so the write lock is held from the
+    # first one and no new pending row can slip in before the status change
+    pending = """
+        SELECT {column} FROM notification_outbox AS newer
+        WHERE newer.status = 'pending'
+          AND newer.destination = notification_outbox.destination
+          AND newer.coalesce_key = notification_outbox.coalesce_key
+    """
+    for outbox_id, row_params in zip(ids, params):
+        cursor.execute(f"""
+            UPDATE notification_outbox
+            SET payload = ({pending.format(column='payload')}),
+                coalesced = coalesced + ({pending.format(column='coalesced + 1')})
+            WHERE id = ? AND status = ? AND EXISTS ({pending.format(column='1')})
+        """, (outbox_id, from_status))
+        cursor.execute("""
+            DELETE FROM notification_outbox
+            WHERE status = 'pending' AND (destination, coalesce_key) IN (
+                SELECT destination, coalesce_key FROM notification_outbox WHERE id = ? AND status = ?
+            )
+        """, (outbox_id, from_status))
+        cursor.execute(
+            f"UPDATE notification_outbox SET status = 'pending', {set_clause} WHERE id = ? AND status = ?",
+            list(row_params) + [outbox_id, from_status],
+        )
+
+def _settle(statement, rows):
+    conn = connect_database()
+    try:
+        conn.executemany(statement, rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _settle_requeue(ids, set_clause, params):
+    conn = connect_database()
+    try:
+        _requeue(conn.cursor(), ids, "sending", set_clause, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def mark_delivered(ids):
+    delivered_at = utc_now()
+    _settle(
+        "UPDATE notification_outbox SET status = 'delivered', delivered_at = ?, attempts = attempts + 1, "
+        "claim_token = NULL, last_error = NULL WHERE id = ? AND status = 'sending'",
+        [(delivered_at, outbox_id) for outbox_id in ids],
+    )
+
+def reschedule(ids, next_attempt_at, error):
+    """
+    Put claimed rows back in the queue, due again at `next_attempt_at` (epoch seconds).
+    """
+    _settle_requeue(
+        ids, "next_attempt_at = ?, attempts = attempts + 1, claim_token = NULL, last_error = ?",
+        [(next_attempt_at, error) for _ in ids],
+    )
+
+def release(ids, next_attempt_at):
+    """
+    Hand claimed rows that were never sent back to the queue without counting an attempt.
+    """
+    _settle_requeue(ids, "next_attempt_at = ?, claim_token = NULL", [(next_attempt_at,) for _ in ids])
+
+def dead_letter(ids, error):
+    """
+    Give up on claimed rows; they stay in the outbox as 'dead' until retried or purged.
+    """
+    _settle(
+        "UPDATE notification_outbox SET status = 'dead', attempts = attempts + 1, claim_token = NULL, "
+        "last_error = ? WHERE id = ? AND status = 'sending'",
+        [(error, outbox_id) for outbox_id in ids],
+    )
+
+def retry_dead(destination=None):
+    """
+    Re-queue dead-lettered rows (of one destination, or all); returns how many.
+    """
+    where = "status = 'dead'"
+    params = []
+    if destination:
+        where += " AND destination = ?"
+        params.append(destination)
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        # Newest first, so older dead rows for the same incident fold the newer payload in
+        cursor.execute(f"SELECT id FROM notification_outbox WHERE {where} ORDER BY id DESC", params)
+        ids = [row[0] for row in cursor.fetchall()]
+        now = time.time()
+        _requeue(cursor, ids, "dead", "attempts = 0, next_attempt_at = ?, last_error = NULL", [(now,) for _ in ids])
+        conn.commit()
+    finally:
+        conn.close()
+    return len(ids)
+
+def purge_delivered(days=7):
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat(timespec="seconds")
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM notification_outbox WHERE status = 'delivered' AND delivered_at < ?", (cutoff,))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def outbox_counts():
+    """
+    Row counts per destination and status, as a DataFrame.
+    """
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, """
+        SELECT destination, status, COUNT(*) AS count, SUM(coalesced) AS coalesced
+        FROM notification_outbox GROUP BY destination, status ORDER BY destination, status
+    """)
+    conn.close()
+    return df
+
+def list_outbox(status=None, destination=None, limit=100):
+    clauses = []
+    params = []
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if destination:
+        clauses.append("destination = ?")
+        params.append(destination)
+    where = " AND ".join(clauses) or "1 = 1"
+    params.append(int(limit))
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, f"""
+        SELECT id, destination, event, coalesce_key, status, attempts, coalesced, created_at, delivered_at, last_error
+        FROM notification_outbox WHERE {where} ORDER BY id DESC LIMIT ?
+    """, params)
+    conn.close()
+    return df
@@ -0,0 +1,311 @@
+"""
+Roles, teams and grants, compiled into per-user row filters.
+
+A grant gives a subject (a role, a team or a single user) a scope on a
+resource table:
+
+    all        every row
+    own        rows the user reported or is assigned to
+    team       rows reported by or assigned to anyone in the user's teams
+    attribute  rows where column_name = value (e.g. category = Network)
+
+A user's grants are OR-ed and compiled into a Policy: a parameterized SQL
+condition that the incident and ticket query functions add to their WHERE
+clause (scope=...), so SQLite filters with the owner-column indexes instead
+of pandas filtering a full load. Team member lists are resolved at compile
+time. Compiled policies are cached per process and rebuilt when any
+permission table or users row changes (cache_generations "permissions" and
+"users").
+"""
+import threading
+from app.data.db import connect_database, read_frame, insert_or_ignore_sql
+from app.data.incidents import INCIDENT_COLUMNS
+from app.data.tickets import TICKET_COLUMNS
+from app.services.metrics import CACHE_REQUESTS
+
+SUBJECT_TYPES = ("role", "team", "user")
+SCOPES = ("all", "team", "own", "attribute")
+# Resource table -> (columns naming the row's owners, columns attribute grants may use)
+RESOURCES = {
+    "cyber_incidents": (("reported_by", "assigned_to"), INCIDENT_COLUMNS),
+    "it_tickets": (("assigned_to",), TICKET_COLUMNS),
+}
+DEFAULT_ROLES = {
+    "admin": "Full access and user management",
+    "manager": "Sees everything handled by their teams",
+    "analyst": "Sees only records they reported or are assigned to",
+    "user": "Sees all records",
+}
+DEFAULT_GRANTS = [
+    (role, resource, scope)
+    for role, scope in (("admin", "all"), ("manager", "team"), ("analyst", "own"), ("user", "all"))
+    for resource in RESOURCES
+]
+
+_policies = {}
+_lock = threading.Lock()
+
+
+class Policy:
+    """
+    Compiled row filter for one user on one resource. `where` is None when
+    every row is visible.
+    """
+    def __init__(self, resource, where, params=()):
+        self.resource = resource
+        self.where = where
+        self.params = tuple(params)
+
+    @property
+    def restricted(self):
+        return self.where is not None
+
+    @property
+    def key(self):
+        """
+        Hashable identity: users with the same effective policy share it.
+        """
+        return (self.resource, self.where, self.params)
+
+    def __repr__(self):
+        return f"Policy({self.resource!r}, {self.where!r}, {self.params!r})"
+
+
+def seed_permissions():
+    """
+    Create the default roles and their grants if missing. Safe to run repeatedly.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.executemany(insert_or_ignore_sql("roles", ("name", "description")), DEFAULT_ROLES.items())
+    cursor.execute("SELECT COUNT(*) FROM grants")
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany(
+            insert_or_ignore_sql("grants", ("subject_type", "subject", "resource", "scope")),
+            [("role", role, resource, scope) for role, resource, scope in DEFAULT_GRANTS],
+        )
+    conn.commit()
+    conn.close()
+
+def list_roles():
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM roles ORDER BY name")
+    roles = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    return roles
+
+def list_teams():
+    """
+    Return teams with their members (comma-separated) as a DataFrame.
+    """
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, """
+        SELECT t.id, t.name, m.username
+        FROM teams t LEFT JOIN team_members m ON m.team_id = t.id
+        ORDER BY t.name, m.username
+    """)
+    conn.close()
+    # Joined in pandas: GROUP_CONCAT is SQLite-only (PostgreSQL has string_agg)
+    return df.groupby(["id", "name"], sort=False).agg(
+        member_count=("username", "count"),
+        members=("username", lambda names: ", ".join(names.dropna()) or None),
+    ).reset_index()
+
+def create_team(name):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO teams (name) VALUES (?)", (name,))
+    conn.commit()
+    lastid = cursor.lastrowid
+    conn.close()
+    return lastid
+
+def delete_team(team_id):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM teams WHERE id = ?", (team_id,))
+    row = cursor.fetchone()
+    cursor.execute("DELETE FROM team_members WHERE team_id = ?", (team_id,))
+    if row:
+        cursor.execute("DELETE FROM grants WHERE subject_type = 'team' AND subject = ?", (row[0],))
+    cursor.execute("DELETE FROM teams WHERE id = ?", (team_id,))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def add_team_member(team_id, username):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(insert_or_ignore_sql("team_members", ("team_id", "username")), (team_id, username))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def remove_team_member(team_id, username):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM team_members WHERE team_id = ? AND username = ?", (team_id, username))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def list_grants():
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, """
+        SELECT id, subject_type, subject, resource, scope, column_name, value
+        FROM grants ORDER BY resource, subject_type, subject
+    """)
+    conn.close()
+    return df
+
+def add_grant(subject_type, subject, resource, scope, column_name="", value=""):
+    """
+    Grant `subject` a scope on `resource`. Attribute grants need a column
+    of that resource and a value. Returns 1 if added, 0 if it already existed.
+    """
+    if subject_type not in SUBJECT_TYPES:
+        raise ValueError(f"Unknown subject type: {subject_type}")
+    if resource not in RESOURCES:
+        raise ValueError(f"Unknown resource: {resource}")
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown scope: {scope}")
+    if scope == "attribute":
+        if column_name not in RESOURCES[resource][1]:
+            raise ValueError(f"Unknown column: {column_name}")
+        if value in (None, ""):
+            raise ValueError("An attribute grant needs a value.")
+    else:
+        column_name, value = "", ""
+
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute(
+        insert_or_ignore_sql("grants", ("subject_type", "subject", "resource", "scope", "column_name", "value")),
+        (subject_type, subject, resource, scope, column_name, str(value)),
+    )
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def delete_grant(grant_id):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM grants WHERE id = ?", (grant_id,))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+
+def _in(column, values, params):
+    params.extend(values)
+    return f"{column} IN ({', '.join('?' for _ in values)})"
+
+def compile_policy(username, resource):
+    """
+    Build the Policy for `username` on `resource` from the current grants.
+    Unknown users and users without any grant see nothing.
+    """
+    owner_columns, attribute_columns = RESOURCES[resource]
+    conn = connect_database(read_only=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT role FROM users WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        if row is None:
+            return Policy(resource, "0 = 1")
+        role = row[0] or "user"
+
+        cursor.execute("""
+            SELECT t.id, t.name FROM teams t JOIN team_members m ON m.team_id = t.id
+            WHERE m.username = ?
+        """, (username,))
+        teams = cursor.fetchall()
+        team_ids = [team[0] for team in teams]
+        team_names = [team[1] for team in teams]
+
+        subjects = ["(subject_type = 'role' AND subject = ?)", "(subject_type = 'user' AND subject = ?)"]
+        params = [role, username]
+        if team_names:
+            subjects.append(f"(subject_type = 'team' AND {_in('subject', team_names, params)})")
+        cursor.execute(f"""
+            SELECT DISTINCT scope, column_name, value FROM grants
+            WHERE resource = ? AND ({' OR '.join(subjects)})
+            ORDER BY scope, column_name, value
+        """, [resource] + params)
+        grants = cursor.fetchall()
+
+        members = []
+        if team_ids and any(grant[0] == "team" for grant in grants):
+            placeholders = ", ".join("?" for _ in team_ids)
+            cursor.execute(
+                f"SELECT DISTINCT username FROM team_members WHERE team_id IN ({placeholders}) ORDER BY username",
+                team_ids,
+            )
+            members = [member[0] for member in cursor.fetchall()]
+    finally:
+        conn.close()
+
+    if any(scope == "all" for scope, _, _ in grants):
+        return Policy(resource, None)
+
+    # {condition: params}; each condition tests one indexed column, so
+    # SQLite can answer the OR with one index lookup per term
+    conditions = {}
+    attributes = {}
+    for scope, column_name, value in grants:
+        if scope == "own" or (scope == "team" and not members):
+            # Without teams, a team grant still covers the user's own rows
+            for column in owner_columns:
+                conditions[f"{column} = ?"] = [username]
+        elif scope == "team":
+            for column in owner_columns:
+                params = []
+                conditions[_in(column, members, params)] = params
+        elif scope == "attribute" and column_name in attribute_columns:
+            attributes.setdefault(column_name, []).append(value)
+    for column, values in attributes.items():
+        params = []
+        conditions[_in(column, values, params)] = params
+
+    if not conditions:
+        return Policy(resource, "0 = 1")
+    return Policy(
+        resource,
+        " OR ".join(conditions),
+        [param for params in conditions.values() for param in params],
+    )
+
+def _generation():
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, generation FROM cache_generations WHERE name IN ('permissions', 'users')")
+    generations = dict(cursor.fetchall())
+    conn.close()
+    return generations.get("permissions", 0), generations.get("users", 0)
+
+def get_policy(username, resource):
+    """
+    The compiled Policy for `username` on `resource`, reused until a
+    permission table or the users table changes.
+    """
+    generation = _generation()
+    key = (username, resource)
+    entry = _policies.get(key)
+    if entry and entry[0] == generation:
+        CACHE_REQUESTS.inc(name="permissions", result="hit")
+        return entry[1]
+    CACHE_REQUESTS.inc(name="permissions", result="miss")
+    policy = compile_policy(username, resource)
+    with _lock:
+        _policies[key] = (generation, policy)
+    return policy
+
+def clear_policy_cache():
+    with _lock:
+        _policies.clear()
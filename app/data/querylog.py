@@ -0,0 +1,237 @@
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from pathlib import Path
+from app.services.metrics import DB_QUERY_SECONDS
+
+# Set QUERY_INSTRUMENTATION=0 to open plain connections with no bookkeeping
+ENABLED = os.environ.get("QUERY_INSTRUMENTATION", "1") != "0"
+# Statements slower than this (execute + fetch) go to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = Path(os.environ.get(
+    "SLOW_QUERY_LOG", Path(__file__).resolve().parents[2] / "DATA" / "slow_queries.log"
+))
+# How many slow statements (with plans) to keep in memory for the admin page
+RECENT_SLOW_LIMIT = 200
+
+_stats = {}
+_recent_slow = []
+_lock = threading.Lock()
+_logger = None
+
+_INTERNAL_MODULES = ("app.data.db", "app.data.backends", "app.data.querylog")
+
+def fingerprint(sql):
+    """
+    Normalise a statement so calls differing only in literals or IN-list
+    length aggregate together.
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+def _caller():
+    """
+    Name the first app function outside the data-access plumbing, e.g.
+    "app.data.incidents.get_all_incidents" or "pages/Cyber.py:_load_incidents".
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and module not in _INTERNAL_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        filename = frame.f_code.co_filename
+        if "pages" in Path(filename).parts:
+            return f"pages/{Path(filename).name}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _slow_logger():
+    global _logger
+    if _logger is None:
+        _logger = logging.getLogger("app.slow_queries")
+        if not _logger.handlers:
+            SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+    return _logger
+
+def _explain(conn, sql, params):
+    if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+        return ""
+    try:
+        # A plain sqlite3.Cursor so the EXPLAIN itself isn't recorded
+        cursor = sqlite3.Cursor(conn)
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+        return "; ".join(row[3] for row in cursor.fetchall())
+    except sqlite3.Error as e:
+        return f"(plan unavailable: {e})"
+
+def record(sql, duration, rows, caller, conn=None, params=None):
+    """
+    Add one execution to the per-fingerprint totals and log it if slow.
+    """
+    key = fingerprint(sql)
+    with _lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {
+                "fingerprint": key,
+                "calls": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "rows": 0,
+                "callers": {},
+            }
+        ms = duration * 1000
+        entry["calls"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["rows"] += rows
+        entry["callers"][caller] = entry["callers"].get(caller, 0) + 1
+    DB_QUERY_SECONDS.observe(duration, caller=caller)
+
+    if ms >= SLOW_QUERY_MS:
+        plan = _explain(conn, sql, params) if conn is not None else ""
+        slow = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(ms, 2),
+            "rows": rows,
+            "caller": caller,
+            "sql": re.sub(r"\s+", " ", sql).strip(),
+            "plan": plan,
+        }
+        with _lock:
+            _recent_slow.append(slow)
+            del _recent_slow[:-RECENT_SLOW_LIMIT]
+        _slow_logger().info(
+            "%.1fms rows=%d caller=%s sql=%s plan=%s", ms, rows, caller, slow["sql"], plan
+        )
+
+def top_queries(limit=20, order_by="total_ms"):
+    """
+    Return aggregated stats sorted by `order_by` (total_ms, calls, max_ms or rows).
+    """
+    with _lock:
+        entries = [dict(entry, callers=dict(entry["callers"])) for entry in _stats.values()]
+    for entry in entries:
+        entry["mean_ms"] = entry["total_ms"] / entry["calls"]
+    entries.sort(key=lambda entry: entry[order_by], reverse=True)
+    return entries[:limit]
+
+def recent_slow_queries():
+    with _lock:
+        return list(reversed(_recent_slow))
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+        _recent_slow.clear()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times each statement from execute() through its last fetch,
+    so lazily-stepped SELECTs are charged for the rows they actually return.
+    """
+    _pending = None
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            sql, params, rows, caller, elapsed = pending
+            record(sql, elapsed, rows, caller, self.connection, params)
+
+    def execute(self, sql, params=()):
+        self._finish()
+        caller = _caller()
+        start = time.perf_counter()
+        super().execute(sql, params)
+        elapsed = time.perf_counter() - start
+        rows = 0 if self.description is not None else max(self.rowcount, 0)
+        self._pending = [sql, params, rows, caller, elapsed]
+        if self.description is None:
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        caller = _caller()
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_params)
+        record(sql, time.perf_counter() - start, max(self.rowcount, 0), caller)
+        return self
+
+    def _fetched(self, rows, start):
+        if self._pending is not None:
+            self._pending[2] += rows
+            self._pending[4] += time.perf_counter() - start
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(1 if row is not None else 0, start)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), start)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors (including those behind conn.execute and
+    pandas.read_sql_query) are InstrumentedCursors. Statements whose rows were
+    never fully fetched are recorded when the connection closes.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=InstrumentedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    # sqlite3.Connection.execute* create their cursors in C without calling
+    # cursor(), so route them through it to get instrumented cursors
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        for cursor in list(self._cursors):
+            cursor._finish()
+        super().close()
@@ -1,8 +1,8 @@
-import sqlite3
+from app.data.db import get_backend, translate_ddl
 
 def create_users_table(conn): 
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(translate_ddl("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT NOT NULL UNIQUE,
@@ -10,12 +10,12 @@ def create_users_table(conn):
             role TEXT DEFAULT 'user',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """)
+    """))
     conn.commit() 
 
 def create_cyber_incidents_table(conn):
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(translate_ddl("""
         CREATE TABLE IF NOT EXISTS cyber_incidents (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             date TEXT,
@@ -25,14 +25,16 @@ def create_cyber_incidents_table(conn):
             description TEXT,
             reported_by TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            assigned_to TEXT,
+            deleted_at TEXT,
             FOREIGN KEY(reported_by) REFERENCES users(username) ON DELETE SET NULL
         )
-    """)
+    """))
     conn.commit()
 
 def create_datasets_metadata_table(conn):
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(translate_ddl("""
         CREATE TABLE IF NOT EXISTS datasets_metadata (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             dataset_name TEXT NOT NULL,
@@ -41,14 +43,20 @@ def create_datasets_metadata_table(conn):
             last_updated TEXT,
             record_count INTEGER,
             file_size_mb REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            uploaded_by TEXT,
+            file_path TEXT,
+            file_format TEXT,
+            column_count INTEGER,
+            column_profile TEXT,
+            table_name TEXT
         )
-    """)
+    """))
     conn.commit() 
 
 def create_it_tickets_table(conn): 
     cursor = conn.cursor()
-    cursor.execute("""
+    cursor.execute(translate_ddl("""
         CREATE TABLE IF NOT EXISTS it_tickets (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             ticket_id TEXT UNIQUE NOT NULL,
@@ -60,13 +68,359 @@ def create_it_tickets_table(conn):
             created_date TEXT,
             resolved_date TEXT,
             assigned_to TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            deleted_at TEXT
+        )
+    """))
+    conn.commit()
+
+def create_change_log_table(conn):
+    """
+    Change-data-capture log. Triggers on cyber_incidents and it_tickets append
+    one row per insert/update/delete; seq only ever increases (AUTOINCREMENT
+    never reuses values), so readers can poll with changes_since(seq).
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log(table_name, seq)")
+    for table in ("cyber_incidents", "it_tickets"):
+        for operation, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            get_backend().create_trigger(
+                cursor, f"{table}_cdc_{operation.lower()}", table, operation,
+                f"INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', {ref}.id, '{operation}')",
+            )
+    conn.commit()
+
+def create_cache_generations_table(conn):
+    """
+    Per-table generation counters bumped by triggers on every write.
+    Processes compare generations to know when their cached frames are stale.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS cache_generations (
+            name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL DEFAULT 0
+        )
+    """))
+    for table in ("users", "cyber_incidents", "datasets_metadata", "it_tickets"):
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            get_backend().create_trigger(
+                cursor, f"{table}_generation_{operation.lower()}", table, operation,
+                f"INSERT INTO cache_generations (name, generation) VALUES ('{table}', 1) "
+                f"ON CONFLICT(name) DO UPDATE SET generation = cache_generations.generation + 1",
+            )
+    conn.commit()
+
+def create_anomaly_tables(conn):
+    """
+    State for the incident anomaly job (app/services/anomaly.py): the id
+    watermark, per incident_type/severity EWMA statistics, counts for hours
+    not yet closed, and the alerts it raises.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS job_watermarks (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            closed_through INTEGER
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS anomaly_stats (
+            incident_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            mean REAL NOT NULL,
+            var REAL NOT NULL,
+            hours INTEGER NOT NULL,
+            PRIMARY KEY (incident_type, severity)
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS anomaly_pending (
+            incident_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (incident_type, severity, hour)
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            bucket_start TEXT NOT NULL,
+            observed INTEGER NOT NULL,
+            expected REAL NOT NULL,
+            zscore REAL NOT NULL,
+            status TEXT DEFAULT 'open',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (incident_type, severity, bucket_start)
+        )
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts(status, bucket_start)")
+    conn.commit()
+
+def create_similarity_tables(conn):
+    """
+    MinHash signatures and LSH buckets for near-duplicate ticket lookup
+    (app/data/similarity.py), plus AI analyses cached per ticket so
+    duplicates can reuse them.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS ticket_signatures (
+            row_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS ticket_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            row_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, row_id)
+        ) WITHOUT ROWID
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS ticket_analyses (
+            row_id INTEGER PRIMARY KEY,
+            model TEXT,
+            analysis TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.commit()
+
+def create_ai_usage_table(conn):
+    """
+    AI tokens used per user per UTC day, for the daily budgets enforced by
+    app/services/prompts.py.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            username TEXT NOT NULL,
+            day TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 0,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            response_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, day)
+        )
+    """))
+    conn.commit()
+
+def create_login_failures_table(conn):
+    """
+    Recent failed logins per throttle key ("user:<name>" or "client:<address>"),
+    shared by every process; see LoginThrottle in app/services/user_service.py.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS login_failures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            throttle_key TEXT NOT NULL,
+            failed_at REAL NOT NULL
+        )
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_login_failures_key ON login_failures(throttle_key, failed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_login_failures_failed_at ON login_failures(failed_at)")
+    conn.commit()
+
+def create_permission_tables(conn):
+    """
+    Roles, teams and the grants that decide which incidents and tickets a
+    user sees (app/data/permissions.py). Any change bumps the "permissions"
+    cache generation so compiled policies are rebuilt in every process.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS roles (
+            name TEXT PRIMARY KEY,
+            description TEXT
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    """)
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS team_members (
+            team_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            PRIMARY KEY (team_id, username),
+            FOREIGN KEY(team_id) REFERENCES teams(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_team_members_username ON team_members(username)")
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS grants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject_type TEXT NOT NULL CHECK (subject_type IN ('role', 'team', 'user')),
+            subject TEXT NOT NULL,
+            resource TEXT NOT NULL,
+            scope TEXT NOT NULL CHECK (scope IN ('all', 'team', 'own', 'attribute')),
+            column_name TEXT NOT NULL DEFAULT '',
+            value TEXT NOT NULL DEFAULT '',
+            UNIQUE (subject_type, subject, resource, scope, column_name, value)
+        )
+    """))
+    for table in ("roles", "teams", "team_members", "grants"):
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            get_backend().create_trigger(
+                cursor, f"{table}_permissions_{operation.lower()}", table, operation,
+                "INSERT INTO cache_generations (name, generation) VALUES ('permissions', 1) "
+                "ON CONFLICT(name) DO UPDATE SET generation = cache_generations.generation + 1",
+            )
+    conn.commit()
+
+def create_audit_log_table(conn):
+    """
+    Append-only record of who created, updated or deleted incidents and
+    tickets, with the per-field before/after values (app/data/audit.py).
+    Triggers reject any UPDATE or DELETE of existing entries.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            occurred_at TEXT NOT NULL,
+            actor TEXT NOT NULL,
+            action TEXT NOT NULL CHECK (action IN ('create', 'update', 'delete')),
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            changes TEXT NOT NULL
+        )
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_actor ON audit_log(actor, occurred_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log(entity, entity_id, occurred_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_occurred_at ON audit_log(occurred_at)")
+    for operation in ("UPDATE", "DELETE"):
+        get_backend().create_trigger(
+            cursor, f"audit_log_append_only_{operation.lower()}", "audit_log", operation,
+            get_backend().raise_sql("audit_log is append-only"),
+        )
+    conn.commit()
+
+def create_maintenance_log_table(conn):
+    """
+    One row per storage maintenance task run (app/services/maintenance.py),
+    so every process schedules from the same history.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            seconds REAL NOT NULL,
+            detail TEXT
+        )
+    """))
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)")
+    conn.commit()
+
+def create_api_tokens_table(conn):
+    """
+    Bearer tokens for the REST API (app/api.py); only a SHA-256 of each
+    token is stored. Any change bumps the "api_tokens" cache generation so
+    every API process drops its token cache.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_hash TEXT NOT NULL UNIQUE,
+            username TEXT NOT NULL,
+            name TEXT,
+            created_at TEXT NOT NULL,
+            revoked_at TEXT,
+            FOREIGN KEY (username) REFERENCES users(username)
+        )
+    """))
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        get_backend().create_trigger(
+            cursor, f"api_tokens_generation_{operation.lower()}", "api_tokens", operation,
+            "INSERT INTO cache_generations (name, generation) VALUES ('api_tokens', 1) "
+            "ON CONFLICT(name) DO UPDATE SET generation = cache_generations.generation + 1",
+        )
+    conn.commit()
+
+def create_notification_tables(conn):
+    """
+    Webhook destinations and the transactional outbox of notifications for
+    them (app/data/notifications.py). Incident writes add outbox rows in
+    their own transaction; the dispatcher (app/services/notifications.py)
+    delivers them. The partial unique index lets a newer event for the same
+    incident replace one still waiting to be sent.
+    """
+    cursor = conn.cursor()
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS webhook_destinations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            url TEXT NOT NULL,
+            secret TEXT,
+            batch_size INTEGER NOT NULL DEFAULT 50,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL
+        )
+    """))
+    cursor.execute(translate_ddl("""
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destination TEXT NOT NULL,
+            event TEXT NOT NULL,
+            coalesce_key TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending'
+                CHECK (status IN ('pending', 'sending', 'delivered', 'dead')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            coalesced INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            claim_token TEXT,
+            lease_until REAL,
+            created_at TEXT NOT NULL,
+            delivered_at TEXT,
+            last_error TEXT
+        )
+    """))
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_pending_key "
+        "ON notification_outbox(destination, coalesce_key) WHERE status = 'pending'"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_due ON notification_outbox(destination, status, next_attempt_at)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_claim ON notification_outbox(claim_token)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON notification_outbox(status, created_at)")
     conn.commit()
 
 def create_all_tables(conn):
     create_users_table(conn)
     create_cyber_incidents_table(conn)
     create_datasets_metadata_table(conn)
-    create_it_tickets_table(conn)
\ No newline at end of file
+    create_it_tickets_table(conn)
+    create_change_log_table(conn)
+    create_cache_generations_table(conn)
+    create_anomaly_tables(conn)
+    create_similarity_tables(conn)
+    create_ai_usage_table(conn)
+    create_permission_tables(conn)
+    create_login_failures_table(conn)
+    create_audit_log_table(conn)
+    create_maintenance_log_table(conn)
+    create_api_tokens_table(conn)
+    create_notification_tables(conn)
@@ -0,0 +1,281 @@
+"""
+MinHash/LSH index over it_tickets subject + description for finding
+duplicate and near-duplicate tickets.
+
+Each ticket gets a NUM_PERM-value MinHash signature of its word unigrams and
+bigrams (ticket_signatures). The signature is cut into BANDS bands whose
+hashes go into ticket_lsh, so tickets sharing any band are candidates; their
+Jaccard similarity is then estimated from the stored signatures. With 16
+bands of 2 rows, a pair at 0.5 similarity becomes a candidate ~99% of the
+time (~78% at 0.3).
+
+The write functions in app/data/tickets.py keep the index current in the
+same transaction as the ticket change.
+"""
+import re
+import zlib
+import numpy as np
+import pandas as pd
+from app.data.db import connect_database, chunked, scope_clause
+
+NUM_PERM = 32
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Candidates read per band; templated tickets can share a bucket with most
+# of the table, and the newest few are as good as any
+MAX_CANDIDATES_PER_BAND = 50
+# Candidates sharing the most bands whose signatures are compared exactly
+RERANK_CANDIDATES = 40
+# Tickets signed per numpy batch when (re)indexing
+BATCH_SIZE = 20000
+RESULT_COLUMNS = ["id", "ticket_id", "subject", "description", "status", "priority", "has_analysis", "similarity"]
+
+_PRIME = 4294967291  # largest prime below 2**32
+# Signature stored for tickets without any words, so they count as indexed
+_EMPTY = np.full(NUM_PERM, 2**32 - 1, dtype=np.uint32)
+# Fixed seed: signatures are persisted, so the permutations must never change
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_WEIGHTS = _rng.integers(1, 2**63, ROWS_PER_BAND, dtype=np.uint64)
+
+def ticket_text(subject, description):
+    return " ".join(part for part in (subject, description) if part)
+
+def shingles(text):
+    """
+    Stable 32-bit hashes of the lower-cased word unigrams and bigrams in `text`.
+    """
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    grams = set(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+
+def signatures(texts):
+    """
+    MinHash signatures (len(texts) x NUM_PERM, uint32) for a batch of texts,
+    computed with one vectorised pass over all their shingles. Texts without
+    any words get the _EMPTY signature.
+    """
+    hashes = []
+    offsets = []
+    has_words = np.zeros(len(texts), dtype=bool)
+    for i, text in enumerate(texts):
+        grams = shingles(text)
+        if grams:
+            offsets.append(len(hashes))
+            hashes.extend(grams)
+            has_words[i] = True
+
+    result = np.tile(_EMPTY, (len(texts), 1))
+    if hashes:
+        x = np.asarray(hashes, dtype=np.uint64)[:, None]
+        values = (x * _A + _B) % _PRIME
+        result[has_words] = np.minimum.reduceat(values, offsets, axis=0)
+    return result
+
+def band_keys(signatures):
+    """
+    Signed 64-bit bucket keys, one per band, for a signature or a
+    (n x NUM_PERM) batch of them.
+    """
+    bands = signatures.astype(np.uint64).reshape(-1, BANDS, ROWS_PER_BAND)
+    keys = (bands * _BAND_WEIGHTS).sum(axis=2).view(np.int64)
+    return keys[0] if signatures.ndim == 1 else keys
+
+def _is_empty(signatures):
+    return (signatures == _EMPTY).all(axis=-1)
+
+def _stored_signatures(cursor, row_ids):
+    found = {}
+    for chunk in chunked(list(row_ids)):
+        cursor.execute(
+            f"SELECT row_id, signature FROM ticket_signatures WHERE row_id IN ({', '.join('?' for _ in chunk)})",
+            chunk,
+        )
+        for row_id, blob in cursor.fetchall():
+            found[row_id] = np.frombuffer(bytes(blob), dtype=np.uint32)
+    return found
+
+def _remove_signatures(cursor, row_ids):
+    old = _stored_signatures(cursor, row_ids)
+    cursor.executemany(
+        "DELETE FROM ticket_lsh WHERE band = ? AND bucket = ? AND row_id = ?",
+        [
+            (band, key, row_id)
+            for row_id, signature in old.items() if not _is_empty(signature)
+            for band, key in enumerate(band_keys(signature).tolist())
+        ],
+    )
+    for chunk in chunked(list(old)):
+        cursor.execute(f"DELETE FROM ticket_signatures WHERE row_id IN ({', '.join('?' for _ in chunk)})", chunk)
+
+def unindex_tickets(cursor, row_ids):
+    """
+    Remove tickets (by it_tickets.id) from the index and drop their cached
+    analyses, which no longer match once a ticket's text changes. Runs on
+    the caller's cursor so it shares its transaction.
+    """
+    row_ids = list(row_ids)
+    _remove_signatures(cursor, row_ids)
+    for chunk in chunked(row_ids):
+        cursor.execute(f"DELETE FROM ticket_analyses WHERE row_id IN ({', '.join('?' for _ in chunk)})", chunk)
+
+def index_tickets(cursor, rows):
+    """
+    (Re)index tickets given as (row_id, subject, description) tuples, on the
+    caller's cursor. Returns the number of tickets indexed.
+    """
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            count += _index_batch(cursor, batch)
+            batch = []
+    if batch:
+        count += _index_batch(cursor, batch)
+    return count
+
+def _index_batch(cursor, rows):
+    row_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    _remove_signatures(cursor, row_ids.tolist())
+    sigs = signatures([ticket_text(subject, description) for _, subject, description in rows])
+    cursor.executemany(
+        "INSERT INTO ticket_signatures (row_id, signature) VALUES (?, ?)",
+        zip(row_ids.tolist(), (signature.tobytes() for signature in sigs)),
+    )
+
+    # Tickets without words have nothing to match on and get no buckets
+    indexed = ~_is_empty(sigs)
+    keys = band_keys(sigs[indexed]).ravel()
+    bands = np.tile(np.arange(BANDS), indexed.sum())
+    ids = np.repeat(row_ids[indexed], BANDS)
+    # Key order turns random B-tree inserts into mostly sequential ones
+    order = np.lexsort((ids, keys, bands))
+    cursor.executemany(
+        "INSERT INTO ticket_lsh (band, bucket, row_id) VALUES (?, ?, ?)",
+        zip(bands[order].tolist(), keys[order].tolist(), ids[order].tolist()),
+    )
+    return len(rows)
+
+def index_missing_tickets():
+    """
+    Index every ticket that has no signature yet (e.g. rows migrated from
+    CSV or written before the index existed). Returns how many were indexed.
+    """
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT t.id, t.subject, t.description FROM it_tickets t
+            LEFT JOIN ticket_signatures s ON s.row_id = t.id
+            WHERE s.row_id IS NULL
+        """)
+        count = index_tickets(cursor, cursor.fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+def rebuild_similarity_index():
+    """
+    Drop and rebuild the whole index in one transaction.
+    """
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM ticket_lsh")
+        cursor.execute("DELETE FROM ticket_signatures")
+        cursor.execute("SELECT id, subject, description FROM it_tickets")
+        count = index_tickets(cursor, cursor.fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+def _similar(conn, signature, k, min_similarity, exclude=None, scope=None):
+    keys = band_keys(signature).tolist()
+    subqueries = " UNION ALL ".join(
+        "SELECT * FROM (SELECT row_id FROM ticket_lsh WHERE band = ? AND bucket = ? ORDER BY row_id DESC LIMIT ?)"
+        for _ in keys
+    )
+    params = []
+    for band, key in enumerate(keys):
+        params.extend((band, key, MAX_CANDIDATES_PER_BAND))
+    # Shared bands grow with similarity (~BANDS * J^ROWS_PER_BAND), so the
+    # most-shared candidates are the only ones worth comparing in full
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT row_id FROM ({subqueries})
+        WHERE row_id != ?
+        GROUP BY row_id ORDER BY COUNT(*) DESC, row_id DESC LIMIT ?
+    """, params + [exclude if exclude is not None else -1, max(RERANK_CANDIDATES, k)])
+    candidates = [row[0] for row in cursor.fetchall()]
+    if not candidates:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    stored = _stored_signatures(cursor, candidates)
+    scores = {
+        row_id: float((candidate == signature).mean()) for row_id, candidate in stored.items()
+    }
+    best = sorted(
+        (row_id for row_id, score in scores.items() if score >= min_similarity),
+        key=lambda row_id: (scores[row_id], row_id), reverse=True,
+    )
+    if not best:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    # Every passing candidate is looked up so rows hidden by `scope` can be
+    # replaced by the next most similar visible ones
+    params = list(best)
+    cursor.execute(f"""
+        SELECT t.id, t.ticket_id, t.subject, t.description, t.status, t.priority,
+               a.analysis IS NOT NULL AS has_analysis
+        FROM it_tickets t LEFT JOIN ticket_analyses a ON a.row_id = t.id
+        WHERE t.id IN ({', '.join('?' for _ in best)}) AND t.deleted_at IS NULL AND {scope_clause(scope, params)}
+    """, params)
+    found = {row[0]: tuple(row) for row in cursor.fetchall()}
+    return pd.DataFrame.from_records(
+        [found[row_id] + (round(scores[row_id], 3),) for row_id in best if row_id in found][:k],
+        columns=RESULT_COLUMNS,
+    )
+
+def find_similar_tickets(ticket_id, k=5, min_similarity=0.5, scope=None):
+    """
+    Return up to `k` other tickets whose estimated similarity to `ticket_id`
+    is at least `min_similarity`, most similar first, as a DataFrame with a
+    `similarity` column (0-1) and `has_analysis` (a cached AI analysis exists).
+    `scope` (a permissions Policy) limits the results to tickets it allows.
+    """
+    conn = connect_database(read_only=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT t.id, s.signature FROM it_tickets t
+            JOIN ticket_signatures s ON s.row_id = t.id
+            WHERE t.ticket_id = ?
+        """, (ticket_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        signature = np.frombuffer(bytes(row[1]), dtype=np.uint32)
+        if _is_empty(signature):
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        return _similar(conn, signature, k, min_similarity, exclude=row[0], scope=scope)
+    finally:
+        conn.close()
+
+def find_similar_text(text, k=5, min_similarity=0.5, scope=None):
+    """
+    Like find_similar_tickets() for text that is not (yet) a ticket, e.g. a
+    description being typed into the create form.
+    """
+    signature = signatures([text])[0]
+    if _is_empty(signature):
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    conn = connect_database(read_only=True)
+    try:
+        return _similar(conn, signature, k, min_similarity, scope=scope)
+    finally:
+        conn.close()
@@ -1,20 +1,36 @@
-from app.data.db import connect_database
+from app.data.db import (
+    connect_database, read_frame, table_columns, chunked, build_set_clause, build_where_clause, scope_clause, utc_now,
+    begin_write,
+)
+from app.data.similarity import index_tickets, unindex_tickets
+from app.data.audit import capture, record_write
 import pandas as pd
 
+TICKET_COLUMNS = ("ticket_id", "priority", "status", "category", "subject", "description", "created_date", "resolved_date", "assigned_to")
+
 
 def ensure_ticket_schema():
     """
-    Add missing columns (e.g., subject) to it_tickets table for older DBs.
+    Add missing columns (e.g., subject, deleted_at) to it_tickets table for
+    older DBs, and the indexes the permission filters and retention use.
     Safe to run repeatedly.
     """
     conn = connect_database()
     cursor = conn.cursor()
 
-    cursor.execute("PRAGMA table_info(it_tickets)")
-    cols = [row[1] for row in cursor.fetchall()]
+    cols = table_columns(conn, "it_tickets")
 
     if "subject" not in cols:
         cursor.execute("ALTER TABLE it_tickets ADD COLUMN subject TEXT")
+    if "deleted_at" not in cols:
+        cursor.execute("ALTER TABLE it_tickets ADD COLUMN deleted_at TEXT")
+    # Used by the permission filters
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_assigned_to ON it_tickets(assigned_to)")
+    # Used by the retention job
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON it_tickets(status, created_date)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tickets_deleted_at ON it_tickets(deleted_at) WHERE deleted_at IS NOT NULL"
+    )
 
     conn.commit()
     conn.close()
@@ -54,37 +70,100 @@ def insert_ticket(ticket_id, priority, status, category, subject, description, c
         (ticket_id, priority, status, category, subject, description, created_date, assigned_to)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     """, (ticket_id, priority, status, category, subject, description, created_date, assigned_to))
-    conn.commit()
     lastid = cursor.lastrowid
+    index_tickets(cursor, [(lastid, subject, description)])
+    conn.commit()
     conn.close()
+    record_write("it_tickets", "create", [{
+        "ticket_id": ticket_id, "priority": priority, "status": status, "category": category, "subject": subject,
+        "description": description, "created_date": created_date, "assigned_to": assigned_to,
+    }])
     return lastid
 
-def get_all_tickets():
-    conn = connect_database()
-    df = pd.read_sql_query("SELECT * FROM it_tickets ORDER BY id DESC", conn)
+def get_all_tickets(scope=None):
+    """
+    Return every ticket `scope` (a permissions policy; None for all) may see, newest first.
+    Soft-deleted tickets are left out.
+    """
+    params = []
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, f"SELECT * FROM it_tickets WHERE deleted_at IS NULL AND {where} ORDER BY id DESC", params)
     conn.close()
     return df
 
-def get_ticket_by_id(ticket_id):
-    conn = connect_database()
+def get_tickets_page(scope=None, filters=None, before_id=None, limit=100):
+    """
+    One page of live tickets, newest first, as a DataFrame: those `scope`
+    may see that match `filters` ({column: value or list}) and have a row id
+    below `before_id`. Pass a page's last id as `before_id` for the next one.
+    """
+    where, params = build_where_clause(filters, TICKET_COLUMNS + ("id",))
+    clauses = [where] if where else []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(int(before_id))
+    clauses.append(scope_clause(scope, params))
+    params.append(int(limit))
+    conn = connect_database(read_only=True)
+    df = read_frame(conn, f"""
+        SELECT * FROM it_tickets WHERE deleted_at IS NULL AND {' AND '.join(clauses)}
+        ORDER BY id DESC LIMIT ?
+    """, params)
+    conn.close()
+    return df
+
+def get_tickets_by_row_ids(row_ids, scope=None):
+    """
+    Return the it_tickets rows whose integer primary key is in `row_ids` as a DataFrame.
+    """
+    conn = connect_database(read_only=True)
+    frames = []
+    for chunk in chunked(row_ids):
+        placeholders = ", ".join("?" for _ in chunk)
+        params = list(chunk)
+        where = scope_clause(scope, params)
+        frames.append(read_frame(
+            conn,
+            f"SELECT * FROM it_tickets WHERE id IN ({placeholders}) AND deleted_at IS NULL AND {where} ORDER BY id DESC",
+            params,
+        ))
+    conn.close()
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def get_ticket_by_id(ticket_id, scope=None):
+    params = [ticket_id]
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM it_tickets WHERE ticket_id = ?", (ticket_id,))
+    cursor.execute(f"SELECT * FROM it_tickets WHERE ticket_id = ? AND deleted_at IS NULL AND {where}", params)
     row = cursor.fetchone()
     conn.close()
     return row
 
-def update_ticket_status(ticket_id, new_status):
+def _target(ticket_id, scope):
+    # The ticket, if `scope` may see it
+    params = [ticket_id]
+    return f"ticket_id = ? AND {scope_clause(scope, params)}", params
+
+def update_ticket_status(ticket_id, new_status, scope=None):
+    where, target_params = _target(ticket_id, scope)
     conn = connect_database()
     cursor = conn.cursor()
-    cursor.execute("UPDATE it_tickets SET status = ? WHERE ticket_id = ?", (new_status, ticket_id))
+    before = capture(cursor, "it_tickets", where, target_params)
+    cursor.execute(f"UPDATE it_tickets SET status = ? WHERE {where}", [new_status] + target_params)
     conn.commit()
     count = cursor.rowcount
     conn.close()
+    record_write("it_tickets", "update", before, {"status": new_status})
     return count 
 
-def update_ticket(ticket_id, priority=None, status=None, category=None, subject=None, description=None, created_date=None, assigned_to=None, resolved_date=None):
+def update_ticket(ticket_id, priority=None, status=None, category=None, subject=None, description=None, created_date=None, assigned_to=None, resolved_date=None, scope=None):
     """ 
-    Update a ticket. Only provided fields will be updated
+    Update a ticket. Only provided fields will be updated.
+    Returns 0 if the ticket is outside `scope`.
     """
     conn = connect_database()
     cursor = conn.cursor()
@@ -118,21 +197,236 @@ def update_ticket(ticket_id, priority=None, status=None, category=None, subject=
         params.append(str(resolved_date))
     
     if updates:
-        params.append(ticket_id)
-        query = f"UPDATE it_tickets SET {', '.join(updates)} WHERE ticket_id = ?"
-        cursor.execute(query, params)
-        conn.commit()
+        fields = {update.split(" = ")[0]: value for update, value in zip(updates, params)}
+        where, target_params = _target(ticket_id, scope)
+        before = capture(cursor, "it_tickets", where, target_params)
+        query = f"UPDATE it_tickets SET {', '.join(updates)} WHERE {where}"
+        cursor.execute(query, params + target_params)
         count = cursor.rowcount
+        if count and (subject is not None or description is not None):
+            _reindex(cursor, "ticket_id = ?", [ticket_id])
+        conn.commit()
     else:
         count = 0 
     
     conn.close()
+    if count:
+        record_write("it_tickets", "update", before, fields)
     return count
 
-def delete_ticket(ticket_id):
+def delete_ticket(ticket_id, soft=False, scope=None):
+    """
+    Delete a ticket. With soft=True it is only tombstoned (deleted_at set):
+    hidden from every query, restorable, and archived by the retention job.
+    Returns 0 if the ticket is outside `scope`.
+    """
+    where, target_params = _target(ticket_id, scope)
+    conn = connect_database()
+    cursor = conn.cursor()
+    before = capture(cursor, "it_tickets", where, target_params)
+    if soft:
+        deleted_at = utc_now()
+        cursor.execute(
+            f"UPDATE it_tickets SET deleted_at = ? WHERE {where} AND deleted_at IS NULL", [deleted_at] + target_params
+        )
+    else:
+        _unindex(cursor, where, target_params)
+        cursor.execute(f"DELETE FROM it_tickets WHERE {where}", target_params)
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    if soft and count:
+        record_write("it_tickets", "update", before, {"deleted_at": deleted_at})
+    elif not soft:
+        record_write("it_tickets", "delete", before)
+    return count
+
+def restore_ticket(ticket_id, scope=None):
+    """
+    Undo a soft delete. Returns 0 if the ticket is not tombstoned or is
+    outside `scope`.
+    """
+    where, target_params = _target(ticket_id, scope)
+    where += " AND deleted_at IS NOT NULL"
     conn = connect_database()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM it_tickets WHERE ticket_id = ?", (ticket_id,))
+    before = capture(cursor, "it_tickets", where, target_params)
+    cursor.execute(f"UPDATE it_tickets SET deleted_at = NULL WHERE {where}", target_params)
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    record_write("it_tickets", "update", before, {"deleted_at": None})
+    return count
+
+def get_deleted_tickets(scope=None):
+    """
+    Return the soft-deleted tickets `scope` may see, most recently deleted first.
+    """
+    params = []
+    where = scope_clause(scope, params)
+    conn = connect_database(read_only=True)
+    df = read_frame(
+        conn, f"SELECT * FROM it_tickets WHERE deleted_at IS NOT NULL AND {where} ORDER BY deleted_at DESC", params
+    )
+    conn.close()
+    return df
+
+def bulk_insert_tickets(tickets):
+    """
+    Insert many tickets in a single transaction.
+    `tickets` is an iterable of dicts keyed by TICKET_COLUMNS.
+    Returns the number of rows inserted.
+    """
+    rows = [tuple(ticket.get(column) for column in TICKET_COLUMNS) for ticket in tickets]
+    if not rows:
+        return 0
+
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        # Other writers wait until commit, so every id above previous_max is one of ours
+        begin_write(conn, "it_tickets")
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM it_tickets")
+        previous_max = cursor.fetchone()[0]
+        cursor.executemany(f"""
+            INSERT INTO it_tickets
+            ({', '.join(TICKET_COLUMNS)})
+            VALUES ({', '.join('?' for _ in TICKET_COLUMNS)})
+        """, rows)
+        _reindex(cursor, "id > ?", [previous_max], drop_analyses=False)
+        created = capture(cursor, "it_tickets", "id > ?", [previous_max])
+        conn.commit()
+    finally:
+        conn.close()
+    record_write("it_tickets", "create", created)
+    return len(rows)
+
+def _reindex(cursor, where, params, drop_analyses=True):
+    # Keep the similarity index in step with changed subject/description
+    cursor.execute(f"SELECT id, subject, description FROM it_tickets WHERE {where}", params)
+    rows = cursor.fetchall()
+    if drop_analyses:
+        unindex_tickets(cursor, [row[0] for row in rows])
+    index_tickets(cursor, rows)
+
+def _unindex(cursor, where, params):
+    cursor.execute(f"SELECT id FROM it_tickets WHERE {where}", params)
+    unindex_tickets(cursor, [row[0] for row in cursor.fetchall()])
+
+def _bulk_where(ticket_ids, filters, scope=None):
+    if ticket_ids is None and not filters:
+        raise ValueError("Provide ticket_ids or filters for a bulk operation.")
+    where, params = build_where_clause(filters, TICKET_COLUMNS)
+    scope_params = []
+    # Soft-deleted tickets are never targeted
+    allowed = f"deleted_at IS NULL AND {scope_clause(scope, scope_params)}"
+    where = f"{where} AND {allowed}" if where else allowed
+    if ticket_ids is None:
+        return [(where, params + scope_params)]
+    # One statement per chunk of ids keeps each query under the parameter limit
+    clauses = []
+    for chunk in chunked(ticket_ids):
+        id_clause = f"ticket_id IN ({', '.join('?' for _ in chunk)})"
+        clauses.append((f"{id_clause} AND {where}", list(chunk) + params + scope_params))
+    return clauses
+
+def bulk_update_tickets(ticket_ids=None, filters=None, scope=None, **fields):
+    """
+    Update many tickets in one transaction.
+    Targets rows by `ticket_ids`, by `filters` ({column: value or list}), or both,
+    and never touches rows outside `scope`.
+    Only provided (non-None) fields are updated. Returns the number of rows changed.
+    """
+    for date_field in ("created_date", "resolved_date"):
+        if fields.get(date_field) is not None:
+            fields[date_field] = str(fields[date_field])
+    set_clause, set_params = build_set_clause(fields, TICKET_COLUMNS)
+    clauses = _bulk_where(ticket_ids, filters, scope)
+    if not set_clause:
+        return 0
+
+    text_changed = fields.get("subject") is not None or fields.get("description") is not None
+
+    conn = connect_database()
+    count = 0
+    before = []
+    try:
+        cursor = conn.cursor()
+        for where, params in clauses:
+            before += capture(cursor, "it_tickets", where, params)
+            if text_changed:
+                # Select first: the update may change what the filters match
+                cursor.execute(f"SELECT id FROM it_tickets WHERE {where}", params)
+                row_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"UPDATE it_tickets SET {set_clause} WHERE {where}", set_params + params)
+            count += cursor.rowcount
+            if text_changed:
+                for chunk in chunked(row_ids):
+                    _reindex(cursor, f"id IN ({', '.join('?' for _ in chunk)})", list(chunk))
+        conn.commit()
+    finally:
+        conn.close()
+    record_write("it_tickets", "update", before, {column: value for column, value in fields.items() if value is not None})
+    return count
+
+def bulk_delete_tickets(ticket_ids=None, filters=None, scope=None, soft=False):
+    """
+    Delete many tickets in one transaction, targeted like bulk_update_tickets;
+    soft=True tombstones them like delete_ticket. Returns the number of rows deleted.
+    """
+    clauses = _bulk_where(ticket_ids, filters, scope)
+    deleted_at = utc_now()
+
+    conn = connect_database()
+    count = 0
+    before = []
+    try:
+        cursor = conn.cursor()
+        for where, params in clauses:
+            before += capture(cursor, "it_tickets", where, params)
+            if soft:
+                cursor.execute(f"UPDATE it_tickets SET deleted_at = ? WHERE {where}", [deleted_at] + params)
+            else:
+                _unindex(cursor, where, params)
+                cursor.execute(f"DELETE FROM it_tickets WHERE {where}", params)
+            count += cursor.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    if soft:
+        record_write("it_tickets", "update", before, {"deleted_at": deleted_at})
+    else:
+        record_write("it_tickets", "delete", before)
+    return count
+
+def get_ticket_analysis(ticket_id):
+    """
+    Return the cached AI analysis row (model, analysis, created_at) for a ticket, or None.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT a.model, a.analysis, a.created_at FROM ticket_analyses a
+        JOIN it_tickets t ON t.id = a.row_id
+        WHERE t.ticket_id = ?
+    """, (ticket_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+def save_ticket_analysis(ticket_id, model, analysis):
+    """
+    Cache an AI analysis for a ticket, replacing any earlier one.
+    It is dropped automatically when the ticket's subject or description changes.
+    """
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO ticket_analyses (row_id, model, analysis)
+        SELECT id, ?, ? FROM it_tickets WHERE ticket_id = ?
+        ON CONFLICT(row_id) DO UPDATE SET
+            model = excluded.model, analysis = excluded.analysis, created_at = CURRENT_TIMESTAMP
+    """, (model, analysis, ticket_id))
     conn.commit()
     count = cursor.rowcount
     conn.close()
@@ -1,4 +1,4 @@
-from app.data.db import connect_database 
+from app.data.db import connect_database, read_frame, insert_or_ignore_sql, chunked
 
 def get_user_by_username(username):
     conn = connect_database()
@@ -21,9 +21,84 @@ def insert_user(username, password_hash, role='user'):
     return lastid
 
 def list_users():
-    conn = connect_database()
+    conn = connect_database(read_only=True)
     cursor = conn.cursor()
     cursor.execute("SELECT id, username, role, created_at FROM users ORDER BY id")
     rows = cursor.fetchall()
     conn.close()
-    return rows
\ No newline at end of file
+    return rows
+
+def update_user_role(username, role):
+    conn = connect_database()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET role = ? WHERE username = ?", (role, username))
+    conn.commit()
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+def _search_where(search=None, role=None):
+    conditions = []
+    params = []
+    if search:
+        escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("username LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if role:
+        conditions.append("role = ?")
+        params.append(role)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def search_users(search=None, role=None, page=1, page_size=50):
+    """
+    Return one page of users (id, username, role, created_at) as a DataFrame,
+    optionally filtered by a username substring and/or role, ordered by id.
+    Returns (df, total) where total counts every matching user.
+    """
+    where, params = _search_where(search, role)
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM users{where}", params)
+    total = cursor.fetchone()[0]
+    df = read_frame(
+        conn,
+        f"SELECT id, username, role, created_at FROM users{where} ORDER BY id LIMIT ? OFFSET ?",
+        params + [page_size, (max(page, 1) - 1) * page_size],
+    )
+    conn.close()
+    return df, total
+
+def get_password_hashes(usernames):
+    """
+    Return {username: password_hash} for those of `usernames` that exist.
+    """
+    conn = connect_database(read_only=True)
+    cursor = conn.cursor()
+    found = {}
+    for chunk in chunked(usernames):
+        cursor.execute(
+            f"SELECT username, password_hash FROM users WHERE username IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+        found.update((row[0], row[1]) for row in cursor.fetchall())
+    conn.close()
+    return found
+
+def bulk_insert_users(users):
+    """
+    Insert many (username, password_hash, role) tuples in a single
+    transaction, skipping usernames that already exist.
+    Returns the number of users inserted.
+    """
+    rows = list(users)
+    if not rows:
+        return 0
+
+    conn = connect_database()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(insert_or_ignore_sql("users", ("username", "password_hash", "role")), rows)
+        conn.commit()
+        count = cursor.rowcount
+    finally:
+        conn.close()
+    return count
@@ -0,0 +1,53 @@
+import os
+from google import genai
+
+MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+
+_client = None
+
+def api_key():
+    """
+    GEMINI_API_KEY from the environment, else from .streamlit/secrets.toml.
+    """
+    key = os.environ.get("GEMINI_API_KEY")
+    if not key:
+        try:
+            import streamlit as st
+            key = st.secrets.get("GEMINI_API_KEY")
+        except Exception:
+            # No secrets.toml, or not running under Streamlit
+            key = None
+    if not key:
+        raise RuntimeError(
+            "No Gemini API key configured: set GEMINI_API_KEY in the environment or in .streamlit/secrets.toml."
+        )
+    return key
+
+def get_ai_client():
+    """
+    Shared genai client (one per process, reused across sessions).
+    Raises RuntimeError when no API key is configured.
+    """
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=api_key())
+    return _client
+
+def stream_analysis(prompt, model=MODEL):
+    """
+    Start a streaming generation; iterate the result for chunks.
+    """
+    return get_ai_client().models.generate_content_stream(model=model, contents=prompt)
+
+async def stream_analysis_async(prompt, model=MODEL):
+    """
+    Async counterpart of stream_analysis; use `async for chunk in ...`.
+    """
+    return await get_ai_client().aio.models.generate_content_stream(model=model, contents=prompt)
+
+async def generate_analysis_async(prompt, model=MODEL):
+    """
+    Non-streaming async generation, for running several analyses concurrently.
+    """
+    response = await get_ai_client().aio.models.generate_content(model=model, contents=prompt)
+    return response.text
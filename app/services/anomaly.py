@@ -0,0 +1,237 @@
+"""
+Incident anomaly job: hourly incident counts per incident_type/severity,
+tracked with an exponentially weighted mean and variance, raising an alert
+when an hour's count sits more than Z_THRESHOLD deviations above its mean.
+
+Incidents are bucketed by `date` when it carries a time of day. Incidents
+entered with a date only (the dashboard form) use created_at instead when
+it falls on that date, and otherwise count at 00:00 of their date, so
+back-dated entries have daily granularity. Hours close by the clock: every
+hour before the current one is final, and incidents dated in the future
+are ignored.
+
+Counts are Anscombe-transformed (2 * sqrt(x + 3/8)) before averaging, which
+gives Poisson-like counts a variance close to 1 whatever their rate, so one
+threshold works for both rare and busy series.
+
+    python -m app.services.anomaly          # one run
+    python -m app.services.anomaly --reset  # rebuild statistics from every incident
+"""
+import argparse
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from app.data import db
+from app.data.db import file_lock
+from app.data.incidents import get_incidents_after
+from app.data.alerts import load_anomaly_state, save_anomaly_run, reset_anomaly_state
+
+# Weight of the newest hour in the moving mean/variance
+ALPHA = float(os.environ.get("ANOMALY_ALPHA", "0.05"))
+Z_THRESHOLD = float(os.environ.get("ANOMALY_Z", "4"))
+# Hours with fewer incidents than this never alert, however unusual
+MIN_COUNT = int(os.environ.get("ANOMALY_MIN_COUNT", "5"))
+# Hours of history a series needs before it can alert
+WARMUP_HOURS = 24
+# Seconds between background runs; ANOMALY_INTERVAL=0 disables the thread
+INTERVAL = int(os.environ.get("ANOMALY_INTERVAL", "300"))
+
+KEY = ["incident_type", "severity"]
+EPOCH = pd.Timestamp(0)
+HOUR = pd.Timedelta(hours=1)
+
+_thread = None
+
+def bucket_start(hour):
+    return (EPOCH + int(hour) * HOUR).strftime("%Y-%m-%d %H:00")
+
+def current_hour():
+    return int((pd.Timestamp.now(tz="UTC").tz_localize(None) - EPOCH) // HOUR)
+
+def incident_times(incidents):
+    """
+    The moment each incident happened: its date, or for date-only rows its
+    created_at when that falls on the same day.
+    """
+    dates = incidents["date"].astype(str)
+    timestamps = pd.to_datetime(dates, errors="coerce", format="mixed")
+    if "created_at" in incidents:
+        created = pd.to_datetime(incidents["created_at"], errors="coerce", format="mixed")
+        date_only = ~dates.str.contains(":", regex=False)
+        same_day = created.dt.normalize() == timestamps.dt.normalize()
+        timestamps = timestamps.where(~(date_only & same_day), created)
+    return timestamps
+
+def hourly_counts(incidents, now_hour=None):
+    """
+    Count incidents per (incident_type, severity, hour since the epoch) in one
+    vectorised pass. Rows whose date does not parse, or that lie after
+    `now_hour` (default: the current hour), are skipped.
+    """
+    now_hour = current_hour() if now_hour is None else now_hour
+    timestamps = incident_times(incidents)
+    frame = pd.DataFrame({
+        "incident_type": incidents["incident_type"].fillna("None").astype(str),
+        "severity": incidents["severity"].fillna("None").astype(str),
+        "hour": (timestamps - EPOCH) // HOUR,
+    }).dropna(subset=["hour"])
+    frame["hour"] = frame["hour"].astype("int64")
+    frame = frame[frame["hour"] <= now_hour]
+    return frame.groupby(KEY + ["hour"]).size()
+
+def _transform(counts):
+    return 2 * np.sqrt(counts + 0.375)
+
+def _expected_count(mean):
+    return np.maximum((mean / 2) ** 2 - 0.375, 0.0)
+
+def _score(counts, mean, var, seen):
+    """
+    z-scores of `counts` against the current (transformed) statistics and
+    the mask of those that should alert. The deviation is floored at the
+    Poisson value of 1 so near-constant series don't alert on noise.
+    """
+    z = (_transform(counts) - mean) / np.maximum(np.sqrt(var), 1.0)
+    return z, (seen >= WARMUP_HOURS) & (counts >= MIN_COUNT) & (z >= Z_THRESHOLD)
+
+def detect(counts, closed_through, stats, now_hour=None):
+    """
+    Fold every hour before `now_hour` (default: the current hour) into the
+    statistics and score each hour, including `now_hour` itself, which stays
+    open (pending) because more incidents may still arrive for it.
+
+    counts: Series indexed by (incident_type, severity, hour), all hours after
+    closed_through and none after now_hour. stats: DataFrame of the previous (incident_type, severity,
+    mean, var, hours). Returns (closed_through, stats rows, pending rows,
+    alert rows) ready for save_anomaly_run().
+    """
+    newest = current_hour() if now_hour is None else now_hour
+    hours = counts.index.get_level_values("hour").to_numpy()
+    start = int(hours.min()) if closed_through is None else closed_through + 1
+    new_closed = newest - 1
+
+    pairs = counts.index.droplevel("hour")
+    keys = pairs.unique()
+    if not stats.empty:
+        keys = pd.MultiIndex.from_frame(stats[KEY]).union(keys)
+    previous = stats.set_index(KEY).reindex(keys)
+    mean = previous["mean"].fillna(_transform(0.0)).to_numpy(dtype=float)
+    var = previous["var"].fillna(0.0).to_numpy(dtype=float)
+    seen = previous["hours"].fillna(0).to_numpy(dtype=int)
+    values = counts.to_numpy(dtype=float)
+    columns = keys.get_indexer(pairs)
+
+    # Dense hours x series grid of the hours being closed: empty cells are
+    # hours without incidents, which still pull the averages down
+    closed = hours <= new_closed
+    grid = np.zeros((max(new_closed - start + 1, 0), len(keys)))
+    grid[hours[closed] - start, columns[closed]] = values[closed]
+
+    alerts = []
+    for row, x in enumerate(grid):
+        z, flagged = _score(x, mean, var, seen)
+        for k in np.flatnonzero(flagged):
+            alerts.append((keys[k][0], keys[k][1], start + row, x[k], _expected_count(mean[k]), z[k]))
+        delta = _transform(x) - mean
+        mean = mean + ALPHA * delta
+        var = (1 - ALPHA) * (var + ALPHA * delta * delta)
+        seen = seen + 1
+
+    # The open hour is scored against the statistics so far, not folded in
+    x = np.zeros(len(keys))
+    x[columns[~closed]] = values[~closed]
+    z, flagged = _score(x, mean, var, seen)
+    for k in np.flatnonzero(flagged):
+        alerts.append((keys[k][0], keys[k][1], newest, x[k], _expected_count(mean[k]), z[k]))
+
+    stats_rows = [
+        (incident_type, severity, float(m), float(v), int(n))
+        for (incident_type, severity), m, v, n in zip(keys, mean, var, seen)
+    ]
+    pending_rows = [
+        (incident_type, severity, newest, int(count))
+        for (incident_type, severity, _), count in counts[~closed].items()
+    ]
+    alert_rows = [
+        (incident_type, severity, bucket_start(hour), int(observed), round(float(expected), 3), round(float(z), 2))
+        for incident_type, severity, hour, observed, expected, z in alerts
+    ]
+    return new_closed, stats_rows, pending_rows, alert_rows
+
+def run_anomaly_job():
+    """
+    Process incidents added since the last run and store the updated
+    statistics and any new alerts. Work is O(new incidents + elapsed hours);
+    the first run reads the whole table in one pass.
+    Runs are serialised across processes with a lock file next to the
+    database, and the state is re-read under the lock, so replicas never
+    count a row twice. Returns the number of incidents processed.
+    """
+    lock_path = db.DB_PATH.with_name(db.DB_PATH.name + ".anomaly.lock")
+    with file_lock(lock_path):
+        last_id, closed_through, stats, pending = load_anomaly_state()
+        incidents = get_incidents_after(last_id, columns=("id", "date", "created_at", "incident_type", "severity"))
+        if incidents.empty:
+            return 0
+
+        now_hour = current_hour()
+        if closed_through is not None and closed_through >= now_hour:
+            # Left by a run that closed hours by future-dated incidents
+            print("Anomaly state is closed past the current hour; run `python -m app.services.anomaly --reset`")
+            closed_through = now_hour - 1
+        counts = hourly_counts(incidents, now_hour)
+        if not pending.empty:
+            counts = counts.add(pending.set_index(KEY + ["hour"])["count"], fill_value=0)
+            counts = counts[counts.index.get_level_values("hour") <= now_hour]
+        if closed_through is not None:
+            # Incidents dated in an hour that has already been closed can't
+            # change its statistics any more
+            counts = counts[counts.index.get_level_values("hour") > closed_through]
+
+        last_id = int(incidents["id"].max())
+        if counts.empty:
+            save_anomaly_run(last_id, closed_through, stats.itertuples(index=False), [], [])
+            return len(incidents)
+
+        closed_through, stats_rows, pending_rows, alert_rows = detect(counts, closed_through, stats, now_hour)
+        save_anomaly_run(last_id, closed_through, stats_rows, pending_rows, alert_rows)
+        if alert_rows:
+            print(f"Anomaly job raised {len(alert_rows)} alert(s)")
+        return len(incidents)
+
+def start_anomaly_job(interval=INTERVAL):
+    """
+    Run the job every `interval` seconds from a daemon thread, once per process.
+    """
+    global _thread
+    if _thread is not None or not interval:
+        return _thread
+
+    def loop():
+        while True:
+            try:
+                run_anomaly_job()
+            except Exception as e:
+                print(f"Anomaly job failed: {e}")
+            time.sleep(interval)
+
+    _thread = threading.Thread(target=loop, name="anomaly-job", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reset", action="store_true", help="discard the watermark and statistics first")
+    args = parser.parse_args()
+    if args.reset:
+        reset_anomaly_state()
+    start = time.perf_counter()
+    processed = run_anomaly_job()
+    print(f"Processed {processed} incident(s) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
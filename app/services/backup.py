@@ -0,0 +1,322 @@
+"""
+Online backups of the SQLite database and the retention archive next to it.
+
+snapshot() copies each database with SQLite's online backup API,
+BACKUP_PAGES_PER_STEP pages at a time with BACKUP_STEP_PAUSE seconds
+between steps. In WAL mode the copy runs inside one read transaction, so
+writers keep committing to the WAL and the copy is of a single consistent
+moment instead of restarting whenever someone writes; in rollback-journal
+mode writers are only held up for one step at a time. Each copy is checked
+with PRAGMA integrity_check, gzipped into BACKUP_DIR next to a JSON
+manifest (sha256, sizes, timings), and all but the newest BACKUP_KEEP
+snapshots of each database are removed.
+
+    python -m app.services.backup snapshot
+    python -m app.services.backup list
+    python -m app.services.backup verify DATA/backups/intelligence_platform-20260101T000000Z.db.gz
+    python -m app.services.backup restore DATA/backups/intelligence_platform-20260101T000000Z.db.gz
+
+restore writes the snapshot back through the backup API too, so the app can
+keep running; the current database is snapshotted first. Set
+BACKUP_INTERVAL (seconds) to take snapshots from a background thread.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from app.data import db
+from app.data.db import connect_database, get_backend, file_lock
+from app.data.archive import archive_path
+
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+# 1024 pages is 4 MB at the default page size
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "1024"))
+BACKUP_STEP_PAUSE = float(os.environ.get("BACKUP_STEP_PAUSE", "0.005"))
+# gzip level; 1 is several times faster than 6 and loses little on this data
+BACKUP_COMPRESS_LEVEL = int(os.environ.get("BACKUP_COMPRESS_LEVEL", "1"))
+# 0 leaves the background job off; run the CLI (e.g. from cron) instead
+BACKUP_INTERVAL = float(os.environ.get("BACKUP_INTERVAL", "0"))
+
+_thread = None
+
+
+def backup_dir():
+    if os.environ.get("BACKUP_DIR"):
+        return Path(os.environ["BACKUP_DIR"])
+    return db.DB_PATH.parent / "backups"
+
+def _databases():
+    """
+    (name, path) of every database file to back up.
+    """
+    databases = [("main", db.DB_PATH)]
+    if archive_path().exists():
+        databases.append(("archive", archive_path()))
+    return databases
+
+def _require_sqlite():
+    if get_backend().name != "sqlite":
+        raise RuntimeError("Backups cover the SQLite backend; use pg_dump for PostgreSQL.")
+
+def copy_database(source_path, dest_path, pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE):
+    """
+    Copy a live database to `dest_path` with the online backup API.
+    Returns {"pages", "steps", "seconds"}.
+    """
+    start = time.perf_counter()
+    source = connect_database(source_path, read_only=True)
+    dest = sqlite3.connect(str(dest_path))
+    steps = 0
+    total_pages = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps, total_pages
+        steps += 1
+        total_pages = total
+        if remaining:
+            time.sleep(pause)
+
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Pin one snapshot; writers append to the WAL meanwhile
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(dest, pages=pages, progress=progress)
+    finally:
+        source.close()
+        dest.close()
+    return {"pages": total_pages, "steps": steps, "seconds": round(time.perf_counter() - start, 3)}
+
+def integrity_check(path):
+    """
+    Run PRAGMA integrity_check on a database file; returns (ok, messages).
+    """
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        messages = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+    return messages == ["ok"], messages
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _manifest_path(snapshot_path):
+    return snapshot_path.with_name(snapshot_path.name + ".json")
+
+def snapshot(pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE, keep=BACKUP_KEEP, label=None):
+    """
+    Back up every database into backup_dir() and rotate old snapshots (unless
+    keep is None). Returns the manifests written. Raises RuntimeError, keeping
+    nothing, if a copy fails its integrity check.
+    """
+    _require_sqlite()
+    directory = backup_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    manifests = []
+    for name, path in _databases():
+        suffix = f"-{label}" if label else ""
+        target = directory / f"{path.stem}-{stamp}{suffix}.db.gz"
+        with tempfile.TemporaryDirectory(dir=directory) as tmp:
+            copy = Path(tmp) / path.name
+            stats = copy_database(path, copy, pages, pause)
+            ok, messages = integrity_check(copy)
+            if not ok:
+                raise RuntimeError(f"Backup of {path} failed integrity_check: {messages[:5]}")
+            start = time.perf_counter()
+            with open(copy, "rb") as src, gzip.open(target, "wb", compresslevel=BACKUP_COMPRESS_LEVEL) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            manifest = {
+                "database": name,
+                "source": str(path),
+                "file": target.name,
+                "created_at": stamp,
+                "size_bytes": copy.stat().st_size,
+                "compressed_bytes": target.stat().st_size,
+                "sha256": _sha256(target),
+                "backup_seconds": stats["seconds"],
+                "compress_seconds": round(time.perf_counter() - start, 3),
+                "pages": stats["pages"],
+                "steps": stats["steps"],
+            }
+        _manifest_path(target).write_text(json.dumps(manifest, indent=2))
+        manifests.append(manifest)
+    if keep is not None:
+        rotate(keep)
+    return manifests
+
+def list_snapshots():
+    """
+    Manifests of every snapshot in backup_dir(), newest first.
+    """
+    manifests = [json.loads(path.read_text()) for path in backup_dir().glob("*.db.gz.json")]
+    return sorted(manifests, key=lambda m: (m["created_at"], m["file"]), reverse=True)
+
+def rotate(keep=BACKUP_KEEP):
+    """
+    Delete all but the newest `keep` snapshots of each database; returns the files removed.
+    """
+    removed = []
+    by_database = {}
+    for manifest in list_snapshots():
+        by_database.setdefault(manifest["database"], []).append(manifest)
+    for manifests in by_database.values():
+        for manifest in manifests[keep:]:
+            path = backup_dir() / manifest["file"]
+            path.unlink(missing_ok=True)
+            _manifest_path(path).unlink(missing_ok=True)
+            removed.append(path.name)
+    return removed
+
+def _decompress(snapshot_path, dest_path):
+    with gzip.open(snapshot_path, "rb") as src, open(dest_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+def verify_snapshot(snapshot_path):
+    """
+    Check a snapshot's checksum against its manifest and the integrity of the
+    database inside it; returns (ok, messages).
+    """
+    snapshot_path = Path(snapshot_path)
+    manifest_path = _manifest_path(snapshot_path)
+    if manifest_path.exists():
+        expected = json.loads(manifest_path.read_text())["sha256"]
+        if _sha256(snapshot_path) != expected:
+            return False, ["sha256 does not match the manifest"]
+    with tempfile.TemporaryDirectory(dir=snapshot_path.parent) as tmp:
+        copy = Path(tmp) / "verify.db"
+        _decompress(snapshot_path, copy)
+        return integrity_check(copy)
+
+def _reset_change_tracking(conn, after_seq, generations):
+    """
+    Make every process reload what it cached from the pre-restore database:
+    change_log restarts past the old watermarks (readers behind the oldest
+    entry do a full reload) and every cache generation moves past its old value.
+    """
+    conn.execute("DELETE FROM change_log")
+    conn.execute(
+        "INSERT INTO change_log (seq, table_name, row_id, operation) VALUES (?, 'restore', 0, 'RESTORE')",
+        (after_seq + 2,),
+    )
+    for name, generation in generations.items():
+        conn.execute("""
+            INSERT INTO cache_generations (name, generation) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET generation = excluded.generation
+        """, (name, generation + 1))
+
+def restore_snapshot(snapshot_path, safety_snapshot=True, pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE):
+    """
+    Verify a snapshot and write it over the database it was taken from, with
+    the backup API so running processes are not disturbed. The current
+    databases are snapshotted first, labelled "pre-restore".
+    """
+    _require_sqlite()
+    snapshot_path = Path(snapshot_path)
+    manifest = json.loads(_manifest_path(snapshot_path).read_text())
+    target = db.DB_PATH if manifest["database"] == "main" else archive_path()
+
+    with tempfile.TemporaryDirectory(dir=snapshot_path.parent) as tmp:
+        copy = Path(tmp) / "restore.db"
+        _decompress(snapshot_path, copy)
+        ok, messages = integrity_check(copy)
+        if not ok:
+            raise RuntimeError(f"{snapshot_path.name} failed integrity_check: {messages[:5]}")
+        if safety_snapshot:
+            snapshot(pages, pause, keep=None, label="pre-restore")
+
+        with file_lock(target.with_name(target.name + ".restore.lock")):
+            dest = connect_database(target)
+            try:
+                if manifest["database"] == "main":
+                    after_seq = dest.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+                    generations = dict(dest.execute("SELECT name, generation FROM cache_generations").fetchall())
+                source = sqlite3.connect(str(copy))
+                try:
+                    source.backup(dest, pages=pages, progress=lambda status, remaining, total: time.sleep(pause))
+                finally:
+                    source.close()
+                if manifest["database"] == "main":
+                    _reset_change_tracking(dest, after_seq, generations)
+                    dest.commit()
+            finally:
+                dest.close()
+    return manifest
+
+def start_backup_job(interval=BACKUP_INTERVAL):
+    """
+    Snapshot every `interval` seconds from a daemon thread, once per process.
+    Replicas share the backup directory, so a process skips the run when
+    another has taken a snapshot within the last interval.
+    """
+    global _thread
+    if _thread is not None or not interval:
+        return _thread
+
+    def loop():
+        while True:
+            try:
+                with file_lock(db.DB_PATH.with_name(db.DB_PATH.name + ".backup.lock")):
+                    latest = [m for m in list_snapshots() if m["database"] == "main"]
+                    newest = max((backup_dir() / m["file"]).stat().st_mtime for m in latest) if latest else 0
+                    if time.time() - newest >= interval:
+                        for manifest in snapshot():
+                            print(f"Backup written: {manifest['file']}")
+            except Exception as e:
+                print(f"Backup job failed: {e}")
+            time.sleep(interval)
+
+    _thread = threading.Thread(target=loop, name="backup-job", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up, verify and restore the SQLite database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snap = commands.add_parser("snapshot", help="take a snapshot and rotate old ones")
+    snap.add_argument("--keep", type=int, default=BACKUP_KEEP)
+    snap.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="pages copied per step (-1: all at once)")
+    snap.add_argument("--pause", type=float, default=BACKUP_STEP_PAUSE, help="seconds between steps")
+    commands.add_parser("list", help="list snapshots, newest first")
+    verify = commands.add_parser("verify", help="check a snapshot's checksum and integrity")
+    verify.add_argument("path")
+    restore = commands.add_parser("restore", help="restore a snapshot over its database")
+    restore.add_argument("path")
+    restore.add_argument("--no-safety-snapshot", action="store_true", help="skip snapshotting the current database first")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        for manifest in snapshot(args.pages, args.pause, args.keep):
+            print(
+                f"{manifest['file']}: {manifest['size_bytes'] / 1e6:.1f} MB -> {manifest['compressed_bytes'] / 1e6:.1f} MB, "
+                f"backup {manifest['backup_seconds']}s in {manifest['steps']} steps, compress {manifest['compress_seconds']}s"
+            )
+    elif args.command == "list":
+        for manifest in list_snapshots():
+            print(f"{manifest['created_at']}  {manifest['database']:<8} {manifest['compressed_bytes'] / 1e6:8.1f} MB  {manifest['file']}")
+    elif args.command == "verify":
+        ok, messages = verify_snapshot(args.path)
+        print("ok" if ok else "FAILED: " + "; ".join(messages[:20]))
+        raise SystemExit(0 if ok else 1)
+    elif args.command == "restore":
+        manifest = restore_snapshot(args.path, safety_snapshot=not args.no_safety_snapshot)
+        print(f"Restored {manifest['file']} into {manifest['source']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from app.data import db
+from app.data.db import connect_database, file_lock, get_backend
+from app.data.schema import create_all_tables
+from app.services.user_service import migrate_users_from_file, ensure_default_admin
+from app.data.incidents import migrate_incidents_from_file, ensure_incident_schema
+from app.data.tickets import migrate_tickets_from_file, ensure_ticket_schema
+from app.data.datasets import migrate_datasets_metadata_from_file, ensure_dataset_schema
+from app.data.similarity import index_missing_tickets
+from app.data.permissions import seed_permissions
+from app.data.archive import ensure_archive_tables
+
+_bootstrapped = False
+
+def bootstrap_database():
+    """
+    Create tables and run the CSV migrations once per process.
+    Several Streamlit replicas can start at the same time, so the work is
+    serialised with a lock file next to the database; whichever process gets
+    the lock first migrates and the others find the tables already populated.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return
+
+    lock_path = db.DB_PATH.with_name(db.DB_PATH.name + ".bootstrap.lock")
+    with file_lock(lock_path):
+        conn = connect_database()
+        get_backend().prepare_database(conn)
+        create_all_tables(conn)
+        conn.close()
+
+        # Default roles and their row-level grants
+        seed_permissions()
+
+        # Migrate users from file
+        migrate_users_from_file()
+
+        # Ensure default admin exists if no admins are present
+        ensure_default_admin()
+
+        # Ensure tickets table has latest columns (e.g., subject)
+        ensure_ticket_schema()
+
+        # Ensure incidents table has latest columns (e.g., assigned_to)
+        ensure_incident_schema()
+
+        # Archive tables for retention, in step with the live columns
+        ensure_archive_tables()
+
+        # Migrate incidents from file
+        migrate_incidents_from_file()
+
+        # Migrate tickets from file
+        migrate_tickets_from_file()
+
+        # Ensure datasets_metadata has the profile columns
+        ensure_dataset_schema()
+
+        # Migrate datasets_metadata from file
+        migrate_datasets_metadata_from_file()
+
+        # Add migrated (or pre-index) tickets to the similarity index
+        index_missing_tickets()
+
+    _bootstrapped = True
@@ -0,0 +1,320 @@
+"""
+Previews of registered datasets (datasets_metadata rows) without loading
+them: head, tail or a random sample of rows, plus per-column summaries.
+
+CSV files are memory-mapped and only the bytes of the wanted lines are
+parsed. Random samples come from a streaming reservoir over the line starts
+(numpy scans the map block by block) for files up to RESERVOIR_SCAN_BYTES;
+larger files are sampled in runs of lines at a few random byte offsets,
+which never touches more than OFFSET_CLUSTERS places in the file (and is
+close to uniform when line lengths are similar and rows are not ordered).
+Lines are split on raw newlines, so quoted fields containing newlines can
+make a previewed row come out malformed; such rows are skipped.
+
+Parquet files are opened with memory_map=True and only the needed row
+groups are decoded. Datasets loaded into a table are read with LIMIT/OFFSET
+(rowid lookups on SQLite).
+
+Summaries combine the exact registration profile (nulls, min, max) with
+statistics of a SUMMARY_SAMPLE_ROWS sample, and are cached per file
+version (size + mtime), so an edited file is summarized again.
+"""
+import io
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.data.datasets import get_dataset_metadata
+from app.data.db import connect_database, read_frame, get_backend
+from app.services.metrics import CACHE_REQUESTS
+
+PREVIEW_ROWS = 20
+SUMMARY_SAMPLE_ROWS = int(os.environ.get("DATASET_SUMMARY_SAMPLE_ROWS", "5000"))
+# Files up to this size get an exact reservoir sample; larger ones are
+# sampled by byte offset so a preview stays well under a second
+RESERVOIR_SCAN_BYTES = int(os.environ.get("DATASET_RESERVOIR_SCAN_BYTES", str(256 * 1024 * 1024)))
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+# Random positions read when sampling larger files by byte offset
+OFFSET_CLUSTERS = 50
+# Row groups decoded for a Parquet sample
+PARQUET_SAMPLE_GROUPS = 4
+MODES = ("head", "tail", "sample")
+SUMMARY_CACHE_SIZE = 64
+
+_summaries = OrderedDict()
+_lock = threading.Lock()
+
+
+def _source(dataset_id):
+    """
+    (metadata row, kind, location) for a dataset, where kind is "csv",
+    "parquet" or "table". Registered files win over loaded tables.
+    """
+    row = get_dataset_metadata(dataset_id)
+    if row is None:
+        raise ValueError(f"Unknown dataset: {dataset_id}")
+    path = row["file_path"]
+    if path and Path(path).exists() and row["file_format"] in ("csv", "parquet"):
+        return row, row["file_format"], Path(path)
+    if row["table_name"]:
+        return row, "table", row["table_name"]
+    raise ValueError(f"Dataset {row['dataset_name']} has no file or table to preview.")
+
+def file_version(path):
+    stat = Path(path).stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _parse_lines(header, lines):
+    if not lines:
+        return pd.read_csv(io.BytesIO(header))
+    return pd.read_csv(io.BytesIO(header + b"\n".join(lines) + b"\n"), on_bad_lines="skip")
+
+def _line_at(mm, start):
+    end = mm.find(b"\n", start)
+    return mm[start:end if end != -1 else len(mm)].rstrip(b"\r")
+
+def _csv_head(mm, body, n):
+    return _lines_from(mm, body, n)[0]
+
+def _lines_from(mm, start, n):
+    """
+    Up to `n` non-empty lines from `start`, and the offset after the last.
+    """
+    lines = []
+    while len(lines) < n and start < len(mm):
+        end = mm.find(b"\n", start)
+        end = len(mm) if end == -1 else end
+        line = mm[start:end].rstrip(b"\r")
+        if line:
+            lines.append(line)
+        start = end + 1
+    return lines, start
+
+def _csv_tail(mm, body, n):
+    lines = []
+    end = len(mm)
+    while len(lines) < n and end > body:
+        start = mm.rfind(b"\n", body, end - 1) + 1
+        if start <= 0 or start < body:
+            start = body
+        line = mm[start:end].rstrip(b"\r\n")
+        if line:
+            lines.append(line)
+        end = start
+    return lines[::-1]
+
+def _reservoir_starts(mm, body, n, rng):
+    """
+    Algorithm R over the start offsets of the data lines, vectorised per
+    block. Memory is one block plus the reservoir.
+    """
+    data = np.frombuffer(mm, dtype=np.uint8)
+    block = None
+    reservoir = np.empty(n, dtype=np.int64)
+    seen = 0
+    try:
+        for offset in range(body, len(mm), SCAN_BLOCK_BYTES):
+            block = data[offset:offset + SCAN_BLOCK_BYTES]
+            starts = np.flatnonzero(block == 10) + offset + 1
+            if offset == body:
+                starts = np.concatenate(([body], starts))
+            starts = starts[starts < len(mm)]
+            if not len(starts):
+                continue
+
+            index = np.arange(seen, seen + len(starts))
+            fill = index < n
+            reservoir[index[fill]] = starts[fill]
+            rest = ~fill
+            slots = (rng.random(rest.sum()) * (index[rest] + 1)).astype(np.int64)
+            accepted = slots < n
+            # Later items must overwrite earlier ones, so assign in order
+            for slot, start in zip(slots[accepted].tolist(), starts[rest][accepted].tolist()):
+                reservoir[slot] = start
+            seen += len(starts)
+    finally:
+        # Views into the map must go before the caller can close it
+        data = block = None
+    return np.sort(reservoir[:min(seen, n)])
+
+def _offset_lines(mm, body, n, rng):
+    """
+    Lines read at up to OFFSET_CLUSTERS random byte offsets, taking
+    consecutive lines from each. Clustering keeps big samples (summaries)
+    to a few dozen random page faults on files much larger than RAM.
+    """
+    clusters = min(n, OFFSET_CLUSTERS)
+    per_cluster = -(-n // clusters)
+    lines = []
+    taken = body
+    for offset in np.sort(rng.integers(body, len(mm), clusters)).tolist():
+        start = max(mm.rfind(b"\n", body, offset) + 1, body)
+        # Overlapping runs continue after the previous one instead
+        cluster, taken = _lines_from(mm, max(start, taken), per_cluster)
+        lines.extend(cluster)
+    return lines[:n]
+
+def _csv_rows(path, mode, n, seed):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return pd.DataFrame()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            header_end = mm.find(b"\n")
+            if header_end == -1:
+                return pd.read_csv(io.BytesIO(mm[:]))
+            header = mm[:header_end].rstrip(b"\r") + b"\n"
+            body = header_end + 1
+            if mode == "head":
+                lines = _csv_head(mm, body, n)
+            elif mode == "tail":
+                lines = _csv_tail(mm, body, n)
+            else:
+                rng = np.random.default_rng(seed)
+                if len(mm) <= RESERVOIR_SCAN_BYTES:
+                    starts = _reservoir_starts(mm, body, n, rng)
+                    lines = [line for line in (_line_at(mm, int(start)) for start in starts) if line.strip()]
+                else:
+                    lines = _offset_lines(mm, body, n, rng)
+            return _parse_lines(header, lines)
+
+def _parquet_rows(path, mode, n, seed):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Reading Parquet files needs `pip install pyarrow`.") from e
+    parquet = pq.ParquetFile(path, memory_map=True)
+    groups = parquet.metadata.num_row_groups
+    if groups == 0:
+        return parquet.schema_arrow.empty_table().to_pandas()
+    if mode == "head":
+        return next(parquet.iter_batches(batch_size=n)).to_pandas()
+    if mode == "tail":
+        frames = []
+        remaining = n
+        for group in range(groups - 1, -1, -1):
+            table = parquet.read_row_group(group)
+            frames.insert(0, table.slice(max(table.num_rows - remaining, 0)).to_pandas())
+            remaining -= min(table.num_rows, remaining)
+            if remaining <= 0:
+                break
+        return pd.concat(frames, ignore_index=True)
+
+    rng = np.random.default_rng(seed)
+    sizes = np.array([parquet.metadata.row_group(g).num_rows for g in range(groups)])
+    if not sizes.sum():
+        return parquet.schema_arrow.empty_table().to_pandas()
+    # Cluster sample: a few row groups picked by size, then rows within them
+    chosen = np.sort(rng.choice(groups, min(groups, PARQUET_SAMPLE_GROUPS), replace=False, p=sizes / sizes.sum()))
+    table = parquet.read_row_groups(chosen.tolist())
+    take = np.sort(rng.choice(table.num_rows, min(n, table.num_rows), replace=False))
+    return table.take(take).to_pandas()
+
+def _table_rows(row, table_name, mode, n, seed):
+    sqlite = get_backend().name == "sqlite"
+    conn = connect_database(read_only=True)
+    try:
+        if mode == "head":
+            return read_frame(conn, f"SELECT * FROM {table_name} LIMIT ?", (n,))
+        if mode == "tail":
+            if sqlite:
+                df = read_frame(conn, f"SELECT * FROM {table_name} ORDER BY rowid DESC LIMIT ?", (n,))
+                return df.iloc[::-1].reset_index(drop=True)
+            offset = max((row["record_count"] or 0) - n, 0)
+            return read_frame(conn, f"SELECT * FROM {table_name} LIMIT ? OFFSET ?", (n, offset))
+
+        if sqlite:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MAX(rowid) FROM {table_name}")
+            max_rowid = cursor.fetchone()[0] or 0
+            rng = np.random.default_rng(seed)
+            # Rowids of loaded tables are dense, so a little oversampling covers the gaps
+            rowids = np.unique(rng.integers(1, max_rowid + 1, n * 2)).tolist() if max_rowid else []
+            df = read_frame(
+                conn,
+                f"SELECT * FROM {table_name} WHERE rowid IN ({', '.join('?' for _ in rowids) or 'NULL'})",
+                rowids,
+            )
+            return df.sample(min(n, len(df)), random_state=seed).sort_index().reset_index(drop=True)
+        return read_frame(conn, f"SELECT * FROM {table_name} ORDER BY random() LIMIT ?", (n,))
+    finally:
+        conn.close()
+
+def preview(dataset_id, mode="head", n=PREVIEW_ROWS, seed=None):
+    """
+    Return `n` rows of a dataset as a DataFrame: the first ("head"), last
+    ("tail") or a random "sample".
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown preview mode: {mode}")
+    row, kind, location = _source(dataset_id)
+    if kind == "csv":
+        return _csv_rows(location, mode, n, seed)
+    if kind == "parquet":
+        return _parquet_rows(location, mode, n, seed)
+    return _table_rows(row, location, mode, n, seed)
+
+
+def _text(value):
+    # min/max mix numbers and strings across columns; one type keeps the frame displayable
+    return None if value is None else str(value)
+
+def _summarize(sample, profile):
+    exact = {column["name"]: column for column in profile}
+    rows = []
+    for name in sample.columns:
+        values = sample[name]
+        present = values.dropna()
+        numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        known = exact.get(name, {})
+        top = present.value_counts().head(1)
+        rows.append({
+            "column": name,
+            "type": known.get("type", str(values.dtype)),
+            "null_count": known.get("null_count"),
+            "min": _text(known.get("min", present.min() if numeric and len(present) else None)),
+            "max": _text(known.get("max", present.max() if numeric and len(present) else None)),
+            "sample_null_pct": round(100 * values.isna().mean(), 1) if len(values) else None,
+            "sample_distinct": int(present.nunique()),
+            "sample_mean": round(float(present.mean()), 4) if numeric and len(present) else None,
+            "sample_std": round(float(present.std()), 4) if numeric and len(present) > 1 else None,
+            "sample_top": str(top.index[0]) if len(top) else None,
+        })
+    return pd.DataFrame(rows)
+
+def summarize(dataset_id, sample_rows=SUMMARY_SAMPLE_ROWS):
+    """
+    Per-column summary of a dataset: exact null_count/min/max from its
+    registration profile where available, and sample_* statistics from a
+    random sample. Cached per dataset and file (or table) version.
+    """
+    row, kind, location = _source(dataset_id)
+    if kind == "table":
+        version = f"{row['record_count']}:{row['last_updated']}"
+    else:
+        version = file_version(location)
+    key = (dataset_id, version, sample_rows)
+
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is not None:
+            _summaries.move_to_end(key)
+    if summary is not None:
+        CACHE_REQUESTS.inc(name="dataset_summary", result="hit")
+        return summary
+    CACHE_REQUESTS.inc(name="dataset_summary", result="miss")
+
+    sample = preview(dataset_id, "sample", sample_rows, seed=0)
+    profile = json.loads(row["column_profile"]) if row["column_profile"] else []
+    summary = _summarize(sample, profile)
+    with _lock:
+        _summaries[key] = summary
+        while len(_summaries) > SUMMARY_CACHE_SIZE:
+            _summaries.popitem(last=False)
+    return summary
@@ -0,0 +1,260 @@
+"""
+Dataset registry: profile an actual CSV or Parquet file and record the
+result in datasets_metadata, optionally loading it into its own table.
+
+Files are streamed in CHUNK_ROWS-row chunks (pandas chunked CSV reader,
+pyarrow record batches for Parquet), and the profile only keeps running
+totals per column, so memory stays bounded for multi-GB files. The profile
+has the true row count and byte size, and per column its type, null count
+and min/max. A column that only turns out to be text after earlier chunks
+looked numeric (or timestamps) has min/max "n/a": the earlier values were
+never compared as strings, so no exact text bound is known. Loading makes a second pass so the table is declared with the
+types of the whole file, not just its first chunk.
+
+    python -m app.services.dataset_registry DATA/it_tickets.csv --table it_tickets_raw
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from app.data.datasets import save_dataset_profile, load_chunks_to_table, dataset_id_for_path
+
+CHUNK_ROWS = int(os.environ.get("DATASET_CHUNK_ROWS", "100000"))
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".pq": "parquet"}
+SQL_TYPES = {"integer": "INTEGER", "boolean": "INTEGER", "real": "REAL", "timestamp": "TEXT", "text": "TEXT"}
+# Longest min/max string kept in the profile
+MAX_VALUE_CHARS = 100
+
+
+def file_format(path):
+    fmt = FORMATS.get(Path(path).suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported dataset file type: {Path(path).suffix or path}")
+    return fmt
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the file as DataFrames of at most `chunk_rows` rows.
+    """
+    if file_format(path) == "csv":
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+        return
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Reading Parquet files needs `pip install pyarrow`.") from e
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def _kind(series):
+    """
+    Profile type of one chunk of a column, or None if it is all null.
+    Float chunks holding only whole numbers count as integer: pandas turns
+    integer columns into floats whenever a chunk has a missing value.
+    """
+    values = series.dropna()
+    if values.empty:
+        return None
+    kind = series.dtype.kind
+    if kind == "b":
+        return "boolean"
+    if kind in "iu":
+        return "integer"
+    if kind == "f":
+        whole = (values % 1 == 0).all() and values.abs().max() < 2**63
+        return "integer" if whole else "real"
+    if kind == "M":
+        return "timestamp"
+    return "text"
+
+def _merge_kinds(a, b):
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if {a, b} <= {"integer", "real"}:
+        return "real"
+    if {a, b} <= {"integer", "boolean"}:
+        return "integer"
+    return "text"
+
+def _plain(value):
+    """
+    JSON-friendly min/max value.
+    """
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, str) and len(value) > MAX_VALUE_CHARS:
+        return value[:MAX_VALUE_CHARS]
+    return value
+
+
+class ColumnProfile:
+    def __init__(self, name):
+        self.name = name
+        self.kind = None
+        self.null_count = 0
+        self.min = None
+        self.max = None
+        # Became text after non-text chunks, so min/max are unknown
+        self.mixed = False
+
+    def update(self, series):
+        self.null_count += int(series.isna().sum())
+        kind = _kind(series)
+        if kind is None:
+            return
+        if self.kind not in (None, "text") and _merge_kinds(self.kind, kind) == "text":
+            self.mixed = True
+        self.kind = _merge_kinds(self.kind, kind)
+        if self.mixed:
+            return
+
+        values = series.dropna()
+        if self.kind == "text":
+            values = values.astype(str)
+        low, high = values.min(), values.max()
+        if self.min is None:
+            self.min, self.max = low, high
+            return
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def as_dict(self):
+        kind = self.kind or "text"
+        low, high = ("n/a", "n/a") if self.mixed else (_plain(self.min), _plain(self.max))
+        if kind == "integer" and low is not None:
+            low, high = int(low), int(high)
+        return {
+            "name": self.name,
+            "type": kind,
+            "sql_type": SQL_TYPES[kind],
+            "null_count": self.null_count,
+            "min": low,
+            "max": high,
+        }
+
+
+def profile_file(path, chunk_rows=CHUNK_ROWS):
+    """
+    Stream `path` once and return its profile:
+    {"file_path", "file_format", "file_size_bytes", "row_count", "columns": [...]}
+    where each column is {"name", "type", "sql_type", "null_count", "min", "max"}.
+    """
+    path = Path(path)
+    columns = {}
+    row_count = 0
+    for chunk in read_chunks(path, chunk_rows):
+        row_count += len(chunk)
+        for name in chunk.columns:
+            profile = columns.get(name)
+            if profile is None:
+                profile = columns[name] = ColumnProfile(name)
+            profile.update(chunk[name])
+
+    return {
+        "file_path": str(path.resolve()),
+        "file_format": file_format(path),
+        "file_size_bytes": path.stat().st_size,
+        "row_count": row_count,
+        "columns": [profile.as_dict() for profile in columns.values()],
+    }
+
+def save_upload(fileobj, filename, directory):
+    """
+    Copy an uploaded file into `directory` under a name no other file or
+    registered dataset uses ("name.csv", then "name-1.csv", ...) and return
+    the new path. Existing files are never overwritten.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = Path(filename).name
+    stem, suffix = Path(name).stem, Path(name).suffix
+    for n in range(10000):
+        path = directory / (f"{stem}-{n}{suffix}" if n else name)
+        if dataset_id_for_path(path.resolve()) is not None:
+            continue
+        try:
+            # "x" creates the file or fails, so two uploads never share a name
+            with open(path, "xb") as f:
+                shutil.copyfileobj(fileobj, f)
+        except FileExistsError:
+            continue
+        return path
+    raise ValueError(f"No free file name for {name} in {directory}")
+
+def register_dataset(path, dataset_name=None, category=None, source=None, uploaded_by=None,
+                     table_name=None, if_exists="fail", chunk_rows=CHUNK_ROWS):
+    """
+    Profile `path` and record it in datasets_metadata (re-registering the
+    same file updates its row, keeping earlier values for arguments left
+    as None). With `table_name` the file is also loaded
+    into that table. Returns the profile with the row's "id" added.
+    """
+    path = Path(path)
+    profile = profile_file(path, chunk_rows)
+
+    if table_name:
+        column_types = {column["name"]: column["sql_type"] for column in profile["columns"]}
+        load_chunks_to_table(read_chunks(path, chunk_rows), table_name, column_types, if_exists)
+
+    modified = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+    profile["id"] = save_dataset_profile({
+        "dataset_name": dataset_name or path.stem,
+        "category": category,
+        "source": source or f"{profile['file_format'].upper()} Upload",
+        "uploaded_by": uploaded_by,
+        "last_updated": modified.strftime("%Y-%m-%d %H:%M:%S"),
+        "record_count": profile["row_count"],
+        "file_size_mb": round(profile["file_size_bytes"] / (1024 * 1024), 3),
+        "file_path": profile["file_path"],
+        "file_format": profile["file_format"],
+        "column_count": len(profile["columns"]),
+        "column_profile": json.dumps(profile["columns"]),
+        "table_name": table_name,
+    })
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile and register a CSV or Parquet dataset.")
+    parser.add_argument("path")
+    parser.add_argument("--name", help="dataset name (default: file name)")
+    parser.add_argument("--category")
+    parser.add_argument("--uploaded-by")
+    parser.add_argument("--table", help="also load the file into this table")
+    parser.add_argument("--if-exists", choices=("fail", "replace", "append"), default="fail")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    profile = register_dataset(
+        args.path, args.name, args.category, uploaded_by=args.uploaded_by,
+        table_name=args.table, if_exists=args.if_exists, chunk_rows=args.chunk_rows,
+    )
+    print(
+        f"Registered dataset {profile['id']}: {profile['row_count']:,} rows, "
+        f"{profile['file_size_bytes']:,} bytes in {time.perf_counter() - start:.2f}s"
+    )
+    for column in profile["columns"]:
+        print(f"  {column['name']}: {column['type']}, {column['null_count']} null, "
+              f"min {column['min']!r}, max {column['max']!r}")
+
+
+if __name__ == "__main__":
+    main()
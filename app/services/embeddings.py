@@ -0,0 +1,409 @@
+"""
+Local vector index over incident and ticket descriptions, used to add
+related past records to the analyzer prompts. Nothing leaves the machine.
+
+Texts are embedded with a signed hashing vectorizer (word unigrams and
+bigrams, log-scaled, L2-normalised), or with a local sentence-transformers
+model when EMBEDDING_MODEL points at one. Vectors live in a memory-mapped
+float32 file per table under DATA/embeddings/, so every process shares the
+page cache. Search is brute force; above ANN_MIN_ROWS an inverted-file
+index (k-means lists, probing the ANN_PROBES nearest) narrows the scan.
+
+The index follows change_log like the shared frames do, so sync() only
+re-embeds rows changed since the last call.
+
+    python -m app.services.embeddings --rebuild
+"""
+import argparse
+import json
+import os
+import re
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from app.data import db
+from app.data.db import file_lock
+from app.data.changes import latest_change_seq, changes_since, oldest_change_seq
+from app.data.incidents import get_all_incidents, get_incidents_by_ids
+from app.data.tickets import get_all_tickets, get_tickets_by_row_ids
+
+DIM = 256
+# Optional path of a local sentence-transformers model; hashing otherwise
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL")
+# Defaults to an "embeddings" directory next to the database
+EMBEDDING_DIR = os.environ.get("EMBEDDING_DIR")
+ANN_MIN_ROWS = 50000
+ANN_LISTS = 128
+ANN_PROBES = 16
+REBUILD_BATCH = 50000
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its my of on or our "
+    "that the this to was were will with".split()
+)
+
+def incident_text(row):
+    return " ".join(str(row.get(field) or "") for field in ("incident_type", "description"))
+
+def ticket_text(row):
+    return " ".join(str(row.get(field) or "") for field in ("category", "subject", "description"))
+
+# table -> (load all, load by row ids, text of a row)
+SOURCES = {
+    "cyber_incidents": (get_all_incidents, get_incidents_by_ids, incident_text),
+    "it_tickets": (get_all_tickets, get_tickets_by_row_ids, ticket_text),
+}
+
+_model = None
+_indexes = {}
+
+def hashing_embed(texts, dim=DIM):
+    """
+    Signed feature-hashing vectors (len(texts) x dim, float32), L2-normalised.
+    """
+    flat = []
+    signs = []
+    rows = []
+    for i, text in enumerate(texts):
+        words = [w for w in re.findall(r"[a-z0-9]+", (text or "").lower()) if w not in STOPWORDS]
+        for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(gram.encode("utf-8"))
+            flat.append(h % dim)
+            signs.append(1.0 if h & 0x80000000 else -1.0)
+            rows.append(i)
+    counts = np.bincount(
+        np.asarray(rows, dtype=np.int64) * dim + np.asarray(flat, dtype=np.int64),
+        weights=np.asarray(signs), minlength=len(texts) * dim,
+    ).reshape(len(texts), dim)
+    vectors = (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+def _encoder():
+    """
+    (name, dim, embed function) of the active encoder.
+    """
+    global _model
+    if EMBEDDING_MODEL:
+        try:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+            dim = _model.get_sentence_embedding_dimension()
+            return f"st:{EMBEDDING_MODEL}", dim, lambda texts: _model.encode(
+                list(texts), normalize_embeddings=True, convert_to_numpy=True
+            ).astype(np.float32)
+        except (ImportError, OSError) as e:
+            print(f"EMBEDDING_MODEL unavailable ({e}); using the hashing vectorizer")
+    return f"hashing:{DIM}", DIM, hashing_embed
+
+def embed(texts):
+    return _encoder()[2](texts)
+
+
+class VectorIndex:
+    """
+    Memory-mapped vectors for one table: <table>.vectors (capacity x dim
+    float32), <table>.ids (row id per slot, -1 when free) and <table>.lists
+    (ANN list per slot), described by <table>.json. Writers hold
+    <table>.lock; readers re-read the JSON and remap when it changes.
+    """
+    def __init__(self, table_name, directory=None):
+        self.table_name = table_name
+        self.directory = directory
+        self.meta = None
+        self._slots = {}
+        self._mapped = None
+
+    # -- files ---------------------------------------------------------
+
+    def _dir(self):
+        directory = self.directory or EMBEDDING_DIR or db.DB_PATH.parent / "embeddings"
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _path(self, suffix):
+        return os.path.join(self._dir(), f"{self.table_name}.{suffix}")
+
+    def _read_meta(self):
+        try:
+            with open(self._path("json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        tmp = self._path("json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path("json"))
+        self.meta = meta
+
+    def _map(self, meta):
+        capacity, dim = meta["capacity"], meta["dim"]
+        self.vectors = np.memmap(self._path("vectors"), dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self.ids = np.memmap(self._path("ids"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self.lists = np.memmap(self._path("lists"), dtype=np.int32, mode="r+", shape=(capacity,))
+        self._mapped = (meta["version"], capacity)
+        self._slots = {}
+        self._index_slots(0, meta["count"])
+
+    def _index_slots(self, start, stop):
+        ids = self.ids[start:stop]
+        live = np.flatnonzero(ids >= 0)
+        self._slots.update(zip(ids[live].tolist(), (live + start).tolist()))
+
+    def refresh(self):
+        """
+        Pick up changes written by other processes. Returns False if the
+        index has never been built.
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return False
+        if self._mapped != (meta["version"], meta["capacity"]):
+            self._map(meta)
+        elif self.meta and meta["count"] > self.meta["count"]:
+            self._index_slots(self.meta["count"], meta["count"])
+        self.meta = meta
+        return True
+
+    def _create(self, capacity, dim, encoder, seq, version):
+        for suffix, dtype, fill in (("vectors", np.float32, 0), ("ids", np.int64, -1), ("lists", np.int32, -1)):
+            shape = (capacity, dim) if suffix == "vectors" else (capacity,)
+            array = np.memmap(self._path(f"{suffix}.tmp"), dtype=dtype, mode="w+", shape=shape)
+            array[:] = fill
+            array.flush()
+            del array
+        for suffix in ("vectors", "ids", "lists"):
+            os.replace(self._path(f"{suffix}.tmp"), self._path(suffix))
+        try:
+            os.remove(self._path("centroids.npy"))
+        except FileNotFoundError:
+            pass
+        meta = {"count": 0, "capacity": capacity, "dim": dim, "encoder": encoder, "seq": seq, "version": version}
+        self._write_meta(meta)
+        self._map(meta)
+
+    def _grow(self, needed):
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        dim = self.meta["dim"]
+        self.vectors.flush()
+        del self.vectors, self.ids, self.lists
+        for suffix, itemsize, fill in (("vectors", 4 * dim, None), ("ids", 8, -1), ("lists", 4, -1)):
+            with open(self._path(suffix), "r+b") as f:
+                f.truncate(new_capacity * itemsize)
+            if fill is not None:
+                dtype = np.int64 if suffix == "ids" else np.int32
+                tail = np.memmap(self._path(suffix), dtype=dtype, mode="r+", shape=(new_capacity,))
+                tail[capacity:] = fill
+                tail.flush()
+                del tail
+        meta = dict(self.meta, capacity=new_capacity, version=self.meta["version"] + 1)
+        self._map(meta)
+        self.meta = meta
+
+    # -- writes (caller holds the lock) ----------------------------------
+
+    def _upsert(self, row_ids, vectors):
+        slots = []
+        appended = []
+        for row_id in row_ids:
+            slot = self._slots.get(row_id)
+            if slot is None or self.ids[slot] != row_id:
+                slot = self.meta["count"] + len(appended)
+                appended.append(row_id)
+            slots.append(slot)
+        self._grow(self.meta["count"] + len(appended))
+        slots = np.asarray(slots, dtype=np.int64)
+        self.vectors[slots] = vectors
+        self.ids[slots] = row_ids
+        self.lists[slots] = self._assign(vectors)
+        self._slots.update(zip(row_ids, slots.tolist()))
+        self.meta["count"] += len(appended)
+
+    def _remove(self, row_ids):
+        for row_id in row_ids:
+            slot = self._slots.pop(row_id, None)
+            if slot is not None and self.ids[slot] == row_id:
+                self.ids[slot] = -1
+                self.vectors[slot] = 0
+
+    def _commit(self, seq):
+        self.vectors.flush()
+        self.ids.flush()
+        self.lists.flush()
+        self._write_meta(dict(self.meta, seq=seq))
+
+    def _lock(self):
+        return file_lock(self._path("lock"))
+
+    # -- ANN -------------------------------------------------------------
+
+    def _centroids(self):
+        try:
+            return np.load(self._path("centroids.npy"))
+        except FileNotFoundError:
+            return None
+
+    def _assign(self, vectors):
+        centroids = self._centroids()
+        if centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def train_ann(self, lists=ANN_LISTS, iterations=10, sample=20000, seed=0):
+        """
+        Spherical k-means over a sample of the vectors, then assign every
+        slot to its nearest centroid. Caller holds the lock.
+        """
+        count = self.meta["count"]
+        live = np.flatnonzero(self.ids[:count] >= 0)
+        if len(live) < lists:
+            return
+        rng = np.random.default_rng(seed)
+        data = np.asarray(self.vectors[np.sort(rng.choice(live, min(sample, len(live)), replace=False))])
+        centroids = data[rng.choice(len(data), lists, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, data)
+            empty = np.bincount(nearest, minlength=lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-9)
+        np.save(self._path("centroids.npy"), centroids.astype(np.float32))
+        for start in range(0, count, REBUILD_BATCH):
+            stop = min(start + REBUILD_BATCH, count)
+            self.lists[start:stop] = self._assign(np.asarray(self.vectors[start:stop]))
+
+    # -- public ----------------------------------------------------------
+
+    def rebuild(self, batch_size=REBUILD_BATCH):
+        """
+        Re-embed the whole table in batches into fresh files.
+        """
+        with self._lock():
+            return self._rebuild(batch_size)
+
+    def _rebuild(self, batch_size=REBUILD_BATCH):
+        load_all, _, text_of = SOURCES[self.table_name]
+        encoder, dim, embed_fn = _encoder()
+        previous = self._read_meta()
+        # Read the watermark first so changes made during the load are replayed later
+        seq = latest_change_seq(self.table_name)
+        df = load_all()
+        version = previous["version"] + 1 if previous else 1
+        self._create(max(len(df), 1024), dim, encoder, seq, version)
+        records = df.to_dict("records")
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            self._upsert([int(row["id"]) for row in batch], embed_fn([text_of(row) for row in batch]))
+        if len(records) >= ANN_MIN_ROWS:
+            self.train_ann()
+        self._commit(seq)
+        return len(df)
+
+    def sync(self):
+        """
+        Apply change_log entries since the last sync; rebuilds if the index
+        is missing, built with another encoder, or the log was pruned past it.
+        Returns the number of rows re-embedded or removed.
+        """
+        encoder = _encoder()[0]
+        if not self.refresh() or self.meta["encoder"] != encoder:
+            return self.rebuild()
+        if latest_change_seq(self.table_name) <= self.meta["seq"]:
+            return 0
+
+        _, fetch_rows, text_of = SOURCES[self.table_name]
+        with self._lock():
+            self.refresh()
+            seq = self.meta["seq"]
+            if seq < oldest_change_seq() - 1:
+                return self._rebuild()
+            changes = changes_since(seq, self.table_name)
+            if not changes:
+                return 0
+            removed = {row["row_id"] for row in changes if row["operation"] == "DELETE"}
+            changed = {row["row_id"] for row in changes} - removed
+            self._remove(removed)
+            if changed:
+                df = fetch_rows(sorted(changed))
+                records = df.to_dict("records")
+                self._upsert([int(row["id"]) for row in records], embed([text_of(row) for row in records]))
+                # Rows deleted before we read them count as removed
+                self._remove(changed - {int(row["id"]) for row in records})
+            if self.meta["count"] >= ANN_MIN_ROWS and self._centroids() is None:
+                self.train_ann()
+            self._commit(changes[-1]["seq"])
+            return len(changed) + len(removed)
+
+    def search(self, vector, k=5, exclude=()):
+        """
+        Return [(row_id, cosine similarity)] of the k nearest live rows.
+        """
+        if not self.refresh():
+            return []
+        count = self.meta["count"]
+        centroids = self._centroids() if count >= ANN_MIN_ROWS else None
+        if centroids is not None:
+            probes = np.argsort(-(centroids @ vector))[:ANN_PROBES]
+            slots = np.flatnonzero(np.isin(self.lists[:count], probes))
+            scores = self.vectors[slots] @ vector
+        else:
+            slots = np.arange(count)
+            scores = self.vectors[:count] @ vector
+        ids = self.ids[slots]
+        scores = np.where((ids >= 0) & ~np.isin(ids, list(exclude)), scores, -np.inf)
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+def get_index(table_name):
+    index = _indexes.get(table_name)
+    if index is None:
+        index = _indexes[table_name] = VectorIndex(table_name)
+    return index
+
+def related_records(table_name, row, k=3, min_score=0.3, scope=None):
+    """
+    Up to `k` past records of `table_name` most similar to `row` (a dict or
+    Series of that table), as a DataFrame with a `score` column. Syncs the
+    index with recent changes first. With a restricted `scope` (a
+    permissions Policy) only rows it allows are returned; the index is
+    searched for extra candidates to make up for the ones filtered out.
+    """
+    index = get_index(table_name)
+    index.sync()
+    _, fetch_rows, text_of = SOURCES[table_name]
+    vector = embed([text_of(row)])[0]
+    exclude = [int(row["id"])] if row.get("id") is not None else []
+    candidates = k * 4 if scope is not None and scope.where is not None else k
+    hits = [(row_id, score) for row_id, score in index.search(vector, candidates, exclude) if score >= min_score]
+    if not hits:
+        return pd.DataFrame()
+    scores = dict(hits)
+    df = fetch_rows(list(scores), scope=scope)
+    df["score"] = df["id"].map(scores).round(3)
+    return df.sort_values("score", ascending=False, ignore_index=True).head(k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rebuild", action="store_true", help="re-embed everything instead of syncing")
+    parser.add_argument("tables", nargs="*", default=list(SOURCES))
+    args = parser.parse_args()
+    for table_name in args.tables:
+        start = time.perf_counter()
+        index = get_index(table_name)
+        count = index.rebuild() if args.rebuild else index.sync()
+        print(f"{table_name}: {count} row(s) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+from app.data.changes import sync_frame
+
+# One frame per table per process, shared by every session and kept current
+# from the change log. Frames are replaced, never modified in place, so a
+# session still rendering an older version is unaffected; treat them as
+# read-only.
+_state = {}
+_labels = {}
+_lock = threading.Lock()
+# Row-filtered frames, one per distinct permissions policy, least recently used first
+_scoped = OrderedDict()
+MAX_SCOPED_FRAMES = 32
+
+def shared_frame(table_name, load_all, fetch_rows, scope=None):
+    """
+    Return the current shared DataFrame for `table_name`, applying only the
+    change_log delta since the last call from any session.
+
+    With a restricted `scope` (a permissions Policy) the loaders are called
+    with scope=scope and the frame is shared only by sessions with the same
+    effective policy; the least recently used such frames are dropped.
+    """
+    if scope is None or scope.where is None:
+        with _lock:
+            return sync_frame(_state, table_name, load_all, fetch_rows)
+
+    with _lock:
+        state = _scoped.pop(scope.key, None) or {}
+        _scoped[scope.key] = state
+        while len(_scoped) > MAX_SCOPED_FRAMES:
+            _scoped.popitem(last=False)
+        return sync_frame(state, table_name, partial(load_all, scope=scope), partial(fetch_rows, scope=scope))
+
+def build_labels(df, key, first, second, missing="None"):
+    """
+    Vectorised "key: first - second" option labels, one per row.
+    """
+    def column(name):
+        if name not in df.columns:
+            return "N/A"
+        return df[name].astype(object).where(df[name].notna(), missing).astype(str)
+
+    return (df[key].astype(str) + ": " + column(first) + " - " + column(second)).tolist()
+
+def frame_labels(df, key, first, second):
+    """
+    build_labels() memoised per frame version, so every tab and rerun
+    reuses the same list until the shared frame is replaced.
+    """
+    cache_key = (key, first, second)
+    with _lock:
+        entry = _labels.get(cache_key)
+        if entry is not None and entry[0] is df:
+            return entry[1]
+    labels = build_labels(df, key, first, second)
+    with _lock:
+        _labels[cache_key] = (df, labels)
+    return labels
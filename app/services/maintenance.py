@@ -0,0 +1,163 @@
+"""
+Scheduled storage maintenance for the SQLite database (app/data/maintenance.py).
+
+Every run checkpoints the WAL without waiting on anyone. The rest only runs
+while the database is quiet, i.e. fewer than MAINTENANCE_QUIET_WRITES
+incident/ticket changes in the last MAINTENANCE_QUIET_MINUTES, and inside
+MAINTENANCE_WINDOW (UTC hours such as "1-5"; empty means any time):
+
+    truncate   reset the WAL file once it is over MAINTENANCE_WAL_MB
+    optimize   PRAGMA optimize, at most hourly
+    analyze    ANALYZE table by table, weekly
+    prune      trim change_log to the newest CHANGE_LOG_KEEP rows, hourly
+    vacuum     incremental vacuum once more than MAINTENANCE_VACUUM_MIN_PAGES
+               pages are free, for at most MAINTENANCE_VACUUM_SECONDS
+
+Runs are recorded in maintenance_log, so replicas share one schedule.
+
+    python -m app.services.maintenance run [--force]
+    python -m app.services.maintenance stats
+    python -m app.services.maintenance enable-incremental-vacuum
+
+Databases created before auto_vacuum = INCREMENTAL was the default need
+enable-incremental-vacuum once (a full, blocking VACUUM) before vacuum
+does anything.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.data import db
+from app.data.db import get_backend, file_lock, utc_now
+from app.data.maintenance import (
+    database_stats, table_stats, checkpoint, optimize, analyze, incremental_vacuum,
+    enable_incremental_vacuum, record_run, last_run_at, recent_write_at,
+)
+from app.data.changes import prune_change_log
+from app.services.metrics import MAINTENANCE_SECONDS
+
+# Seconds between runs; MAINTENANCE_INTERVAL=0 disables the thread
+MAINTENANCE_INTERVAL = float(os.environ.get("MAINTENANCE_INTERVAL", "900"))
+MAINTENANCE_WINDOW = os.environ.get("MAINTENANCE_WINDOW", "")
+MAINTENANCE_QUIET_WRITES = int(os.environ.get("MAINTENANCE_QUIET_WRITES", "20"))
+MAINTENANCE_QUIET_MINUTES = float(os.environ.get("MAINTENANCE_QUIET_MINUTES", "5"))
+MAINTENANCE_WAL_MB = float(os.environ.get("MAINTENANCE_WAL_MB", "64"))
+MAINTENANCE_VACUUM_MIN_PAGES = int(os.environ.get("MAINTENANCE_VACUUM_MIN_PAGES", "256"))
+MAINTENANCE_VACUUM_SECONDS = float(os.environ.get("MAINTENANCE_VACUUM_SECONDS", "60"))
+# Minimum seconds between runs of each quiet-time task
+TASK_PERIODS = {"optimize": 3600, "analyze": 7 * 86400, "prune": 3600}
+
+_thread = None
+
+
+def in_window(now=None, window=MAINTENANCE_WINDOW):
+    """
+    Whether `now` (UTC) falls inside a "start-end" hour window, which may wrap midnight.
+    """
+    if not window:
+        return True
+    start, end = (int(hour) for hour in window.split("-"))
+    hour = (now or datetime.now(timezone.utc)).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+def is_quiet(writes=MAINTENANCE_QUIET_WRITES, minutes=MAINTENANCE_QUIET_MINUTES):
+    changed_at = recent_write_at(writes)
+    if changed_at is None:
+        return True
+    if isinstance(changed_at, str):
+        changed_at = datetime.fromisoformat(changed_at)
+    if changed_at.tzinfo is None:
+        changed_at = changed_at.replace(tzinfo=timezone.utc)
+    return changed_at < datetime.now(timezone.utc) - timedelta(minutes=minutes)
+
+def _due(task):
+    started_at = last_run_at(task)
+    if started_at is None:
+        return True
+    last = datetime.fromisoformat(started_at)
+    return datetime.now(timezone.utc) - last >= timedelta(seconds=TASK_PERIODS[task])
+
+def _run(task, func, *args):
+    started_at = utc_now()
+    start = time.perf_counter()
+    detail = func(*args)
+    seconds = time.perf_counter() - start
+    MAINTENANCE_SECONDS.observe(seconds, task=task)
+    record_run(task, started_at, seconds, detail)
+    return detail
+
+def run_maintenance(force=False):
+    """
+    One scheduler pass; returns {task: result or the reason it was skipped}.
+    `force` ignores the window, the quiet check and the task periods.
+    """
+    if get_backend().name != "sqlite":
+        raise RuntimeError("Storage maintenance covers the SQLite backend; PostgreSQL runs autovacuum.")
+    results = {}
+    with file_lock(db.DB_PATH.with_name(db.DB_PATH.name + ".maintenance.lock")):
+        results["checkpoint"] = _run("checkpoint", checkpoint, "PASSIVE")
+        if not force and not in_window():
+            return {**results, "skipped": f"outside window {MAINTENANCE_WINDOW}"}
+        if not force and not is_quiet():
+            return {**results, "skipped": "database busy"}
+
+        stats = database_stats()
+        if stats["wal_bytes"] > MAINTENANCE_WAL_MB * 1e6:
+            results["truncate"] = _run("truncate", checkpoint, "TRUNCATE")
+        # Pruning before the vacuum lets it hand the freed pages back
+        for task, func in (("optimize", optimize), ("analyze", analyze), ("prune", prune_change_log)):
+            if force or _due(task):
+                results[task] = _run(task, func)
+        if stats["auto_vacuum"] != "incremental":
+            results["vacuum"] = "auto_vacuum is not incremental"
+        elif stats["freelist_count"] > (0 if force else MAINTENANCE_VACUUM_MIN_PAGES):
+            results["vacuum"] = _run("vacuum", incremental_vacuum, MAINTENANCE_VACUUM_SECONDS)
+    return results
+
+def start_maintenance_job(interval=MAINTENANCE_INTERVAL):
+    """
+    Run maintenance every `interval` seconds from a daemon thread, once per process.
+    """
+    global _thread
+    if _thread is not None or not interval or get_backend().name != "sqlite":
+        return _thread
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"Maintenance job failed: {e}")
+
+    _thread = threading.Thread(target=loop, name="maintenance-job", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoint, analyze and vacuum the SQLite database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="one scheduler pass")
+    run.add_argument("--force", action="store_true", help="ignore the window, quiet check and task periods")
+    commands.add_parser("stats", help="page counts and per-table fragmentation")
+    commands.add_parser("enable-incremental-vacuum", help="switch auto_vacuum to INCREMENTAL (full VACUUM)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        for task, result in run_maintenance(args.force).items():
+            print(f"{task}: {result}")
+    elif args.command == "stats":
+        for key, value in database_stats().items():
+            print(f"{key}: {value}")
+        print(table_stats().to_string(index=False))
+    elif args.command == "enable-incremental-vacuum":
+        start = time.perf_counter()
+        enable_incremental_vacuum()
+        print(f"auto_vacuum is now {database_stats()['auto_vacuum']} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local scrape endpoint; METRICS_PORT=0 disables it
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# A session counts as active if it ran a script within this many seconds
+ACTIVE_SESSION_WINDOW = 300
+
+_registry = {}
+_registry_lock = threading.Lock()
+_server = None
+
+
+def _escape(value):
+    # Label values per the text exposition format: backslash, quote and newline
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Sharded:
+    """
+    Per-thread storage so the hot path (inc/observe) never takes a lock:
+    each thread only writes its own dict and scrapes sum them. Shards of
+    finished threads (Streamlit uses a new thread per script run) are folded
+    into a retired total whenever a new shard is created or a scrape runs,
+    so they stay bounded by the live threads even if nothing scrapes.
+    """
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire(self):
+        # Called with self._lock held; a finished thread no longer writes its shard
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+                continue
+            for key, value in shard.items():
+                self._retired[key] = self._merge(self._retired.get(key), value)
+        self._shards = live
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _collect(self):
+        with self._lock:
+            self._retire()
+            totals = {}
+            for _, shard in self._shards:
+                for key, value in list(shard.items()):
+                    totals[key] = self._merge(totals.get(key), value)
+            for key, value in self._retired.items():
+                totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+    def _labels(self, key, extra=""):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, total, value):
+        return (total or 0) + value
+
+    def render(self):
+        return [f"{self.name}{self._labels(key)} {value}" for key, value in sorted(self._collect().items())]
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        data = shard.get(key)
+        if data is None:
+            # bucket counts..., +Inf count, sum
+            data = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect.bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _merge(self, total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def render(self):
+        lines = []
+        for key, data in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), data[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{self._labels(key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {data[-1]}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is computed by `func` when scraped.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, func):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def render(self):
+        return [f"{self.name} {self.func()}"]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def _register(metric):
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+def gauge(name, documentation, func):
+    return _register(Gauge(name, documentation, func))
+
+def render_metrics():
+    """
+    All registered metrics in Prometheus text exposition format.
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Active sessions: session id -> last seen (monotonic seconds)
+_sessions = {}
+_sessions_pruned = 0.0
+
+def touch_session(session_id):
+    global _sessions_pruned
+    now = time.monotonic()
+    _sessions[session_id] = now
+    # Expire sessions here too, so the map stays bounded without a scraper
+    if now - _sessions_pruned > 60:
+        _sessions_pruned = now
+        _prune_sessions(now)
+
+def _prune_sessions(now):
+    cutoff = now - ACTIVE_SESSION_WINDOW
+    for session_id, seen in list(_sessions.items()):
+        if seen < cutoff:
+            _sessions.pop(session_id, None)
+
+def _active_sessions():
+    _prune_sessions(time.monotonic())
+    return len(_sessions)
+
+
+PAGE_VIEWS = counter("platform_page_views_total", "Streamlit script runs per page.", ("page",))
+ACTIVE_SESSIONS = gauge(
+    "platform_active_sessions", f"Sessions active in the last {ACTIVE_SESSION_WINDOW}s.", _active_sessions
+)
+LOGIN_ATTEMPTS = counter("platform_login_attempts_total", "Login attempts by outcome.", ("result",))
+REGISTRATIONS = counter("platform_registrations_total", "User registrations by outcome.", ("result",))
+USER_IMPORTS = counter("platform_user_imports_total", "Bulk-imported user records by outcome.", ("result",))
+BCRYPT_SECONDS = histogram(
+    "platform_bcrypt_seconds", "Time spent in bcrypt.", ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+DB_QUERY_SECONDS = histogram("platform_db_query_seconds", "Query latency by calling function.", ("caller",))
+CACHE_REQUESTS = counter("platform_cache_requests_total", "Process cache lookups.", ("name", "result"))
+AI_REQUEST_SECONDS = histogram(
+    "platform_ai_request_seconds", "AI analysis latency.", ("analyzer", "stage"),
+    buckets=(0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+AI_TOKENS = counter("platform_ai_tokens_total", "AI tokens by direction.", ("analyzer", "direction"))
+AI_PROMPT_TOKENS = histogram(
+    "platform_ai_prompt_tokens", "Estimated tokens per rendered prompt.", ("template",),
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000),
+)
+AI_PROMPT_CLIPPED = counter(
+    "platform_ai_prompt_clipped_total", "Prompt fields cut to their token budget.", ("template", "field")
+)
+AI_BUDGET_REJECTIONS = counter(
+    "platform_ai_budget_rejections_total", "AI requests refused by the daily token budget.", ("analyzer",)
+)
+AUDIT_EVENTS = counter(
+    "platform_audit_events_total", "Audit log entries by how they were written.", ("result",)
+)
+AUDIT_BATCH_ROWS = histogram(
+    "platform_audit_batch_rows", "Entries per audit log batch insert.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+MAINTENANCE_SECONDS = histogram(
+    "platform_maintenance_seconds", "Storage maintenance task duration.", ("task",)
+)
+API_REQUESTS = counter(
+    "platform_api_requests_total", "REST API requests by route and status.", ("method", "route", "status")
+)
+API_REQUEST_SECONDS = histogram("platform_api_request_seconds", "REST API latency by route.", ("route",))
+NOTIFICATIONS = counter(
+    "platform_notifications_total", "Webhook notifications by destination and outcome.", ("destination", "result")
+)
+NOTIFICATION_BATCH_EVENTS = histogram(
+    "platform_notification_batch_events", "Events per webhook request.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500),
+)
+NOTIFICATION_SECONDS = histogram(
+    "platform_notification_request_seconds", "Webhook request latency by destination.", ("destination",)
+)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serve /metrics from a daemon thread, once per process. With several
+    replicas on one host only the first to bind the port serves; give each
+    replica its own METRICS_PORT to scrape them all.
+    """
+    global _server
+    if _server is not None or not port:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        _server = False
+        return None
+    thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,269 @@
+"""
+Webhook delivery of incident notifications from the outbox (app/data/notifications.py).
+
+The dispatcher polls the outbox every NOTIFY_POLL_SECONDS and POSTs due
+events to each destination in batches of the destination's batch_size:
+
+    {"destination": "soc", "events": [{"delivery_id": 17, "event": "incident.created",
+                                       "coalesced": 2, "data": {...incident row...}}]}
+
+with an X-Signature-256 header (HMAC-SHA256 of the body) when the
+destination has a secret. Destinations are sent to concurrently over one
+pooled HTTP client; each destination's batches go out in order, and a
+failed batch holds back the ones after it. Delivery is at least once, so
+receivers should de-duplicate on delivery_id.
+
+  2xx                        delivered
+  408, 429, 5xx, no response retried with exponential backoff and jitter
+                             (or after Retry-After), and dead-lettered after
+                             NOTIFY_MAX_ATTEMPTS attempts
+  other 4xx                  dead-lettered at once
+
+    python -m app.services.notifications add-destination soc https://hooks.example.com/soc --secret s3cret
+    python -m app.services.notifications list
+    python -m app.services.notifications dead-letters
+    python -m app.services.notifications retry-dead [--destination soc]
+    python -m app.services.notifications run
+
+Several processes may run a dispatcher: rows are claimed with a lease of
+NOTIFY_LEASE_SECONDS, so each batch is sent by one of them.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from app.data import aio
+from app.data.notifications import (
+    add_destination, list_destinations, list_outbox, outbox_counts, retry_dead, purge_delivered,
+)
+from app.services.metrics import NOTIFICATIONS, NOTIFICATION_BATCH_EVENTS, NOTIFICATION_SECONDS
+
+# Seconds between outbox polls; NOTIFY_POLL_SECONDS=0 disables the thread
+NOTIFY_POLL_SECONDS = float(os.environ.get("NOTIFY_POLL_SECONDS", "2"))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_BACKOFF_BASE = float(os.environ.get("NOTIFY_BACKOFF_BASE", "2"))
+NOTIFY_BACKOFF_MAX = float(os.environ.get("NOTIFY_BACKOFF_MAX", "600"))
+NOTIFY_TIMEOUT = float(os.environ.get("NOTIFY_TIMEOUT", "10"))
+NOTIFY_MAX_CONNECTIONS = int(os.environ.get("NOTIFY_MAX_CONNECTIONS", "20"))
+NOTIFY_LEASE_SECONDS = float(os.environ.get("NOTIFY_LEASE_SECONDS", "60"))
+# Batches claimed per destination per poll
+NOTIFY_BATCHES_PER_POLL = int(os.environ.get("NOTIFY_BATCHES_PER_POLL", "4"))
+# Delivered rows are kept this long, then purged hourly by the dispatcher
+NOTIFY_KEEP_DAYS = int(os.environ.get("NOTIFY_KEEP_DAYS", "7"))
+RETRY_STATUSES = {408, 425, 429}
+
+_thread = None
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError as e:
+        raise RuntimeError("Webhook notifications need `pip install httpx`.") from e
+    return httpx
+
+def backoff(attempts, base=NOTIFY_BACKOFF_BASE, cap=NOTIFY_BACKOFF_MAX):
+    """
+    Seconds to wait after the `attempts`-th failure: exponential with full jitter.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+def retry_after(value):
+    """
+    A Retry-After header (seconds or an HTTP date) in seconds from now, or None.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+def build_body(destination, rows):
+    events = [
+        {"delivery_id": row["id"], "event": row["event"], "coalesced": row["coalesced"], "data": json.loads(row["payload"])}
+        for row in rows
+    ]
+    return json.dumps({"destination": destination["name"], "events": events}).encode("utf-8")
+
+
+class Dispatcher:
+    """
+    Sends due outbox rows over one pooled httpx.AsyncClient. Use as an async
+    context manager; run_once() delivers one poll's worth and returns the
+    number of events delivered.
+    """
+
+    def __init__(self, max_connections=NOTIFY_MAX_CONNECTIONS, timeout=NOTIFY_TIMEOUT):
+        httpx = _httpx()
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.transport_errors = (httpx.TransportError,)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def run_once(self):
+        destinations = await aio.list_destinations(enabled_only=True)
+        if not destinations:
+            return 0
+        by_name = {destination["name"]: destination for destination in destinations}
+        claimed = await aio.claim_due(
+            {name: destination["batch_size"] * NOTIFY_BATCHES_PER_POLL for name, destination in by_name.items()},
+            NOTIFY_LEASE_SECONDS,
+        )
+        delivered = await asyncio.gather(*(
+            self._deliver(by_name[name], rows) for name, rows in claimed.items() if name in by_name
+        ))
+        return sum(delivered)
+
+    async def run_forever(self, poll_seconds=NOTIFY_POLL_SECONDS):
+        purged_at = 0
+        while True:
+            try:
+                if time.time() - purged_at >= 3600:
+                    await aio.purge_delivered(NOTIFY_KEEP_DAYS)
+                    purged_at = time.time()
+                # Keep going without sleeping while there is a backlog
+                if await self.run_once():
+                    continue
+            except Exception as e:
+                print(f"Notification dispatch failed: {e}")
+            await asyncio.sleep(poll_seconds)
+
+    async def _deliver(self, destination, rows):
+        size = max(1, destination["batch_size"])
+        batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+        delivered = 0
+        for n, batch in enumerate(batches):
+            result, wait, error = await self._post(destination, batch)
+            ids = [row["id"] for row in batch]
+            NOTIFICATIONS.inc(len(batch), destination=destination["name"], result=result)
+            if result == "delivered":
+                await aio.mark_delivered(ids)
+                delivered += len(batch)
+                continue
+            if result == "dead":
+                await aio.dead_letter(ids, error)
+                continue
+            # Retry this batch later and hold back the rest so events stay in order
+            give_up = [row["id"] for row in batch if row["attempts"] + 1 >= NOTIFY_MAX_ATTEMPTS]
+            retry = [row for row in batch if row["id"] not in give_up]
+            if give_up:
+                await aio.dead_letter(give_up, error)
+            due = time.time() + (wait if wait is not None else backoff(max([row["attempts"] + 1 for row in batch])))
+            if retry:
+                await aio.reschedule([row["id"] for row in retry], due, error)
+            held = [row["id"] for later in batches[n + 1:] for row in later]
+            if held:
+                await aio.release(held, due)
+            break
+        return delivered
+
+    async def _post(self, destination, batch):
+        """
+        Send one batch; returns (result, retry-after seconds or None, error).
+        """
+        body = build_body(destination, batch)
+        headers = {"Content-Type": "application/json", "X-Event-Count": str(len(batch))}
+        if destination["secret"]:
+            headers["X-Signature-256"] = sign(destination["secret"], body)
+        NOTIFICATION_BATCH_EVENTS.observe(len(batch))
+        try:
+            with NOTIFICATION_SECONDS.time(destination=destination["name"]):
+                response = await self.client.post(destination["url"], content=body, headers=headers)
+        except self.transport_errors as e:
+            return "retry", None, f"{type(e).__name__}: {e}"[:500]
+        if 200 <= response.status_code < 300:
+            return "delivered", None, None
+        error = f"HTTP {response.status_code}: {response.text[:200]}"
+        if response.status_code in RETRY_STATUSES or response.status_code >= 500:
+            return "retry", retry_after(response.headers.get("Retry-After")), error
+        return "dead", None, error
+
+
+def start_notification_dispatcher(poll_seconds=NOTIFY_POLL_SECONDS):
+    """
+    Run a Dispatcher on its own event loop in a daemon thread, once per process.
+    Without httpx installed it prints why and stays off.
+    """
+    global _thread
+    if _thread is not None or not poll_seconds:
+        return _thread
+    try:
+        _httpx()
+    except RuntimeError as e:
+        print(f"Notification dispatcher disabled: {e}")
+        return None
+
+    async def serve():
+        async with Dispatcher() as dispatcher:
+            await dispatcher.run_forever(poll_seconds)
+
+    _thread = threading.Thread(target=asyncio.run, args=(serve(),), name="notification-dispatcher", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage webhook destinations and deliver queued notifications.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add-destination", help="register a webhook URL")
+    add.add_argument("name")
+    add.add_argument("url")
+    add.add_argument("--secret", help="HMAC key for the X-Signature-256 header")
+    add.add_argument("--batch-size", type=int, default=50, help="events per request")
+    commands.add_parser("list", help="destinations and outbox counts")
+    dead = commands.add_parser("dead-letters", help="show dead-lettered notifications")
+    dead.add_argument("--limit", type=int, default=50)
+    retry = commands.add_parser("retry-dead", help="re-queue dead-lettered notifications")
+    retry.add_argument("--destination")
+    purge = commands.add_parser("purge", help="delete delivered notifications older than --days")
+    purge.add_argument("--days", type=int, default=NOTIFY_KEEP_DAYS)
+    run = commands.add_parser("run", help="run the dispatcher in the foreground")
+    run.add_argument("--poll", type=float, default=NOTIFY_POLL_SECONDS or 2)
+    args = parser.parse_args()
+
+    if args.command == "add-destination":
+        add_destination(args.name, args.url, args.secret, args.batch_size)
+        print(f"Added destination {args.name}")
+    elif args.command == "list":
+        for destination in list_destinations():
+            state = "enabled" if destination["enabled"] else "disabled"
+            print(f"{destination['name']:<20} {state:<9} batch {destination['batch_size']:<4} {destination['url']}")
+        print()
+        print(outbox_counts().to_string(index=False))
+    elif args.command == "dead-letters":
+        print(list_outbox("dead", limit=args.limit).to_string(index=False))
+    elif args.command == "retry-dead":
+        print(f"Re-queued {retry_dead(args.destination)} notifications")
+    elif args.command == "purge":
+        print(f"Deleted {purge_delivered(args.days)} delivered notifications")
+    elif args.command == "run":
+        async def serve():
+            async with Dispatcher() as dispatcher:
+                await dispatcher.run_forever(args.poll)
+        asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
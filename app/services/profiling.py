@@ -0,0 +1,155 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+# PAGE_PROFILING=0 leaves page classes completely unwrapped
+ENABLED = os.environ.get("PAGE_PROFILING", "1") != "0"
+# "cprofile" (default) or "pyinstrument" for a sampling profile, if installed
+PROFILER = os.environ.get("PAGE_PROFILER", "cprofile")
+# Durations kept per step, shared across all sessions in this process
+HISTORY_SIZE = 500
+STEP_PREFIXES = ("_load_", "_render_")
+
+_history = {}
+_lock = threading.Lock()
+# Steps timed during the current script run (Streamlit runs each session's
+# script in its own thread)
+_current = threading.local()
+
+def record_step(name, seconds):
+    with _lock:
+        samples = _history.get(name)
+        if samples is None:
+            samples = _history[name] = deque(maxlen=HISTORY_SIZE)
+        samples.append(seconds * 1000)
+
+def _percentile(values, q):
+    index = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[index]
+
+def step_summary(prefix=None):
+    """
+    Rolling p50/p95/max (ms) for each recorded step, optionally only those
+    starting with `prefix` (e.g. "CyberDashboardApp.").
+    """
+    with _lock:
+        snapshot = {name: sorted(samples) for name, samples in _history.items()}
+    summary = []
+    for name, values in snapshot.items():
+        if prefix and not name.startswith(prefix):
+            continue
+        summary.append({
+            "step": name,
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 2),
+            "p95_ms": round(_percentile(values, 0.95), 2),
+            "max_ms": round(values[-1], 2),
+        })
+    summary.sort(key=lambda row: row["p95_ms"], reverse=True)
+    return summary
+
+def reset_history():
+    with _lock:
+        _history.clear()
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_current, "depth", 0)
+        _current.depth = depth + 1
+        # Listed on entry (pre-order), so children follow their parent;
+        # the duration is filled in on exit
+        slot = [name, None, depth]
+        steps = getattr(_current, "steps", None)
+        if steps is not None:
+            steps.append(slot)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.depth = depth
+            record_step(name, elapsed)
+            slot[1] = elapsed * 1000
+    return wrapper
+
+def _start_profiler():
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        except ImportError:
+            pass
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def _stop_profiler(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+        return out.getvalue()
+    profiler.stop()
+    return profiler.output_text()
+
+def _wrap_run(page_name, run):
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        import streamlit as st
+
+        _current.steps = []
+        _current.depth = 0
+        profiler = _start_profiler() if st.session_state.pop("profile_next_run", False) else None
+        start = time.perf_counter()
+        try:
+            run(self, *args, **kwargs)
+        finally:
+            total = time.perf_counter() - start
+            steps = _current.steps
+            _current.steps = None
+            if profiler is not None:
+                st.session_state["last_profile"] = _stop_profiler(profiler)
+        record_step(f"{page_name}.run", total)
+        _render_overlay(st, page_name, steps, total * 1000)
+    return wrapper
+
+def _render_overlay(st, page_name, steps, total_ms):
+    if st.session_state.get("user_role") != "admin":
+        return
+
+    with st.sidebar.expander("Render profile"):
+        st.write(f"**{page_name}** rendered in {total_ms:.1f} ms")
+        for name, ms, depth in steps:
+            st.text(f"{'  ' * depth}{name.split('.', 1)[1]}  {ms:.1f} ms")
+
+        st.write("**Rolling timings (all sessions)**")
+        st.dataframe(step_summary(prefix=f"{page_name}."), use_container_width=True)
+
+        if st.button("Profile next run", key="profile_next_run_button"):
+            st.session_state["profile_next_run"] = True
+            st.rerun()
+        if st.session_state.get("last_profile"):
+            st.code(st.session_state["last_profile"], language=None)
+
+def profile_steps(cls):
+    """
+    Class decorator for page apps: times every _load_*/_render_* method,
+    keeps rolling per-step histograms and, for admins, shows an overlay in
+    the sidebar with the last run's timings and an on-demand profiler.
+    """
+    if not ENABLED:
+        return cls
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith(STEP_PREFIXES) and callable(value):
+            setattr(cls, attr, _timed(f"{cls.__name__}.{attr}", value))
+    if "run" in vars(cls):
+        cls.run = _wrap_run(cls.__name__, cls.run)
+    return cls
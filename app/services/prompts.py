@@ -0,0 +1,349 @@
+"""
+Prompt building and daily token budgets for the AI analyzers.
+
+Templates are versioned: TEMPLATES[name][version]. Pages render the newest
+version unless PROMPT_VERSIONS pins one (e.g. "incident_analysis=1"), so a
+prompt change can be rolled back without a deploy. Rendering normalizes
+whitespace, so template indentation is never sent, and clips every field to
+its own token budget using that field's policy:
+
+    truncate   keep the start, cut at a word boundary
+    sentences  keep whole leading sentences (a cheap extractive summary)
+    items      keep whole list entries (each clipped to item_tokens)
+
+Token counts are estimated at CHARS_PER_TOKEN characters per token; usage
+is recorded from the model's own counts when the response reports them.
+"""
+import math
+import os
+import re
+import textwrap
+from datetime import datetime, timezone
+
+from app.data.ai_usage import get_ai_usage, record_ai_usage
+from app.services.metrics import AI_TOKENS, AI_PROMPT_TOKENS, AI_PROMPT_CLIPPED, AI_BUDGET_REJECTIONS
+
+CHARS_PER_TOKEN = 4
+# Tokens (prompt + response) each user may spend per UTC day; 0 disables the limit
+DAILY_TOKEN_BUDGET = int(os.environ.get("AI_DAILY_TOKEN_BUDGET", "200000"))
+# Assumed reply size when checking whether a prompt still fits the budget
+RESPONSE_TOKEN_ALLOWANCE = int(os.environ.get("AI_RESPONSE_TOKEN_ALLOWANCE", "1500"))
+ELLIPSIS = " …"
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def normalize_whitespace(text):
+    """
+    Dedent, collapse runs of spaces/tabs, strip each line and squeeze blank
+    lines to one. Line structure is kept.
+    """
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in textwrap.dedent(text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+def inline(value, default="N/A"):
+    """
+    A field value as a single line: missing values become `default`, all
+    whitespace (including newlines) collapses to single spaces.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return default
+    return " ".join(str(value).split()) or default
+
+def truncate(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(max_tokens * CHARS_PER_TOKEN - len(ELLIPSIS), 0)
+    head = text[:limit]
+    if " " in head:
+        head = head.rsplit(" ", 1)[0]
+    return head + ELLIPSIS
+
+def sentences(text, max_tokens):
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        candidate = f"{kept} {sentence}" if kept else sentence
+        if estimate_tokens(candidate + ELLIPSIS) > max_tokens:
+            break
+        kept = candidate
+    # A single over-long first sentence falls back to a plain cut
+    return kept + ELLIPSIS if kept else truncate(text, max_tokens)
+
+POLICIES = {"truncate": truncate, "sentences": sentences}
+
+
+class Field:
+    def __init__(self, max_tokens, policy="truncate", item_tokens=None, default="N/A"):
+        if policy != "items" and policy not in POLICIES:
+            raise ValueError(f"Unknown prompt policy: {policy}")
+        self.max_tokens = max_tokens
+        self.policy = policy
+        self.item_tokens = item_tokens
+        self.default = default
+
+    def apply(self, value):
+        """
+        Return (text, clipped) for a raw value.
+        """
+        if self.policy == "items":
+            return self._apply_items(value or [])
+        text = inline(value, self.default)
+        clipped = POLICIES[self.policy](text, self.max_tokens)
+        return clipped, clipped != text
+
+    def _apply_items(self, items):
+        kept = []
+        used = 0
+        clipped = False
+        for item in items:
+            line = inline(item, "")
+            if self.item_tokens:
+                short = truncate(line, self.item_tokens)
+                clipped = clipped or short != line
+                line = short
+            cost = estimate_tokens(line) + 1
+            if used + cost > self.max_tokens:
+                clipped = True
+                break
+            kept.append(line)
+            used += cost
+        return ("\n".join(kept) or self.default), clipped
+
+
+class Prompt:
+    def __init__(self, template, text, clipped):
+        self.name = template.name
+        self.version = template.version
+        self.text = text
+        self.clipped = clipped
+        self.estimated_tokens = estimate_tokens(text)
+
+    @property
+    def label(self):
+        return f"{self.name}@v{self.version}"
+
+
+class PromptTemplate:
+    def __init__(self, name, version, text, fields, max_tokens=2500):
+        self.name = name
+        self.version = version
+        self.text = normalize_whitespace(text)
+        self.fields = fields
+        self.max_tokens = max_tokens
+
+    def render(self, **values):
+        """
+        Fill the template, clipping each field to its budget. The whole
+        prompt is cut to max_tokens as a last resort.
+        """
+        rendered = {}
+        clipped = []
+        for key, field in self.fields.items():
+            rendered[key], was_clipped = field.apply(values.get(key))
+            if was_clipped:
+                clipped.append(key)
+        text = self.text.format(**rendered)
+        if estimate_tokens(text) > self.max_tokens:
+            text = truncate(text, self.max_tokens)
+            clipped.append("*")
+
+        for key in clipped:
+            AI_PROMPT_CLIPPED.inc(template=self.name, field=key)
+        prompt = Prompt(self, text, clipped)
+        AI_PROMPT_TOKENS.observe(prompt.estimated_tokens, template=self.name)
+        return prompt
+
+
+_LABEL = Field(16)
+_RELATED = Field(600, "items", item_tokens=100, default="None found.")
+
+TEMPLATES = {
+    "incident_analysis": {
+        1: PromptTemplate("incident_analysis", 1, """
+            Analyze the following cyber incident and provide insights and recommendations:
+            Incident ID: {id}
+            Type: {incident_type}
+            Severity: {severity}
+            Description: {description}
+            Status: {status}
+
+            Provide:
+            1. Root cause analysis
+            2. Immediate actions needed
+            3. Long-term prevention measures
+            4. Risk assessment
+        """, {
+            "id": _LABEL, "incident_type": _LABEL, "severity": _LABEL, "status": _LABEL,
+            "description": Field(800, "sentences"),
+        }),
+        2: PromptTemplate("incident_analysis", 2, """
+            Analyze the following cyber incident and provide insights and recommendations:
+            Incident ID: {id}
+            Type: {incident_type}
+            Severity: {severity}
+            Description: {description}
+            Status: {status}
+
+            Related past incidents:
+            {related}
+
+            Provide:
+            1. Root cause analysis
+            2. Immediate actions needed
+            3. Long-term prevention measures
+            4. Risk assessment
+        """, {
+            "id": _LABEL, "incident_type": _LABEL, "severity": _LABEL, "status": _LABEL,
+            "description": Field(500, "sentences"),
+            "related": _RELATED,
+        }),
+    },
+    "ticket_analysis": {
+        1: PromptTemplate("ticket_analysis", 1, """
+            Analyze the following IT ticket and provide insights and recommendations:
+            Ticket ID: {ticket_id}
+            Priority: {priority}
+            Status: {status}
+            Category: {category}
+            Description: {description}
+            Assigned To: {assigned_to}
+            Created Date: {created_date}
+
+            Provide:
+            1. Root cause analysis
+            2. Immediate actions needed
+            3. Resolution recommendations
+            4. Priority assessment
+            5. Estimated resolution time
+        """, {
+            "ticket_id": _LABEL, "priority": _LABEL, "status": _LABEL, "category": _LABEL,
+            "assigned_to": Field(16, default="Unassigned"), "created_date": _LABEL,
+            "description": Field(800, "sentences"),
+        }),
+        2: PromptTemplate("ticket_analysis", 2, """
+            Analyze the following IT ticket and provide insights and recommendations:
+            Ticket ID: {ticket_id}
+            Priority: {priority}
+            Status: {status}
+            Category: {category}
+            Description: {description}
+            Assigned To: {assigned_to}
+            Created Date: {created_date}
+
+            Related past tickets:
+            {related}
+
+            Provide:
+            1. Root cause analysis
+            2. Immediate actions needed
+            3. Resolution recommendations
+            4. Priority assessment
+            5. Estimated resolution time
+        """, {
+            "ticket_id": _LABEL, "priority": _LABEL, "status": _LABEL, "category": _LABEL,
+            "assigned_to": Field(16, default="Unassigned"), "created_date": _LABEL,
+            "description": Field(500, "sentences"),
+            "related": _RELATED,
+        }),
+    },
+}
+
+def _pinned_versions():
+    pinned = {}
+    for entry in os.environ.get("PROMPT_VERSIONS", "").split(","):
+        name, _, version = entry.partition("=")
+        if version.strip().isdigit():
+            pinned[name.strip()] = int(version)
+    return pinned
+
+PINNED_VERSIONS = _pinned_versions()
+
+def get_template(name, version=None):
+    versions = TEMPLATES[name]
+    version = version or PINNED_VERSIONS.get(name) or max(versions)
+    return versions[version]
+
+def incident_prompt(incident, related=None, version=None):
+    """
+    Analysis prompt for an incident row, with optional related incidents
+    (a DataFrame from embeddings.related_records).
+    """
+    items = [] if related is None else [
+        f"- #{row['id']} ({row['incident_type']}, {row['severity']}, {row['status']}): {row['description']}"
+        for row in related.to_dict("records")
+    ]
+    return get_template("incident_analysis", version).render(
+        id=incident["id"],
+        incident_type=incident["incident_type"],
+        severity=incident["severity"],
+        status=incident["status"],
+        description=incident["description"],
+        related=items,
+    )
+
+def ticket_prompt(ticket, related=None, version=None):
+    """
+    Analysis prompt for a ticket row, with optional related tickets.
+    """
+    items = [] if related is None else [
+        f"- {row['ticket_id']} ({row['priority']}, {row['status']}): {row['description']}"
+        for row in related.to_dict("records")
+    ]
+    return get_template("ticket_analysis", version).render(
+        ticket_id=ticket["ticket_id"],
+        priority=ticket["priority"],
+        status=ticket["status"],
+        category=ticket.get("category"),
+        assigned_to=ticket.get("assigned_to"),
+        created_date=ticket.get("created_date"),
+        description=ticket.get("description"),
+        related=items,
+    )
+
+def _today():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+def _user(username):
+    return username or "anonymous"
+
+def remaining_budget(username):
+    """
+    Tokens `username` may still spend today, or None without a limit.
+    """
+    if not DAILY_TOKEN_BUDGET:
+        return None
+    usage = get_ai_usage(_user(username), _today())
+    return DAILY_TOKEN_BUDGET - usage["prompt_tokens"] - usage["response_tokens"]
+
+def check_budget(username, prompt, analyzer):
+    """
+    Raise BudgetExceeded if sending `prompt` (plus a typical reply) would
+    take the user over today's budget. The check is advisory under
+    concurrency: two requests started together can both pass.
+    """
+    remaining = remaining_budget(username)
+    if remaining is None:
+        return
+    if prompt.estimated_tokens + RESPONSE_TOKEN_ALLOWANCE > remaining:
+        AI_BUDGET_REJECTIONS.inc(analyzer=analyzer)
+        raise BudgetExceeded(
+            f"Daily AI token budget reached ({max(remaining, 0):,} of {DAILY_TOKEN_BUDGET:,} tokens left today)."
+        )
+
+def record_usage(username, analyzer, prompt, usage=None, reply=""):
+    """
+    Count one finished request against the user's budget and in metrics,
+    using the response's usage metadata when present and estimates otherwise.
+    """
+    prompt_tokens = (usage and usage.prompt_token_count) or prompt.estimated_tokens
+    response_tokens = (usage and usage.candidates_token_count) or estimate_tokens(reply)
+    AI_TOKENS.inc(prompt_tokens, analyzer=analyzer, direction="prompt")
+    AI_TOKENS.inc(response_tokens, analyzer=analyzer, direction="response")
+    record_ai_usage(_user(username), _today(), prompt_tokens, response_tokens)
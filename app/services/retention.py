@@ -0,0 +1,104 @@
+"""
+Retention: move old closed incidents and tickets, and soft-deleted rows,
+out of the hot tables into the archive (app/data/archive.py).
+
+A row is archived once its status is in CLOSED_STATUSES and its date is
+more than RETENTION_DAYS old, or once it has been soft-deleted for more
+than TOMBSTONE_DAYS. Rows are moved in batched transactions so the
+dashboards' writers are never locked out for long.
+
+    python -m app.services.retention --dry-run
+    python -m app.services.retention --days 180
+
+Set RETENTION_INTERVAL (seconds) to also run it from a background thread
+in each app process.
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.data.archive import ensure_archive_tables, archive_rows, count_archivable, archive_stats
+
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "365"))
+TOMBSTONE_DAYS = int(os.environ.get("TOMBSTONE_DAYS", "30"))
+# 0 leaves the background job off; run the CLI (e.g. from cron) instead
+RETENTION_INTERVAL = float(os.environ.get("RETENTION_INTERVAL", "0"))
+CLOSED_STATUSES = ("Closed", "Resolved")
+# Column holding each table's record date
+DATE_COLUMNS = {"cyber_incidents": "date", "it_tickets": "created_date"}
+
+_thread = None
+
+
+def retention_where(table, retention_days=RETENTION_DAYS, tombstone_days=TOMBSTONE_DAYS, now=None):
+    """
+    WHERE clause and params selecting the rows of `table` due for archiving.
+    Dates are stored as ISO text, so cutoffs compare as strings.
+    """
+    now = now or datetime.now(timezone.utc)
+    closed_before = (now - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+    deleted_before = (now - timedelta(days=tombstone_days)).isoformat(timespec="seconds")
+    statuses = ", ".join("?" for _ in CLOSED_STATUSES)
+    where = (
+        f"(status IN ({statuses}) AND {DATE_COLUMNS[table]} < ?)"
+        " OR (deleted_at IS NOT NULL AND deleted_at < ?)"
+    )
+    return where, list(CLOSED_STATUSES) + [closed_before, deleted_before]
+
+def run_retention(retention_days=RETENTION_DAYS, tombstone_days=TOMBSTONE_DAYS, dry_run=False):
+    """
+    Archive every table's due rows; returns {table: rows archived (or due, with dry_run)}.
+    """
+    ensure_archive_tables()
+    results = {}
+    for table in DATE_COLUMNS:
+        where, params = retention_where(table, retention_days, tombstone_days)
+        if dry_run:
+            results[table] = count_archivable(table, where, params)
+        else:
+            results[table] = archive_rows(table, where, params)
+    return results
+
+def start_retention_job(interval=RETENTION_INTERVAL):
+    """
+    Run retention every `interval` seconds from a daemon thread, once per process.
+    """
+    global _thread
+    if _thread is not None or not interval:
+        return _thread
+
+    def loop():
+        while True:
+            try:
+                moved = run_retention()
+                if any(moved.values()):
+                    print(f"Retention archived {moved}")
+            except Exception as e:
+                print(f"Retention job failed: {e}")
+            time.sleep(interval)
+
+    _thread = threading.Thread(target=loop, name="retention-job", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old closed and soft-deleted incidents and tickets.")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="age after which closed rows are archived")
+    parser.add_argument("--tombstone-days", type=int, default=TOMBSTONE_DAYS, help="age after which soft-deleted rows are archived")
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows that are due")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_retention(args.days, args.tombstone_days, args.dry_run)
+    verb = "due for archiving" if args.dry_run else "archived"
+    for table, count in results.items():
+        print(f"{table}: {count} row(s) {verb}")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+    print(archive_stats().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
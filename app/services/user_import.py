@@ -0,0 +1,170 @@
+"""
+Bulk user import for HR exports.
+
+Each record has a username, an optional role and either a plaintext
+`password` or a pre-hashed bcrypt `password_hash`. Records are validated
+first; plaintext passwords are then hashed across a process pool (bcrypt
+is CPU-bound, so threads would not help), and every new user is inserted
+with one executemany in a single transaction. Usernames that already exist
+are skipped, never overwritten.
+
+    python -m app.services.user_import hr_export.csv --workers 4
+
+The CSV needs a header with `username` and `password` or `password_hash`
+columns; `role` is optional.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import bcrypt
+import pandas as pd
+
+from app.data.users import get_password_hashes, bulk_insert_users
+from app.data.permissions import list_roles
+from app.services.metrics import USER_IMPORTS
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# Fewer plaintext passwords than this are hashed in-process; a pool costs more to start
+MIN_POOL_PASSWORDS = 8
+BCRYPT_HASH = re.compile(r"\$2[aby]\$(0[4-9]|[12][0-9]|3[01])\$[./A-Za-z0-9]{53}")
+# bcrypt only uses the first 72 bytes of a password and bcrypt>=5 rejects longer ones
+MAX_PASSWORD_BYTES = 72
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = []
+        self.skipped = []  # (row, username, reason)
+        self.failed = []   # (row, username, reason)
+        self.seconds = 0.0
+
+    def summary(self):
+        return (
+            f"Created {len(self.created)}, skipped {len(self.skipped)}, "
+            f"failed {len(self.failed)} in {self.seconds:.1f}s"
+        )
+
+    def problems(self):
+        """
+        Skipped and failed records as a DataFrame (row, username, result, reason).
+        """
+        rows = [(row, username, "skipped", reason) for row, username, reason in self.skipped]
+        rows += [(row, username, "failed", reason) for row, username, reason in self.failed]
+        return pd.DataFrame(rows, columns=["row", "username", "result", "reason"]).sort_values("row")
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+def hash_passwords(passwords, rounds=BCRYPT_ROUNDS, workers=None):
+    """
+    bcrypt-hash `passwords`, in a process pool of `workers` (default: CPU
+    count) when there are enough of them. Returns hashes in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < MIN_POOL_PASSWORDS:
+        return [_hash(password, rounds) for password in passwords]
+    # spawn, not fork: the Streamlit server that may call this is multi-threaded
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(pool.map(_hash, passwords, repeat(rounds), chunksize=chunksize))
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+def import_users(records, default_role="user", rounds=BCRYPT_ROUNDS, workers=None):
+    """
+    Import an iterable of dicts (username, role, password or password_hash)
+    and return an ImportReport. Rows are numbered from 1 in the report.
+    """
+    start = time.perf_counter()
+    report = ImportReport()
+    roles = set(list_roles())
+    pending = {}  # username -> (row, role, password_hash or None, password or None)
+
+    for row, record in enumerate(records, start=1):
+        username = _text(record.get("username"))
+        role = _text(record.get("role")) or default_role
+        password_hash = _text(record.get("password_hash"))
+        password = record.get("password") or ""
+        if not username:
+            report.failed.append((row, username, "missing username"))
+        elif username in pending:
+            report.skipped.append((row, username, "duplicate in import"))
+        elif roles and role not in roles:
+            report.failed.append((row, username, f"unknown role '{role}'"))
+        elif password_hash:
+            if BCRYPT_HASH.fullmatch(password_hash):
+                pending[username] = (row, role, password_hash, None)
+            else:
+                report.failed.append((row, username, "invalid bcrypt hash"))
+        elif password:
+            if len(password.encode("utf-8")) > MAX_PASSWORD_BYTES:
+                report.failed.append((row, username, f"password longer than {MAX_PASSWORD_BYTES} bytes"))
+            else:
+                pending[username] = (row, role, None, password)
+        else:
+            report.failed.append((row, username, "no password or password_hash"))
+
+    for username in get_password_hashes(list(pending)):
+        report.skipped.append((pending.pop(username)[0], username, "already exists"))
+
+    plain = [username for username, entry in pending.items() if entry[2] is None]
+    hashes = dict(zip(plain, hash_passwords([pending[username][3] for username in plain], rounds, workers)))
+    users = [
+        (username, password_hash or hashes[username], role)
+        for username, (_, role, password_hash, _) in pending.items()
+    ]
+
+    inserted = bulk_insert_users(users)
+    if inserted == len(users):
+        report.created = [user[0] for user in users]
+    else:
+        # Some usernames were created by someone else since the check above;
+        # ours are the ones now holding the hash we generated
+        stored = get_password_hashes([user[0] for user in users])
+        for username, password_hash, _ in users:
+            if stored.get(username) == password_hash:
+                report.created.append(username)
+            else:
+                report.skipped.append((pending[username][0], username, "already exists"))
+
+    USER_IMPORTS.inc(len(report.created), result="created")
+    USER_IMPORTS.inc(len(report.skipped), result="skipped")
+    USER_IMPORTS.inc(len(report.failed), result="failed")
+    report.seconds = time.perf_counter() - start
+    return report
+
+def read_user_csv(file):
+    """
+    Records from a CSV path or open text file with a header row.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    return list(csv.DictReader(file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import users from a CSV export.")
+    parser.add_argument("path")
+    parser.add_argument("--role", default="user", help="role for rows without one")
+    parser.add_argument("--workers", type=int, help="hashing processes (default: CPU count)")
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost for plaintext passwords")
+    args = parser.parse_args()
+
+    report = import_users(read_user_csv(args.path), args.role, args.rounds, args.workers)
+    print(report.summary())
+    for row, username, result, reason in report.problems().head(50).itertuples(index=False):
+        print(f"  row {row} {username or '-'}: {result}, {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,186 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
 import bcrypt
 from pathlib import Path
 from app.data.db import connect_database
 from app.data.users import get_user_by_username, insert_user
+from app.data.login_failures import (
+    record_login_failure, recent_login_failures, clear_login_failures, prune_login_failures,
+)
+from app.services.user_import import import_users
+from app.services.metrics import LOGIN_ATTEMPTS, REGISTRATIONS, BCRYPT_SECONDS
 
 DATA_DIR = Path(__file__).resolve().parents[2] / "DATA"
 
+# Failed logins allowed per sliding window before further attempts are
+# refused without checking the password; 0 disables that limit
+LOGIN_USER_FAILURES = int(os.environ.get("LOGIN_USER_FAILURES", "5"))
+LOGIN_USER_WINDOW_SECONDS = int(os.environ.get("LOGIN_USER_WINDOW_SECONDS", "900"))
+LOGIN_CLIENT_FAILURES = int(os.environ.get("LOGIN_CLIENT_FAILURES", "20"))
+LOGIN_CLIENT_WINDOW_SECONDS = int(os.environ.get("LOGIN_CLIENT_WINDOW_SECONDS", "300"))
+# Usernames/clients tracked in memory per process (least recently used dropped)
+LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get("LOGIN_THROTTLE_MAX_KEYS", "10000"))
+# Password checks run at once per process; others wait up to LOGIN_QUEUE_SECONDS
+LOGIN_BCRYPT_SLOTS = int(os.environ.get("LOGIN_BCRYPT_SLOTS", str(max(1, (os.cpu_count() or 1) // 2))))
+LOGIN_QUEUE_SECONDS = float(os.environ.get("LOGIN_QUEUE_SECONDS", "5"))
+PRUNE_INTERVAL_SECONDS = 60
+# Reverse proxies / load balancers whose X-Forwarded-For is believed, as a
+# comma-separated list of addresses; "127.0.0.1" also covers a local proxy,
+# which Streamlit reports as no address at all
+LOGIN_TRUSTED_PROXIES = {
+    address.strip() for address in os.environ.get("LOGIN_TRUSTED_PROXIES", "").split(",") if address.strip()
+}
+LOOPBACK = {"127.0.0.1", "::1", "localhost"}
+
+
+def client_address(remote, forwarded_for=None, trusted=LOGIN_TRUSTED_PROXIES):
+    """
+    The address to throttle a login by, or None when it is unknown (the
+    client limit is then skipped rather than shared by everyone).
+    X-Forwarded-For is only read when the connection comes from a trusted
+    proxy; its rightmost address that is not itself a trusted proxy wins.
+    """
+    def is_trusted(address):
+        return address in trusted or (address in LOOPBACK and not LOOPBACK.isdisjoint(trusted))
+
+    remote = remote or "127.0.0.1"
+    if not is_trusted(remote):
+        return None if remote in LOOPBACK else remote
+    for address in reversed([hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]):
+        if not is_trusted(address):
+            return address
+    return None
+
+
+class SlidingWindow:
+    """
+    Sliding-window log of failure times per key. Each key keeps only its
+    newest `limit` times, and at most `max_keys` keys are kept (least
+    recently used dropped first), so memory is bounded under any attack.
+    """
+    def __init__(self, limit, window, max_keys=LOGIN_THROTTLE_MAX_KEYS):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, *times):
+        """
+        Merge failure times (duplicates are ignored) into the key's log.
+        """
+        with self._lock:
+            events = self._events.pop(key, ())
+            merged = sorted(set(events).union(times))[-self.limit:]
+            self._events[key] = deque(merged, maxlen=self.limit)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+
+    def replace(self, key, times):
+        """
+        Make `times` the key's whole log, e.g. after reading the shared table.
+        """
+        with self._lock:
+            self._events.pop(key, None)
+            if times:
+                self._events[key] = deque(sorted(times)[-self.limit:], maxlen=self.limit)
+                while len(self._events) > self.max_keys:
+                    self._events.popitem(last=False)
+
+    def retry_after(self, key, now):
+        """
+        Seconds until `key` is below its limit again (0 if it is now).
+        """
+        with self._lock:
+            events = self._events.get(key)
+            if not events or len(events) < self.limit:
+                return 0
+            return max(events[0] + self.window - now, 0)
+
+    def clear(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+
+class LoginThrottle:
+    """
+    Per-username and per-client login throttling. Each process keeps its
+    own SlidingWindows and mirrors every failure to the login_failures
+    table. Before each attempt the windows are reloaded from that table, so
+    failures and resets (a successful login anywhere deletes the user's
+    rows) hold across processes; only the recheck inside a bcrypt slot
+    trusts the local windows alone.
+    """
+    def __init__(self, user_limit=(LOGIN_USER_FAILURES, LOGIN_USER_WINDOW_SECONDS),
+                 client_limit=(LOGIN_CLIENT_FAILURES, LOGIN_CLIENT_WINDOW_SECONDS)):
+        self.windows = {
+            kind: SlidingWindow(limit, window)
+            for kind, (limit, window) in (("user", user_limit), ("client", client_limit))
+            if limit
+        }
+        self._last_prune = 0
+
+    def _keys(self, username, client):
+        keys = {}
+        if "user" in self.windows and username:
+            keys[f"user:{username}"] = self.windows["user"]
+        if "client" in self.windows and client:
+            keys[f"client:{client}"] = self.windows["client"]
+        return keys
+
+    def _retry_after(self, keys, now):
+        return max((window.retry_after(key, now) for key, window in keys.items()), default=0)
+
+    def retry_after(self, username, client=None, shared=True):
+        """
+        Seconds the caller must wait before another attempt (0 if allowed).
+        With shared=False only this process's windows are consulted.
+        """
+        keys = self._keys(username, client)
+        if not keys:
+            return 0
+        now = time.time()
+        if not shared:
+            return self._retry_after(keys, now)
+
+        # The table is authoritative: it has every process's failures, and
+        # none from before a reset made by another process
+        longest = max(window.window for window in keys.values())
+        most = max(window.limit for window in keys.values())
+        found = recent_login_failures(list(keys), now - longest, most)
+        for key, window in keys.items():
+            window.replace(key, found.get(key, ()))
+        return self._retry_after(keys, now)
+
+    def record_failure(self, username, client=None):
+        keys = self._keys(username, client)
+        if not keys:
+            return
+        now = time.time()
+        for key, window in keys.items():
+            window.add(key, now)
+        record_login_failure(list(keys), now)
+
+        if now - self._last_prune > PRUNE_INTERVAL_SECONDS:
+            self._last_prune = now
+            prune_login_failures(now - max(window.window for window in self.windows.values()))
+
+    def reset(self, username):
+        """
+        Forget a user's failures after a successful login.
+        """
+        if "user" in self.windows and username:
+            key = f"user:{username}"
+            self.windows["user"].clear(key)
+            clear_login_failures(key)
+
+
+LOGIN_THROTTLE = LoginThrottle()
+_bcrypt_slots = threading.BoundedSemaphore(LOGIN_BCRYPT_SLOTS)
+
 def register_user(username, password, role='user'):
     """
     Register a user using bcrypt for hashing.
@@ -12,24 +188,61 @@ def register_user(username, password, role='user'):
     """
     # check exists
     if get_user_by_username(username):
+        REGISTRATIONS.inc(result="exists")
         return False, f"User '{username}' already exists."
 
     # hash password using bcrypt
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    with BCRYPT_SECONDS.time(operation="hashpw"):
+        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
     password_hash = hashed.decode('utf-8')
 
     lastid = insert_user(username, password_hash, role)
+    REGISTRATIONS.inc(result="success")
     return True, f"User '{username}' registered (id={lastid})."
 
-def login_user(username, password):
+def _throttled(wait):
+    LOGIN_ATTEMPTS.inc(result="throttled")
+    return False, f"Too many failed login attempts. Try again in {math.ceil(wait)} seconds."
+
+def login_user(username, password, client=None):
+    """
+    Check a username/password. `client` (e.g. the remote address) is
+    throttled alongside the username; throttled attempts are refused before
+    any bcrypt work is done.
+    """
+    wait = LOGIN_THROTTLE.retry_after(username, client)
+    if wait:
+        return _throttled(wait)
+
     user = get_user_by_username(username)
     if not user:
+        LOGIN_ATTEMPTS.inc(result="unknown_user")
+        LOGIN_THROTTLE.record_failure(username, client)
         return False, "User not found."
 
-    stored_hash = user[2]  # password_hash column
-    if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
+    # Bound the CPU spent on password checks however many requests arrive
+    if not _bcrypt_slots.acquire(timeout=LOGIN_QUEUE_SECONDS):
+        LOGIN_ATTEMPTS.inc(result="busy")
+        return False, "Too many logins in progress. Please try again."
+    try:
+        # Attempts queued for a slot may have pushed this one over a limit
+        wait = LOGIN_THROTTLE.retry_after(username, client, shared=False)
+        if not wait:
+            stored_hash = user[2]  # password_hash column
+            with BCRYPT_SECONDS.time(operation="checkpw"):
+                matched = bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+    finally:
+        _bcrypt_slots.release()
+    if wait:
+        return _throttled(wait)
+
+    if matched:
+        LOGIN_ATTEMPTS.inc(result="success")
+        LOGIN_THROTTLE.reset(username)
         return True, f"Login successful for {username}."
     else:
+        LOGIN_ATTEMPTS.inc(result="failure")
+        LOGIN_THROTTLE.record_failure(username, client)
         return False, "Incorrect password."
 
 def ensure_default_admin():
@@ -83,16 +296,16 @@ def migrate_users_from_file(filepath=None):
     Migrate users from DATA/users.txt into database.
     Format expected: username,password_hash,role
     If the file has plain-text passwords (Week 7), the safe approach is to ask the user.
-    This implementation expects bcrypt hashes already in file.
+    This implementation expects bcrypt hashes already in file; rows with
+    anything else are reported and left out. Runs through the bulk import
+    pipeline (app/services/user_import.py), so it is one transaction.
     """
     filepath = filepath or (DATA_DIR / "users.txt")
     if not filepath.exists():
         print(f"No users file found at {filepath}")
         return 0
 
-    conn = connect_database()
-    cursor = conn.cursor()
-    migrated = 0
+    records = []
     with open(filepath, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
@@ -101,19 +314,14 @@ def migrate_users_from_file(filepath=None):
             parts = line.split(',')
             if len(parts) < 2:
                 continue
-            username = parts[0].strip()
-            password_hash = parts[1].strip()
-            role = parts[2].strip() if len(parts) > 2 else 'user'
-            try:
-                cursor.execute(
-                    "INSERT OR IGNORE INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                    (username, password_hash, role)
-                )
-                if cursor.rowcount:
-                    migrated += 1
-            except Exception as e:
-                print("Error migrating", username, e)
-    conn.commit()
-    conn.close()
-    print(f"Migrated {migrated} users from {filepath.name}")
-    return migrated
+            records.append({
+                "username": parts[0],
+                "password_hash": parts[1],
+                "role": parts[2] if len(parts) > 2 else 'user',
+            })
+
+    report = import_users(records)
+    for row, username, reason in report.failed:
+        print("Error migrating", username, reason)
+    print(f"Migrated {len(report.created)} users from {filepath.name}")
+    return len(report.created)
@@ -0,0 +1,62 @@
+"""
+Anomaly job cost: the first run over a large backlog, then an incremental
+run after a small batch of new incidents (which includes a burst that
+should alert).
+
+    python -m benchmarks.bench_anomaly --rows 1000000 --delta 1000
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents
+from app.data.alerts import get_alerts
+from app.services.anomaly import run_anomaly_job
+from benchmarks.datagen import incident_dicts
+
+
+def timed_run():
+    start = time.perf_counter()
+    processed = run_anomaly_job()
+    return processed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--delta", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "anomaly.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+        bulk_insert_incidents(incident_dicts(args.rows))
+
+        processed, seconds = timed_run()
+        print(f"backfill     {processed:>10,} rows  {seconds * 1000:10.1f} ms")
+
+        # New incidents dated after the backlog, with one burst in a single hour
+        delta = list(incident_dicts(args.delta, seed=1))
+        for i, incident in enumerate(delta):
+            incident["date"] = f"2026-01-01 {i % 24:02d}:30:00"
+        burst = [
+            dict(incident, date="2026-01-02 03:15:00", incident_type="Phishing", severity="High")
+            for incident in delta[:50]
+        ]
+        bulk_insert_incidents(delta + burst + [dict(delta[0], date="2026-01-02 05:00:00")])
+
+        processed, seconds = timed_run()
+        print(f"incremental  {processed:>10,} rows  {seconds * 1000:10.1f} ms")
+        print(get_alerts().drop(columns=["status", "created_at"]).to_string(index=False))
+        # Write queued audit entries while the database still exists
+        audit.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Load test for the REST API (app/api.py): requests/sec and latency per
+endpoint at a fixed number of concurrent clients.
+
+Run from the repository root:
+    python -m benchmarks.bench_api --rows 100000 --concurrency 16 --seconds 10
+
+By default it builds a throwaway database with --rows incidents, starts
+`python -m app.api serve` against it on --port and creates a token. To
+test a running instance instead, pass --url and --token (the write
+scenario then changes real data, so point it at a test instance).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import httpx
+except ImportError as e:
+    raise RuntimeError("The API load test needs `pip install httpx`.") from e
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents
+from app.data.api_tokens import create_api_token
+from app.services.user_service import ensure_default_admin
+from benchmarks.datagen import incident_dicts
+
+
+async def scenario(client, label, requests, concurrency, seconds):
+    """
+    Drive `requests(i)` (an awaitable factory) from `concurrency` workers for `seconds`.
+    """
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(offset):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await requests(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            i += concurrency
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<34} {len(latencies) / elapsed:8.0f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms"
+          f"  ({len(latencies)} requests, {errors} errors)")
+
+
+async def run(url, token, concurrency, seconds, max_id):
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, headers=headers, limits=limits, timeout=60) as client:
+        page = await client.get("/api/incidents", params={"limit": 100})
+        etag = page.headers["etag"]
+        print(f"GET /api/incidents?limit=100: {len(page.content):,} bytes, {page.num_bytes_downloaded:,} on the wire "
+              f"({page.headers.get('content-encoding', 'identity')})\n")
+
+        await scenario(client, "GET /api/health", lambda i: client.get("/api/health"), concurrency, seconds)
+        await scenario(
+            client, "GET /api/incidents (100 rows)",
+            lambda i: client.get("/api/incidents", params={"limit": 100}), concurrency, seconds,
+        )
+        await scenario(
+            client, "GET /api/incidents (304)",
+            lambda i: client.get("/api/incidents", params={"limit": 100}, headers={"If-None-Match": etag}),
+            concurrency, seconds,
+        )
+        await scenario(
+            client, "GET /api/incidents?severity=High",
+            lambda i: client.get("/api/incidents", params={"limit": 100, "severity": "High"}), concurrency, seconds,
+        )
+        await scenario(
+            client, "GET /api/incidents/{id}",
+            lambda i: client.get(f"/api/incidents/{max_id - i % max_id}"), concurrency, seconds,
+        )
+        await scenario(
+            client, "PATCH /api/incidents/{id}",
+            lambda i: client.patch(f"/api/incidents/{max_id - i % max_id}", json={"status": ("Open", "In Progress")[i % 2]}),
+            concurrency, seconds,
+        )
+        start = time.perf_counter()
+        size = 0
+        async with client.stream("GET", "/api/incidents/export", params={"format": "csv"}) as response:
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        print(f"{'GET /api/incidents/export (csv)':<34} {time.perf_counter() - start:8.2f} s  {size / 1e6:.1f} MB gzipped")
+
+
+def wait_for(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            if httpx.get(f"{url}/api/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="test a running instance instead")
+    parser.add_argument("--token", help="bearer token for --url")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args.url.rstrip("/"), args.token, args.concurrency, args.seconds, args.rows))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        db.get_backend().prepare_database(conn)
+        create_all_tables(conn)
+        conn.close()
+        audit.ENABLED = False
+        ensure_default_admin()
+        bulk_insert_incidents(incident_dicts(args.rows))
+        token = create_api_token("admin", "bench")
+
+        env = {**os.environ, "DB_PATH": str(db.DB_PATH)}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "app.api", "serve", "--port", str(args.port), "--workers", str(args.workers)],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_for(url, server)
+            asyncio.run(run(url, token, args.concurrency, args.seconds, args.rows))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
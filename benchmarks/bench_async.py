@@ -0,0 +1,77 @@
+"""
+Serial vs concurrent independent loads through app/data/aio.py.
+
+    python -m benchmarks.bench_async --rows 100000
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data import aio
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, get_all_incidents
+from app.data.tickets import bulk_insert_tickets, get_all_tickets
+from app.data.datasets import get_all_datasets_metadata, insert_dataset_metadata
+from app.data.users import list_users
+from benchmarks.datagen import incident_dicts, ticket_dicts
+
+LOADERS = {
+    "incidents": get_all_incidents,
+    "tickets": get_all_tickets,
+    "datasets": get_all_datasets_metadata,
+    "users": list_users,
+}
+
+
+def serial():
+    return {name: loader() for name, loader in LOADERS.items()}
+
+
+async def gathered():
+    return await asyncio.gather(
+        aio.get_all_incidents(), aio.get_all_tickets(), aio.get_all_datasets_metadata(), aio.list_users()
+    )
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "async.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+        bulk_insert_incidents(incident_dicts(args.rows))
+        bulk_insert_tickets(ticket_dicts(args.rows))
+        insert_dataset_metadata("bench", "bench", "bench", "2024-01-01", 1, 1.0)
+
+        results = {
+            "serial": timed(serial, args.repeat),
+            "run_concurrently": timed(lambda: aio.run_concurrently(**LOADERS), args.repeat),
+            "asyncio.gather": timed(lambda: asyncio.run(gathered()), args.repeat),
+        }
+        for name, seconds in results.items():
+            print(f"{name:<18} {seconds * 1000:10.1f} ms  x{results['serial'] / seconds:5.2f}")
+        # Write queued audit entries while the database still exists
+        audit.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Write latency of audited incident updates: auditing off, one synchronous
+audit insert per write, and the queued batch writer.
+
+Each mode runs the same single-row updates and one bulk update of all
+1,000 incidents (every write changes the description), then reports how long flush() took to drain the
+queue and how many audit entries were written.
+
+Run from the repository root:
+    python -m benchmarks.bench_audit --writes 2000
+
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, update_incident, bulk_update_incidents
+
+
+def count_entries():
+    conn = db.connect_database(read_only=True)
+    count = conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
+    conn.close()
+    return count
+
+
+def run(label, writes, first_id):
+    latencies = []
+    before = count_entries()
+    for i in range(writes):
+        start = time.perf_counter()
+        update_incident(first_id + i % 1000, description=f"{label} update {i}")
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    bulk_update_incidents(incident_ids=range(first_id, first_id + 1000), description=f"{label} bulk update")
+    bulk_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    audit.flush()
+    flush_seconds = time.perf_counter() - start
+    latencies.sort()
+    print(f"{label:<12} update_incident {statistics.mean(latencies) * 1000:7.3f} ms mean  "
+          f"{latencies[int(len(latencies) * 0.95)] * 1000:7.3f} ms p95  "
+          f"bulk update {bulk_seconds * 1000:7.1f} ms  flush {flush_seconds * 1000:6.1f} ms  "
+          f"+{count_entries() - before} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writes", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        db.get_backend().prepare_database(conn)
+        create_all_tables(conn)
+        conn.close()
+
+        audit.ENABLED = False
+        bulk_insert_incidents([
+            {"date": "2024-01-01", "incident_type": "Phishing", "severity": "Low", "status": "Open",
+             "description": f"incident {i}"}
+            for i in range(1000)
+        ])
+        first_id = 1
+
+        run("off", args.writes, first_id)
+        audit.ENABLED, audit.ASYNC = True, False
+        run("synchronous", args.writes, first_id)
+        audit.ASYNC = True
+        run("queued", args.writes, first_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Online backup: copy time and how long a concurrent writer is held up, for
+a few pages-per-step settings, then a full snapshot (copy, integrity
+check, gzip) and a verify.
+
+Run from the repository root:
+    python -m benchmarks.bench_backup --size-gb 2
+
+The database is padded to --size-gb with a filler table of random blobs
+(incompressible, so gzip time is a worst case) next to --rows incidents.
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, update_incident_status
+from app.services import backup
+from benchmarks.datagen import incident_dicts
+
+BLOB_BYTES = 64 * 1024
+
+
+def pad(size_bytes):
+    conn = db.connect_database()
+    conn.execute("CREATE TABLE bench_filler (id INTEGER PRIMARY KEY, payload BLOB)")
+    for _ in range(size_bytes // (BLOB_BYTES * 256) + 1):
+        conn.executemany("INSERT INTO bench_filler (payload) VALUES (?)", ((os.urandom(BLOB_BYTES),) for _ in range(256)))
+        conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def writer(stop, latencies):
+    # An interactive user updating one incident every 10 ms
+    statuses = ("Open", "In Progress")
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        update_incident_status(1, statuses[i % 2])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        time.sleep(0.01)
+
+
+def with_writer(func, *args):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=writer, args=(stop, latencies))
+    thread.start()
+    time.sleep(0.2)
+    try:
+        result = func(*args)
+    finally:
+        stop.set()
+        thread.join()
+    latencies.sort()
+    return result, latencies
+
+
+def describe(latencies):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    return f"writer p50 {p50:6.1f} ms  p99 {p99:7.1f} ms  max {latencies[-1] * 1000:7.1f} ms  ({len(latencies)} writes)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-gb", type=float, default=1.0)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        os.environ["BACKUP_DIR"] = str(Path(tmp) / "backups")
+        conn = db.connect_database()
+        db.get_backend().prepare_database(conn)
+        create_all_tables(conn)
+        conn.close()
+        # Measure the backup, not the audit trail of the writer
+        audit.ENABLED = False
+        bulk_insert_incidents(incident_dicts(args.rows))
+        pad(int(args.size_gb * 1e9))
+        print(f"database: {db.DB_PATH.stat().st_size / 1e9:.2f} GB\n")
+
+        _, latencies = with_writer(time.sleep, 2)
+        print(f"{'no backup (2 s)':<34} {'':>22}  {describe(latencies)}")
+        for pages, pause in ((-1, 0), (4096, 0), (1024, 0.005), (256, 0.005)):
+            copy = Path(tmp) / "copy.db"
+            stats, latencies = with_writer(backup.copy_database, db.DB_PATH, copy, pages, pause)
+            copy.unlink()
+            label = "all at once" if pages < 0 else f"{pages} pages, {pause * 1000:g} ms pause"
+            print(f"{label:<34} {stats['seconds']:8.2f} s {stats['steps']:6} steps  {describe(latencies)}")
+
+        print()
+        manifests, latencies = with_writer(backup.snapshot)
+        manifest = manifests[0]
+        print(f"snapshot: backup {manifest['backup_seconds']} s, compress {manifest['compress_seconds']} s, "
+              f"{manifest['size_bytes'] / 1e9:.2f} GB -> {manifest['compressed_bytes'] / 1e9:.2f} GB")
+        print(f"          {describe(latencies)}")
+        start = time.perf_counter()
+        ok, _ = backup.verify_snapshot(Path(tmp) / "backups" / manifest["file"])
+        print(f"verify: {'ok' if ok else 'FAILED'} in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
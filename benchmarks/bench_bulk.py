@@ -0,0 +1,94 @@
+"""
+Compare per-row and set-based incident/ticket writes.
+
+Run from the repository root:
+    python -m benchmarks.bench_bulk --rows 5000
+
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import (
+    bulk_insert_incidents,
+    bulk_update_incidents,
+    bulk_delete_incidents,
+    update_incident_status,
+    delete_incident,
+)
+from app.data.tickets import bulk_insert_tickets, bulk_update_tickets, bulk_delete_tickets
+
+
+def make_incidents(n):
+    return [
+        {
+            "date": "2024-01-01",
+            "incident_type": "Malware",
+            "severity": "High",
+            "status": "Open",
+            "description": f"Incident {i} description",
+        }
+        for i in range(n)
+    ]
+
+
+def make_tickets(n):
+    return [
+        {
+            "ticket_id": f"BENCH-{i}",
+            "priority": "Medium",
+            "status": "Open",
+            "description": f"Ticket {i} problem description",
+            "created_date": "2024-01-01",
+        }
+        for i in range(n)
+    ]
+
+
+def timed(label, rows, func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {rows:>8} rows  {elapsed:8.3f}s  {rows / elapsed:>12,.0f} rows/sec")
+
+
+def per_row(func, ids, *args):
+    for item_id in ids:
+        func(item_id, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+    n = args.rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+
+        timed("bulk_insert_incidents", n, bulk_insert_incidents, make_incidents(n))
+        ids = list(range(1, n + 1))
+        timed("update_incident_status (per row)", n, per_row, update_incident_status, ids, "Resolved")
+        timed("bulk_update_incidents (ids)", n, bulk_update_incidents, ids, status="Closed")
+        timed("bulk_update_incidents (filter)", n, bulk_update_incidents, filters={"status": "Closed"}, status="Open")
+        timed("delete_incident (per row)", n // 2, per_row, delete_incident, ids[: n // 2])
+        timed("bulk_delete_incidents (ids)", n - n // 2, bulk_delete_incidents, ids[n // 2:])
+
+        timed("bulk_insert_tickets", n, bulk_insert_tickets, make_tickets(n))
+        ticket_ids = [f"BENCH-{i}" for i in range(n)]
+        timed("bulk_update_tickets (ids)", n, bulk_update_tickets, ticket_ids, status="Resolved")
+        timed("bulk_delete_tickets (filter)", n, bulk_delete_tickets, filters={"status": "Resolved"})
+        # Write queued audit entries while the database still exists
+        audit.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Local vector index: batched rebuild, incremental sync after edits, and
+search latency/recall of the IVF lists against brute force.
+
+    python -m benchmarks.bench_embeddings --rows 200000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, bulk_update_incidents
+from app.services import embeddings
+from benchmarks.bench_similarity import descriptions
+from benchmarks.datagen import incident_dicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "embeddings.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+        incidents = list(incident_dicts(args.rows))
+        for incident, text in zip(incidents, descriptions(args.rows)):
+            incident["description"] = text
+        bulk_insert_incidents(incidents)
+
+        index = embeddings.get_index("cyber_incidents")
+        start = time.perf_counter()
+        index.rebuild()
+        print(f"rebuild        {args.rows:>10,} rows  {time.perf_counter() - start:8.2f} s")
+
+        changed = random.Random(0).sample(range(1, args.rows + 1), 1000)
+        bulk_update_incidents(changed, description="ransomware note found on file server share")
+        start = time.perf_counter()
+        synced = index.sync()
+        print(f"sync           {synced:>10,} rows  {time.perf_counter() - start:8.2f} s")
+
+        queries = embeddings.embed(descriptions(args.queries, seed=7))
+        count = index.meta["count"]
+        brute = []
+        ann = []
+        recall = []
+        for vector in queries:
+            start = time.perf_counter()
+            scores = index.vectors[:count] @ vector
+            kth_best = np.partition(-scores, args.k)[args.k - 1] * -1
+            brute.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            found = index.search(vector, args.k)
+            ann.append((time.perf_counter() - start) * 1000)
+            # Ties are common, so a hit is anything scoring at least the exact k-th best
+            recall.append(sum(score >= kth_best - 1e-6 for _, score in found) / args.k)
+
+        mode = "IVF" if index._centroids() is not None else "brute force"
+        print(f"brute force    p50 {statistics.median(brute):7.2f} ms")
+        print(f"search ({mode}) p50 {statistics.median(ann):7.2f} ms  recall@{args.k} {statistics.mean(recall):.2f}")
+        # Write queued audit entries while the database still exists
+        audit.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Credential-stuffing load test for login throttling.
+
+Threads hammer login_user() with wrong passwords for real usernames from a
+pool of client addresses, first with throttling disabled and then with the
+default limits. For each run it reports attempts, how many reached bcrypt,
+the bcrypt checks in the second half of the run (zero once every limit is
+reached), process CPU, and how long a legitimate user's login takes
+meanwhile. The attacking threads share the process, so its CPU includes
+their own loop; the bcrypt figures are the load an attack can impose. A fresh process then checks that a user throttled here is also
+refused there, through the shared login_failures table.
+
+Run from the repository root:
+    python -m benchmarks.bench_login_throttle --seconds 15 --threads 8
+
+--rounds sets the bcrypt cost of the test accounts (production uses 12);
+a lower cost lets the throttled run reach its limits within a short test.
+
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import multiprocessing
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import bcrypt
+
+import app.data.db as db
+from app.data.schema import create_all_tables
+from app.data.users import insert_user
+from app.services import user_service
+from app.services.user_service import LoginThrottle, login_user
+
+
+def attack(seconds, threads, usernames, clients):
+    """
+    Run the attack and a legitimate login loop concurrently; returns stats.
+    """
+    outcomes = Counter()
+    checks = []
+    legit = []
+    begin = time.perf_counter()
+    stop = begin + seconds
+    lock = threading.Lock()
+
+    def attacker(seed):
+        rng = random.Random(seed)
+        local = Counter()
+        local_checks = []
+        while time.perf_counter() < stop:
+            _, message = login_user(rng.choice(usernames), "wrong-password", client=rng.choice(clients))
+            local[message.split(".")[0]] += 1
+            if message.startswith("Incorrect password"):
+                local_checks.append(time.perf_counter() - begin)
+        with lock:
+            outcomes.update(local)
+            checks.extend(local_checks)
+
+    def legitimate():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            success, _ = login_user("legit", "legit-password", client="192.168.1.10")
+            legit.append((time.perf_counter() - start, success))
+            time.sleep(0.5)
+
+    workers = [threading.Thread(target=attacker, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=legitimate))
+    cpu, wall = time.process_time(), time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    return outcomes, checks, legit, cpu / wall, wall
+
+
+def report(label, outcomes, checks, legit, cores, wall):
+    attempts = sum(outcomes.values())
+    late = sum(1 for at in checks if at > wall / 2)
+    latencies = [seconds for seconds, _ in legit]
+    print(f"{label}")
+    print(f"  attempts            {attempts:>10,}  ({attempts / wall:,.0f}/s)")
+    print(f"  bcrypt checks       {len(checks):>10,}  ({late} in the second half)")
+    print(f"  throttled           {outcomes['Too many failed login attempts']:>10,}")
+    print(f"  CPU                 {cores:>10.2f} cores")
+    if latencies:
+        print(f"  legit login         {statistics.median(latencies) * 1000:>10.0f} ms median, "
+              f"{max(latencies) * 1000:.0f} ms max, {sum(ok for _, ok in legit)}/{len(legit)} succeeded")
+
+
+def other_process(db_path, username, results):
+    db.DB_PATH = Path(db_path)
+    start = time.perf_counter()
+    _, message = login_user(username, "wrong-password")
+    results.put((message, time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+
+        usernames = [f"victim{i}" for i in range(args.users)]
+        password_hash = bcrypt.hashpw(b"legit-password", bcrypt.gensalt(args.rounds)).decode()
+        for username in usernames + ["legit"]:
+            insert_user(username, password_hash)
+        clients = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+
+        # Baseline: no throttling and no cap on concurrent bcrypt work
+        user_service.LOGIN_THROTTLE = LoginThrottle(user_limit=(0, 0), client_limit=(0, 0))
+        user_service._bcrypt_slots = threading.BoundedSemaphore(args.threads + 1)
+        report("throttling off", *attack(args.seconds, args.threads, usernames, clients))
+
+        user_service.LOGIN_THROTTLE = LoginThrottle()
+        user_service._bcrypt_slots = threading.BoundedSemaphore(user_service.LOGIN_BCRYPT_SLOTS)
+        report("throttling on", *attack(args.seconds, args.threads, usernames, clients))
+
+        # A process with an empty in-memory window still sees the shared failures
+        results = multiprocessing.get_context("spawn").Queue()
+        process = multiprocessing.get_context("spawn").Process(
+            target=other_process, args=(str(db.DB_PATH), usernames[0], results)
+        )
+        process.start()
+        message, seconds = results.get(timeout=60)
+        process.join()
+        print(f"other process: {message!r} in {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
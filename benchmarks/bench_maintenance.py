@@ -0,0 +1,115 @@
+"""
+Storage maintenance: how much a fragmented database shrinks, and how long
+a concurrent writer is held up, for a throttled maintenance pass
+(app/services/maintenance.py) compared with a plain VACUUM.
+
+Run from the repository root:
+    python -m benchmarks.bench_maintenance --rows 200000
+
+The database is churned by inserting --rows incidents and hard-deleting
+every other one, which leaves half the pages free and the rest scattered.
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, update_incident_status
+from app.data.maintenance import database_stats, table_stats
+from app.services.maintenance import run_maintenance
+from benchmarks.datagen import incident_dicts
+
+
+def churn(rows):
+    bulk_insert_incidents(incident_dicts(rows))
+    conn = db.connect_database()
+    conn.execute("DELETE FROM cyber_incidents WHERE id % 2 = 0")
+    conn.execute("DELETE FROM change_log")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def writer(stop, latencies):
+    # An interactive user updating one incident every 10 ms
+    statuses = ("Open", "In Progress")
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        update_incident_status(1, statuses[i % 2])
+        latencies.append(time.perf_counter() - start)
+        i += 1
+        time.sleep(0.01)
+
+
+def with_writer(func, *args):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=writer, args=(stop, latencies))
+    thread.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    finally:
+        seconds = time.perf_counter() - start
+        stop.set()
+        thread.join()
+    latencies.sort()
+    return result, seconds, latencies
+
+
+def report(label, seconds, latencies):
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<28} {seconds:7.2f} s  writer p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms  "
+          f"p99 {p99:7.1f} ms  max {latencies[-1] * 1000:8.1f} ms  ({len(latencies)} writes)")
+
+
+def describe(stats):
+    return (f"{stats['file_bytes'] / 1e6:8.1f} MB, {stats['page_count']:,} pages, "
+            f"{stats['freelist_count']:,} free ({stats['free_percent']}%)")
+
+
+def incidents_fragmentation():
+    df = table_stats()
+    return df.loc[df["name"] == "cyber_incidents", "fragmented_percent"].iloc[0]
+
+
+def vacuum():
+    conn = db.connect_database()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("maintenance pass", "VACUUM"):
+            db.DB_PATH = Path(tmp) / f"bench-{label.split()[0].lower()}.db"
+            conn = db.connect_database()
+            db.get_backend().prepare_database(conn)
+            create_all_tables(conn)
+            conn.close()
+            # Measure maintenance, not the audit trail of the churn
+            audit.ENABLED = False
+            churn(args.rows)
+            print(f"{label}")
+            print(f"  before: {describe(database_stats())}, incidents {incidents_fragmentation()}% fragmented")
+            if label == "VACUUM":
+                _, seconds, latencies = with_writer(vacuum)
+            else:
+                _, seconds, latencies = with_writer(run_maintenance, True)
+            print(f"  after:  {describe(database_stats())}, incidents {incidents_fragmentation()}% fragmented")
+            report(f"  {label}", seconds, latencies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Webhook dispatch throughput: events/sec delivered from the notification
+outbox (app/services/notifications.py) to a local stub receiver, for each
+--batch-sizes value.
+
+Run from the repository root:
+    python -m benchmarks.bench_notifications --incidents 2000 --updates 2 --fail-rate 0.05
+
+Each run uses a throwaway database with --destinations webhook
+destinations pointing at the stub. --incidents incidents are created one
+by one (about half High/Critical, so queued), then every queued incident
+is updated --updates times before the dispatcher starts, which exercises
+coalescing. The stub answers 503 with Retry-After: 0 for --fail-rate of
+requests and 400 for --reject-rate of them (dead letters), after
+--latency-ms of simulated work. Every delivered body is checked against
+its HMAC signature, and each incident must reach each destination once.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import insert_incident, update_incident_status
+from app.data.notifications import add_destination, outbox_counts, NOTIFY_SEVERITIES
+from app.services.notifications import Dispatcher
+from benchmarks.datagen import incident_dicts
+
+SECRET = "bench-secret"
+
+
+class StubReceiver(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fail_rate, reject_rate, latency):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.failed = 0
+        self.rejected = 0
+        self.bad_signatures = 0
+        self.delivered = {}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(server.latency)
+        roll = random.random()
+        with server.lock:
+            server.requests += 1
+            if roll < server.fail_rate:
+                server.failed += 1
+                self._reply(503, {"Retry-After": "0"})
+                return
+            if roll < server.fail_rate + server.reject_rate:
+                server.rejected += 1
+                self._reply(400)
+                return
+            expected = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, self.headers.get("X-Signature-256", "")):
+                server.bad_signatures += 1
+            payload = json.loads(body)
+            for event in payload["events"]:
+                key = (payload["destination"], event["data"]["id"])
+                server.delivered[key] = server.delivered.get(key, 0) + 1
+        self._reply(204)
+
+    def _reply(self, status, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def prepare(tmp, receiver, args, batch_size):
+    db.DB_PATH = Path(tmp) / f"bench-{batch_size}.db"
+    conn = db.connect_database()
+    db.get_backend().prepare_database(conn)
+    create_all_tables(conn)
+    conn.close()
+    for n in range(args.destinations):
+        add_destination(f"stub-{n}", receiver.url, SECRET, batch_size)
+
+    start = time.perf_counter()
+    queued = []
+    for incident in incident_dicts(args.incidents, seed=batch_size):
+        incident_id = insert_incident(**incident)
+        if incident["severity"] in NOTIFY_SEVERITIES:
+            queued.append(incident_id)
+    for n in range(args.updates):
+        for incident_id in queued:
+            update_incident_status(incident_id, ("In Progress", "Open")[n % 2])
+    writes = args.incidents + args.updates * len(queued)
+    return queued, writes, time.perf_counter() - start
+
+
+async def drain(max_connections):
+    async with Dispatcher(max_connections=max_connections) as dispatcher:
+        start = time.perf_counter()
+        while True:
+            await dispatcher.run_once()
+            counts = outbox_counts()
+            if counts[counts["status"].isin(["pending", "sending"])].empty:
+                return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--incidents", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=2, help="updates per queued incident before dispatch")
+    parser.add_argument("--destinations", type=int, default=2)
+    parser.add_argument("--batch-sizes", default="1,50")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--connections", type=int, default=20)
+    args = parser.parse_args()
+
+    audit.ENABLED = False
+    receiver = StubReceiver(args.fail_rate, args.reject_rate, args.latency_ms / 1000)
+    threading.Thread(target=receiver.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            receiver.reset()
+            queued, writes, write_seconds = prepare(tmp, receiver, args, batch_size)
+            seconds = asyncio.run(drain(args.connections))
+
+            counts = outbox_counts().groupby("status")[["count", "coalesced"]].sum()
+            delivered = int(counts["count"].get("delivered", 0))
+            dead = int(counts["count"].get("dead", 0))
+            coalesced = int(counts["coalesced"].sum())
+            expected = len(queued) * args.destinations
+            duplicates = sum(n - 1 for n in receiver.delivered.values())
+            print(f"batch size {batch_size}")
+            print(f"  writes          {writes:,} in {write_seconds:.2f}s ({write_seconds / writes * 1000:.2f} ms each)")
+            print(f"  outbox          {delivered + dead:,} notifications for {expected:,} incident/destination "
+                  f"pairs, {coalesced:,} events coalesced")
+            print(f"  dispatch        {delivered:,} delivered in {seconds:.2f}s = {delivered / seconds:,.0f} events/s")
+            print(f"  requests        {receiver.requests:,} ({receiver.failed:,} 503s retried, "
+                  f"{receiver.rejected:,} 400s), {dead:,} dead letters")
+            print(f"  checks          {len(receiver.delivered):,} distinct received, {duplicates} duplicates, "
+                  f"{receiver.bad_signatures} bad signatures")
+            print()
+    receiver.shutdown()
+
+
+if __name__ == "__main__":
+    main()
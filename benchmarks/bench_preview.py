@@ -0,0 +1,96 @@
+"""
+Dataset preview latency on a large CSV (built by repeating a generated
+block, so a 10 GB file takes about a minute to write), plus the same file
+as Parquet and as a loaded table when --rows is given.
+
+    python -m benchmarks.bench_preview --gb 10 --dir /var/tmp
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import app.data.db as db
+from app.data.schema import create_all_tables
+from app.data.datasets import ensure_dataset_schema, save_dataset_profile
+from app.services import dataset_preview
+from app.services.dataset_registry import register_dataset
+
+
+def write_csv(path, gigabytes, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = 500000
+    block = pd.DataFrame({
+        "event_id": np.arange(rows),
+        "host": [f"host-{i}" for i in rng.integers(0, 5000, rows)],
+        "bytes": rng.integers(0, 10**6, rows),
+        "latency_ms": rng.gamma(2.0, 20.0, rows).round(3),
+        "status": rng.choice(["ok", "error", "timeout"], rows, p=[0.9, 0.08, 0.02]),
+    }).to_csv(index=False, header=False).encode()
+    target = int(gigabytes * 1024**3)
+    with open(path, "wb") as f:
+        f.write(b"event_id,host,bytes,latency_ms,status\n")
+        written = 0
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:9.1f} ms  ({len(result)} rows)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--gb", type=float, default=1.0)
+    parser.add_argument("--dir", default=None, help="where to write the test files (needs --gb free space)")
+    parser.add_argument("--rows", type=int, default=1000000, help="rows for the Parquet and table variants")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        db.DB_PATH = Path(tmp) / "preview.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+        ensure_dataset_schema()
+
+        path = Path(tmp) / "events.csv"
+        start = time.perf_counter()
+        size = write_csv(path, args.gb)
+        print(f"wrote {size / 1024**3:.2f} GB in {time.perf_counter() - start:.1f} s")
+        # Registered without profiling: a full profile of 10 GB takes minutes
+        dataset_id = save_dataset_profile({
+            "dataset_name": "events", "file_path": str(path), "file_format": "csv",
+        })
+
+        for mode in dataset_preview.MODES:
+            timed(f"csv {mode}", lambda: dataset_preview.preview(dataset_id, mode))
+        timed("csv summary (cold)", lambda: dataset_preview.summarize(dataset_id))
+        timed("csv summary (cached)", lambda: dataset_preview.summarize(dataset_id))
+
+        if args.rows:
+            small = Path(tmp) / "events_small.csv"
+            pd.read_csv(path, nrows=args.rows).to_csv(small, index=False)
+            small_id = register_dataset(small, table_name="events_small")["id"]
+            timed("csv reservoir sample", lambda: dataset_preview.preview(small_id, "sample"))
+
+            parquet = Path(tmp) / "events.parquet"
+            pd.read_csv(small).to_parquet(parquet, row_group_size=100000)
+            parquet_id = register_dataset(parquet)["id"]
+            for mode in dataset_preview.MODES:
+                timed(f"parquet {mode}", lambda: dataset_preview.preview(parquet_id, mode))
+
+            small.unlink()
+            for mode in dataset_preview.MODES:
+                timed(f"table {mode}", lambda: dataset_preview.preview(small_id, mode))
+
+
+if __name__ == "__main__":
+    main()
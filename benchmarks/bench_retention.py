@@ -0,0 +1,82 @@
+"""
+Retention: hot-table scan time before and after archiving, archive
+throughput, how long a concurrent writer is held up, and archive search.
+
+Run from the repository root:
+    python -m benchmarks.bench_retention --rows 100000
+
+The synthetic incidents are dated 2024-2025 with a quarter each Closed and
+Resolved, so with the default one-year policy about half are archived.
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.incidents import bulk_insert_incidents, get_all_incidents, update_incident_status
+from app.data.archive import search_archive, archive_stats
+from app.services.retention import run_retention
+from benchmarks.datagen import incident_dicts
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def writer(stop, latencies):
+    # An interactive user updating one incident every 10 ms
+    while not stop.is_set():
+        start = time.perf_counter()
+        update_incident_status(1, "Open")
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        db.get_backend().prepare_database(conn)
+        create_all_tables(conn)
+        conn.close()
+        # Measure retention alone, not the audit trail of the setup writes
+        audit.ENABLED = False
+        bulk_insert_incidents(incident_dicts(args.rows))
+
+        timed("get_all_incidents (before)", get_all_incidents)
+
+        stop = threading.Event()
+        latencies = []
+        thread = threading.Thread(target=writer, args=(stop, latencies))
+        thread.start()
+        start = time.perf_counter()
+        moved = run_retention()
+        seconds = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        archived = sum(moved.values())
+        print(f"{'run_retention':<40} {seconds * 1000:10.1f} ms  {archived:,} rows  {archived / seconds:,.0f} rows/sec")
+        latencies.sort()
+        print(f"{'concurrent update_incident_status':<40} {latencies[len(latencies) // 2] * 1000:10.1f} ms p50  "
+              f"{latencies[-1] * 1000:.1f} ms max  ({len(latencies)} writes)")
+
+        timed("get_all_incidents (after)", get_all_incidents)
+        timed("search_archive (substring)", search_archive, "cyber_incidents", text="Incident 4242")
+        timed("search_archive (status filter)", search_archive, "cyber_incidents", filters={"status": "Closed"})
+        print(archive_stats().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Near-duplicate ticket index: indexing throughput and find_similar_tickets
+latency.
+
+    python -m benchmarks.bench_similarity --rows 1000000 --lookups 500
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data.tickets import bulk_insert_tickets
+from app.data.similarity import find_similar_tickets, rebuild_similarity_index
+from benchmarks.datagen import ticket_dicts
+
+WORDS = (
+    "outlook email vpn printer laptop password reset account locked network slow wifi "
+    "disconnects crash error install update license access denied share drive backup "
+    "monitor keyboard mouse teams meeting audio camera browser certificate expired "
+    "server timeout database report excel macro phone sync calendar invite"
+).split()
+
+
+def descriptions(n, seed=0):
+    """
+    Short descriptions from a small vocabulary; about a fifth are edited
+    copies of an earlier one, like re-filed tickets.
+    """
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        if texts and rng.random() < 0.2:
+            words = rng.choice(texts[-1000:]).split()
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+        else:
+            words = rng.sample(WORDS, 8)
+        texts.append(" ".join(words))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "similarity.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+
+        tickets = list(ticket_dicts(args.rows))
+        for ticket, text in zip(tickets, descriptions(args.rows)):
+            ticket["description"] = text
+
+        start = time.perf_counter()
+        for offset in range(0, len(tickets), args.batch):
+            bulk_insert_tickets(tickets[offset:offset + args.batch])
+        seconds = time.perf_counter() - start
+        print(f"insert + index  {args.rows:>10,} tickets  {seconds:8.1f} s  ({args.rows / seconds:,.0f}/s)")
+
+        start = time.perf_counter()
+        rebuild_similarity_index()
+        print(f"full rebuild    {args.rows:>10,} tickets  {time.perf_counter() - start:8.1f} s")
+
+        rng = random.Random(1)
+        samples = []
+        found = 0
+        for ticket in rng.sample(tickets, min(args.lookups, len(tickets))):
+            start = time.perf_counter()
+            similar = find_similar_tickets(ticket["ticket_id"], k=5)
+            samples.append((time.perf_counter() - start) * 1000)
+            found += not similar.empty
+        samples.sort()
+        print(
+            f"lookup          p50 {statistics.median(samples):6.2f} ms  "
+            f"p99 {samples[int(len(samples) * 0.99) - 1]:6.2f} ms  "
+            f"({found}/{len(samples)} with a match >= 0.5)"
+        )
+        # Write queued audit entries while the database still exists
+        audit.flush()
+
+
+if __name__ == "__main__":
+    main()
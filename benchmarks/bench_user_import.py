@@ -0,0 +1,94 @@
+"""
+Bulk user import: per-row inserts vs the import pipeline, plaintext hashing
+with and without a process pool, and paged user search.
+
+Run from the repository root:
+    python -m benchmarks.bench_user_import --users 10000 --rounds 4
+
+--rounds sets the bcrypt cost for the plaintext run; each step up doubles
+the hashing time (the default cost of 12 is ~250x cost 4), so hashing
+dominates at production cost and scales with the number of workers.
+Uses a throwaway database so DATA/intelligence_platform.db is never touched.
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import bcrypt
+
+import app.data.db as db
+from app.data.schema import create_all_tables
+from app.data.permissions import seed_permissions
+from app.data.users import insert_user, search_users
+from app.services.user_import import import_users
+
+
+def timed(label, rows, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<46} {rows:>8} rows  {elapsed:8.3f}s  {rows / elapsed:>12,.0f} rows/sec")
+    return result
+
+
+def per_row(users):
+    for username, password_hash, role in users:
+        insert_user(username, password_hash, role)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    n = args.users
+    # One valid hash is enough to measure validation and inserts
+    password_hash = bcrypt.hashpw(b"password", bcrypt.gensalt(args.rounds)).decode()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        conn = db.connect_database()
+        create_all_tables(conn)
+        conn.close()
+        seed_permissions()
+
+        timed("insert_user (per row, pre-hashed)", n, per_row,
+              [(f"row-{i}", password_hash, "user") for i in range(n)])
+
+        hashed = [{"username": f"hashed-{i}", "password_hash": password_hash, "role": "analyst"} for i in range(n)]
+        report = timed("import_users (pre-hashed)", n, import_users, hashed)
+        print(f"  {report.summary()}")
+        report = timed("import_users (re-import, all skipped)", n, import_users, hashed)
+        print(f"  {report.summary()}")
+
+        plain = [{"username": f"plain-{i}", "password": f"secret-{i}"} for i in range(n)]
+        report = timed(f"import_users (plaintext, cost {args.rounds}, 1 worker)", n,
+                       import_users, plain, rounds=args.rounds, workers=1)
+        print(f"  {report.summary()}")
+        if args.workers > 1:
+            plain = [{"username": f"pool-{i}", "password": f"secret-{i}"} for i in range(n)]
+            report = timed(f"import_users (plaintext, {args.workers} workers)", n,
+                           import_users, plain, rounds=args.rounds, workers=args.workers)
+            print(f"  {report.summary()}")
+
+        mixed = [{"username": f"mixed-{i}", "password_hash": "not-a-hash" if i % 10 == 0 else password_hash,
+                  "role": "nobody" if i % 10 == 1 else "user"} for i in range(n)]
+        report = timed("import_users (20% bad rows)", n, import_users, mixed)
+        print(f"  {report.summary()}")
+
+        pages = 100
+        start = time.perf_counter()
+        for page in range(1, pages + 1):
+            search_users(page=page, page_size=50)
+        print(f"{'search_users (page of 50)':<46} {(time.perf_counter() - start) / pages * 1000:8.2f} ms/page")
+        start = time.perf_counter()
+        for i in range(pages):
+            search_users(search=f"hashed-{i * 7}", page=1, page_size=50)
+        print(f"{'search_users (substring)':<46} {(time.perf_counter() - start) / pages * 1000:8.2f} ms/search")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+
+Exits non-zero when any step's median slowed down by more than --threshold.
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio counted as a regression")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    candidate = json.loads(Path(args.candidate).read_text())
+    print(f"{baseline['commit']} -> {candidate['commit']}")
+
+    regressions = 0
+    for size, steps in candidate["sizes"].items():
+        base_steps = baseline["sizes"].get(size)
+        if not base_steps:
+            continue
+        print(f"== {int(size):,} rows")
+        for name, stats in steps.items():
+            if name not in base_steps:
+                continue
+            before = base_steps[name]["median"]
+            after = stats["median"]
+            ratio = after / before if before else float("inf")
+            flag = ""
+            if ratio > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif ratio < 1 / args.threshold:
+                flag = "  faster"
+            print(f"  {name:<40} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  x{ratio:5.2f}{flag}")
+
+    print(f"{regressions} regression(s)")
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Synthetic incidents and tickets shaped like DATA/cyber_incidents.csv and
+DATA/it_tickets.csv, for benchmarks at 10k/100k/1M rows.
+
+    python -m benchmarks.datagen --rows 100000 --out /tmp/bench-data
+"""
+import argparse
+import csv
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SEVERITIES = ["Low", "Medium", "High", "Critical"]
+INCIDENT_TYPES = ["Malware", "Phishing", "DDoS", "Unauthorized Access", "Misconfiguration", "Data Leak"]
+STATUSES = ["Open", "In Progress", "Resolved", "Closed"]
+PRIORITIES = ["Low", "Medium", "High", "Critical"]
+ASSIGNEES = ["IT_Support_A", "IT_Support_B", "IT_Support_C", "Network_Team", "Service_Desk"]
+
+INCIDENT_HEADER = ["incident_id", "timestamp", "severity", "category", "status", "description"]
+TICKET_HEADER = ["ticket_id", "priority", "description", "status", "assigned_to", "created_at", "resolution_time_hours"]
+
+START = datetime(2024, 1, 1)
+
+
+def incident_rows(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        timestamp = START + timedelta(hours=rng.randrange(24 * 365 * 2))
+        yield [
+            1000 + i,
+            timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            rng.choice(SEVERITIES),
+            rng.choice(INCIDENT_TYPES),
+            rng.choice(STATUSES),
+            f"Incident {i} description",
+        ]
+
+
+def ticket_rows(n, seed=0):
+    rng = random.Random(seed + 1)
+    for i in range(n):
+        created = START + timedelta(hours=rng.randrange(24 * 365 * 2))
+        yield [
+            2000 + i,
+            rng.choice(PRIORITIES),
+            f"Ticket {i} problem description",
+            rng.choice(STATUSES),
+            rng.choice(ASSIGNEES),
+            created.strftime("%Y-%m-%d %H:%M:%S"),
+            rng.randrange(1, 120),
+        ]
+
+
+def write_csvs(n, out_dir, seed=0):
+    """
+    Write incidents.csv and tickets.csv with `n` rows each; returns their paths.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    incidents_path = out_dir / f"cyber_incidents_{n}.csv"
+    tickets_path = out_dir / f"it_tickets_{n}.csv"
+    for path, header, rows in (
+        (incidents_path, INCIDENT_HEADER, incident_rows(n, seed)),
+        (tickets_path, TICKET_HEADER, ticket_rows(n, seed)),
+    ):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+    return incidents_path, tickets_path
+
+
+def incident_dicts(n, seed=0):
+    """
+    Rows in the shape bulk_insert_incidents expects.
+    """
+    for _, timestamp, severity, category, status, description in incident_rows(n, seed):
+        yield {
+            "date": timestamp,
+            "incident_type": category,
+            "severity": severity,
+            "status": status,
+            "description": description,
+        }
+
+
+def ticket_dicts(n, seed=0):
+    """
+    Rows in the shape bulk_insert_tickets expects.
+    """
+    for ticket_id, priority, description, status, assigned_to, created_at, hours in ticket_rows(n, seed):
+        yield {
+            "ticket_id": str(ticket_id),
+            "priority": priority,
+            "status": status,
+            "description": description,
+            "created_date": created_at,
+            "resolved_date": str(hours),
+            "assigned_to": assigned_to,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--out", default="bench-data")
+    args = parser.parse_args()
+    for path in write_csvs(args.rows, args.out):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Spawn N processes that bootstrap the same database concurrently and then run
+a mix of reads and writes, like several Streamlit replicas behind a load
+balancer. Reports throughput, lock errors and whether the final state adds up.
+
+Run from the repository root:
+    python -m benchmarks.multiprocess_harness --processes 8 --ops 300
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+
+def worker(db_path, worker_id, ops, write_ratio, results):
+    # Configure through the environment, exactly as a deployed replica would
+    os.environ["DB_PATH"] = db_path
+    from app.services.bootstrap import bootstrap_database
+    from app.data.cache import cached
+    from app.data.incidents import get_all_incidents, insert_incident, update_incident_status
+    from app.data.changes import changes_since
+    from app.data import audit
+
+    bootstrap_database()
+
+    rng = random.Random(worker_id)
+    inserted = reads = writes = errors = 0
+    start = time.perf_counter()
+    for i in range(ops):
+        try:
+            if rng.random() < write_ratio:
+                if rng.random() < 0.5:
+                    insert_incident("2024-01-01", "Harness", "High", "Open", f"worker {worker_id} op {i}")
+                    inserted += 1
+                else:
+                    update_incident_status(rng.randint(1, 100), "Resolved")
+                writes += 1
+            else:
+                cached("cyber_incidents", get_all_incidents)
+                changes_since(0, "cyber_incidents", limit=50)
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    # Child processes skip atexit handlers, so write queued audit entries now
+    audit.flush()
+    results.put((worker_id, inserted, reads, writes, errors, time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=300)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "harness.db")
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(db_path, n, args.ops, args.write_ratio, results))
+            for n in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for proc in procs:
+            proc.start()
+        rows = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        total_inserted = sum(r[1] for r in rows)
+        total_ops = sum(r[2] + r[3] for r in rows)
+        total_errors = sum(r[4] for r in rows)
+        for worker_id, inserted, reads, writes, errors, seconds in sorted(rows):
+            print(f"worker {worker_id:>2}: {reads:>5} reads {writes:>5} writes {errors:>3} errors in {seconds:6.2f}s")
+        print(f"{args.processes} processes, {total_ops} ops in {elapsed:.2f}s ({total_ops / elapsed:,.0f} ops/sec), {total_errors} errors")
+
+        conn = sqlite3.connect(db_path)
+        harness_rows = conn.execute("SELECT COUNT(*) FROM cyber_incidents WHERE incident_type = 'Harness'").fetchone()[0]
+        csv_rows = conn.execute("SELECT COUNT(*) FROM cyber_incidents WHERE incident_type != 'Harness'").fetchone()[0]
+        admins = conn.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'").fetchone()[0]
+        conn.close()
+
+        # Racing bootstraps would migrate the CSV or create the admin more than once
+        with open("DATA/cyber_incidents.csv") as f:
+            expected_csv = sum(1 for _ in f) - 1
+        print(f"inserted rows: {harness_rows} (expected {total_inserted})")
+        print(f"migrated CSV rows: {csv_rows} (expected {expected_csv}), admin users: {admins} (expected 1)")
+        ok = harness_rows == total_inserted and csv_rows == expected_csv and admins == 1
+        print("OK" if ok else "MISMATCH")
+        raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark harness for the data layer, CSV migrations, login and page renders.
+
+For each size a fresh throwaway database is filled from synthetic CSVs
+(benchmarks/datagen.py) and every step is timed a few times. Results go to
+benchmarks/results/<commit>.json; compare two runs with benchmarks/compare.py.
+
+    python -m benchmarks.run --sizes 10000 100000
+    python -m benchmarks.run --sizes 1000000 --skip-pages --repeat 3
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import app.data.db as db
+from app.data import audit
+from app.data.schema import create_all_tables
+from app.data import incidents, tickets, datasets, users
+from app.data.changes import changes_since
+from app.data.cache import clear_cache
+from app.services.user_service import register_user, login_user, LOGIN_THROTTLE
+from benchmarks.datagen import write_csvs
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+PAGES = ["Dashboard", "Cyber", "Tickets", "Analyzer", "TicketAnalyzer"]
+
+
+def measure(func, repeat):
+    """
+    Call func() `repeat` times and return timing stats in seconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+        "repeat": repeat,
+    }
+
+
+def fresh_database(directory, name):
+    db.DB_PATH = Path(directory) / name
+    clear_cache()
+    conn = db.connect_database()
+    create_all_tables(conn)
+    conn.close()
+    tickets.ensure_ticket_schema()
+
+
+def bench_migrations(size, data_dir, work_dir):
+    incidents_csv, tickets_csv = write_csvs(size, data_dir)
+    fresh_database(work_dir, f"migrate_{size}.db")
+    results = {
+        "migrate_incidents_from_file": measure(lambda: incidents.migrate_incidents_from_file(str(incidents_csv)), 1),
+        "migrate_tickets_from_file": measure(lambda: tickets.migrate_tickets_from_file(str(tickets_csv)), 1),
+        "migrate_datasets_metadata_from_file": measure(
+            lambda: datasets.migrate_datasets_metadata_from_file(str(ROOT / "DATA" / "datasets_metadata.csv")), 1
+        ),
+    }
+    return results
+
+
+def bench_data_layer(size, repeat):
+    ids = incidents.get_all_incidents()["id"].tolist()
+    some_ids = ids[: min(1000, len(ids))]
+    ticket_frame = tickets.get_all_tickets()
+    ticket_row_ids = ticket_frame["id"].tolist()[:1000]
+    ticket_ids = ticket_frame["ticket_id"].tolist()[:1000]
+    counter = iter(range(10**9))
+
+    return {
+        "get_all_incidents": measure(incidents.get_all_incidents, repeat),
+        "get_incidents_by_ids[1000]": measure(lambda: incidents.get_incidents_by_ids(some_ids), repeat),
+        "get_incident_by_id": measure(lambda: incidents.get_incident_by_id(ids[len(ids) // 2]), repeat),
+        "insert_incident": measure(
+            lambda: incidents.insert_incident("2024-01-01", "Bench", "Low", "Open", "bench"), repeat
+        ),
+        "update_incident_status": measure(lambda: incidents.update_incident_status(ids[0], "Closed"), repeat),
+        "update_incident": measure(lambda: incidents.update_incident(ids[0], severity="High"), repeat),
+        "bulk_update_incidents[1000]": measure(
+            lambda: incidents.bulk_update_incidents(some_ids, status="Resolved"), repeat
+        ),
+        "changes_since": measure(lambda: changes_since(0, "cyber_incidents", limit=1000), repeat),
+        "get_all_tickets": measure(tickets.get_all_tickets, repeat),
+        "get_tickets_by_row_ids[1000]": measure(lambda: tickets.get_tickets_by_row_ids(ticket_row_ids), repeat),
+        "get_ticket_by_id": measure(lambda: tickets.get_ticket_by_id(ticket_ids[0]), repeat),
+        "insert_ticket": measure(
+            lambda: tickets.insert_ticket(f"BENCH-{next(counter)}", "Low", "Open", None, None, "bench", "2024-01-01"),
+            repeat,
+        ),
+        "update_ticket": measure(lambda: tickets.update_ticket(ticket_ids[0], status="Closed"), repeat),
+        "bulk_update_tickets[1000]": measure(lambda: tickets.bulk_update_tickets(ticket_ids, status="Open"), repeat),
+        "get_all_datasets_metadata": measure(datasets.get_all_datasets_metadata, repeat),
+        "list_users": measure(users.list_users, repeat),
+        "get_user_by_username": measure(lambda: users.get_user_by_username("bench_user"), repeat),
+    }
+
+
+def _wrong_password():
+    # Forget earlier failures so every sample checks the password
+    LOGIN_THROTTLE.reset("bench_user")
+    login_user("bench_user", "nope")
+
+
+def bench_login(repeat):
+    register_user("bench_user", "bench-password")
+    results = {
+        "register_user": measure(lambda: register_user(f"bench_{time.perf_counter_ns()}", "pw"), repeat),
+        "login_user[success]": measure(lambda: login_user("bench_user", "bench-password"), repeat),
+        "login_user[wrong_password]": measure(_wrong_password, repeat),
+        "login_user[unknown_user]": measure(lambda: login_user(f"nobody_{time.perf_counter_ns()}", "nope"), repeat),
+    }
+    for _ in range(LOGIN_THROTTLE.windows["user"].limit if "user" in LOGIN_THROTTLE.windows else 0):
+        login_user("bench_user", "nope")
+    results["login_user[throttled]"] = measure(lambda: login_user("bench_user", "nope"), repeat)
+    LOGIN_THROTTLE.reset("bench_user")
+    return results
+
+
+def bench_pages(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for page in PAGES:
+        def render():
+            clear_cache()
+            at = AppTest.from_file(str(ROOT / "pages" / f"{page}.py"), default_timeout=600)
+            at.session_state["logged_in"] = True
+            at.session_state["username"] = "bench_user"
+            at.session_state["user_role"] = "admin"
+            at.run()
+            if at.exception:
+                raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+        results[f"page:{page}"] = measure(render, repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-pages", action="store_true")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            print(f"== {size:,} rows")
+            results = bench_migrations(size, Path(tmp) / "data", tmp)
+            results.update(bench_login(args.repeat))
+            results.update(bench_data_layer(size, args.repeat))
+            if not args.skip_pages:
+                results.update(bench_pages(max(1, args.repeat // 2)))
+            for name, stats in results.items():
+                print(f"  {name:<40} median {stats['median'] * 1000:10.2f} ms")
+            report["sizes"][str(size)] = results
+            # Write queued audit entries before the next size replaces the database
+            audit.flush()
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
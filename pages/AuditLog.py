@@ -0,0 +1,108 @@
+import json
+import streamlit as st
+import pandas as pd
+from datetime import date, timedelta
+from app.data.audit import query_audit_log, list_audit_actors, flush, ACTIONS, ENTITY_KEYS, AUDIT_FLUSH_SECONDS
+
+ENTITY_LABELS = {"cyber_incidents": "Incident", "it_tickets": "Ticket"}
+
+def _text(value):
+    return "" if value is None else str(value)
+
+class AuditLogApp:
+    def run(self):
+        self._check_auth()
+        self._render_title()
+        self._render_filters()
+        self._load_entries()
+        self._render_entries()
+        st.divider()
+        self._render_changes()
+
+    def _check_auth(self):
+        if not st.session_state.get("logged_in"):
+            st.switch_page("pages/Login.py")
+        if st.session_state.get("user_role") != "admin":
+            st.info("The audit log is only available for administrators.")
+            st.stop()
+
+    def _render_title(self):
+        st.title("Audit Log")
+        st.caption(
+            f"Creates, updates and deletes of incidents and tickets. Entries are written in batches "
+            f"and may take up to {AUDIT_FLUSH_SECONDS:g}s to appear."
+        )
+
+    def _render_filters(self):
+        left, middle, right = st.columns(3)
+        actor = left.selectbox("Actor", ["All"] + list_audit_actors(), key="audit_actor")
+        entity = middle.selectbox(
+            "Entity", ["All"] + list(ENTITY_KEYS), format_func=lambda e: ENTITY_LABELS.get(e, e), key="audit_entity"
+        )
+        action = right.selectbox("Action", ["All", *ACTIONS], key="audit_action")
+
+        left, middle, right = st.columns(3)
+        entity_id = left.text_input("Incident / ticket ID", key="audit_entity_id", disabled=entity == "All")
+        since = middle.date_input("From", value=date.today() - timedelta(days=7), key="audit_since")
+        until = right.date_input("To", value=date.today(), key="audit_until")
+        limit = st.select_slider("Show at most", [50, 200, 1000, 5000], value=200, key="audit_limit")
+
+        self.filters = dict(
+            actor=None if actor == "All" else actor,
+            entity=None if entity == "All" else entity,
+            entity_id=entity_id.strip() if entity != "All" else None,
+            action=None if action == "All" else action,
+            since=since,
+            until=until + timedelta(days=1),
+            limit=limit,
+        )
+
+    def _load_entries(self):
+        if st.button("Refresh", key="audit_refresh"):
+            # Write out anything this process still has queued
+            flush()
+        self.entries = query_audit_log(**self.filters)
+
+    def _render_entries(self):
+        st.subheader("Entries")
+        if self.entries.empty:
+            st.info("No audit entries match these filters.")
+            return
+
+        df = self.entries.copy()
+        df["entity"] = df["entity"].map(lambda e: ENTITY_LABELS.get(e, e))
+        df["fields"] = df["changes"].map(lambda c: ", ".join(json.loads(c)))
+        st.dataframe(
+            df,
+            column_order=["occurred_at", "actor", "action", "entity", "entity_id", "fields"],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    def _render_changes(self):
+        st.subheader("Field Changes")
+        if self.entries.empty:
+            return
+
+        labels = [
+            f"{entry_id}: {occurred_at} {actor} {action} {ENTITY_LABELS.get(entity, entity)} {entity_id}"
+            for entry_id, occurred_at, actor, action, entity, entity_id in zip(
+                self.entries["id"], self.entries["occurred_at"], self.entries["actor"],
+                self.entries["action"], self.entries["entity"], self.entries["entity_id"],
+            )
+        ]
+        selected = st.selectbox("Entry", labels, key="audit_entry_select")
+        entry = self.entries[self.entries["id"] == int(selected.split(":")[0])].iloc[0]
+
+        changes = json.loads(entry["changes"])
+        st.dataframe(
+            pd.DataFrame(
+                [(field, _text(before), _text(after)) for field, (before, after) in changes.items()],
+                columns=["Field", "Before", "After"],
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+if __name__ == "__main__":
+    AuditLogApp().run()
@@ -1,52 +1,100 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
+from app.services.frames import shared_frame, frame_labels, build_labels
 from app.data.incidents import (
     get_all_incidents,
+    get_incidents_by_ids,
     get_incident_by_id,
     insert_incident as create_incident,
     update_incident,
     delete_incident,
+    bulk_update_incidents,
+    bulk_delete_incidents,
+    get_deleted_incidents,
+    restore_incident,
 )
+from app.data.archive import search_archive
+from app.data.alerts import get_alerts, update_alert_status
+from app.data.permissions import get_policy
+from app.services.profiling import profile_steps
 
+# How often the overview polls the change log for other users' edits
+LIVE_REFRESH_SECONDS = 5
+
+@profile_steps
 class CyberDashboardApp:
     def run(self):
         self._check_auth()
+        self._resolve_scope()
         self._render_title()
-        self._load_incidents()
-        self._render_overview()
+        self._render_alerts()
+        self._render_live_overview()
         self._render_tabs()
 
     def _check_auth(self):
         if not st.session_state.get("logged_in"):
             st.switch_page("pages/Login.py")
 
+    def _resolve_scope(self):
+        # Row-level access: every incident query below is filtered in SQL
+        self.scope = get_policy(st.session_state.get("username"), "cyber_incidents")
+
     def _render_title(self):
         st.title("Cyber Dashboard")
 
-    def _load_incidents(self):
-        with st.spinner("Loading incidents..."):
-            raw = get_all_incidents()
+    def _render_alerts(self):
+        alerts = get_alerts(status="open")
+        if alerts.empty:
+            return
 
-        if isinstance(raw, pd.DataFrame):
-            df = raw.copy()
-        else:
-            df = pd.DataFrame(raw)
+        with st.expander(f"Anomaly Alerts ({len(alerts)} open)", expanded=True):
+            st.dataframe(
+                alerts,
+                column_order=["bucket_start", "incident_type", "severity", "observed", "expected", "zscore"],
+                use_container_width=True,
+            )
 
-        if "created_at" in df.columns:
-            df = df.drop(columns=["created_at"])
+            alert_options = [
+                f"{alert_id}: {bucket} {incident_type} - {severity}"
+                for alert_id, bucket, incident_type, severity in zip(
+                    alerts["id"], alerts["bucket_start"], alerts["incident_type"], alerts["severity"]
+                )
+            ]
+            selected = st.multiselect("Alerts to acknowledge", options=alert_options, key="alert_ack_select")
+
+            if st.button("Acknowledge", key="alert_ack_button", disabled=not selected):
+                for label in selected:
+                    update_alert_status(int(label.split(":")[0]), "acknowledged")
+                st.success(f"Acknowledged {len(selected)} alert(s).")
+                st.rerun()
+
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+    def _render_live_overview(self):
+        self._load_incidents()
+        self._render_overview()
 
-        df = df.fillna("None")
+    def _load_incidents(self):
+        # One read-only frame per process, kept current from the change log;
+        # never copy or modify it here.
+        with st.spinner("Loading incidents..."):
+            df = shared_frame(
+                "cyber_incidents", get_all_incidents, get_incidents_by_ids, scope=self.scope
+            )
 
-        if df.empty:
+        if df.empty and self.scope.restricted:
+            # Users who may only see some rows can still create new ones
+            st.info("No incidents are visible to you yet.")
+        elif df.empty:
             st.error("No incidents found.")
             st.stop()
 
         self.df = df
+        self.labels = frame_labels(df, "id", "incident_type", "severity")
+        self.display_columns = [c for c in df.columns if c != "created_at"]
 
     def _render_overview(self):
         st.subheader("Cyber Incidents")
-        st.dataframe(self.df)
+        st.dataframe(self.df, column_order=self.display_columns)
 
         st.subheader("Incidents by Type")
 
@@ -57,7 +105,7 @@ class CyberDashboardApp:
         left.metric("High", high_count)
         right.metric("Incidents", total_count)
 
-        counts = self.df["severity"].value_counts().reset_index()
+        counts = self.df["severity"].fillna("None").value_counts().reset_index()
         counts.columns = ["severity", "count"]
 
         st.bar_chart(counts.set_index("severity")["count"])
@@ -65,8 +113,8 @@ class CyberDashboardApp:
         st.divider()
 
     def _render_tabs(self):
-        tab1, tab2, tab3 = st.tabs(
-            ["Create Incident", "Update Incident", "Delete Incident"]
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(
+            ["Create Incident", "Update Incident", "Delete Incident", "Bulk Actions", "Deleted & Archived"]
         )
 
         with tab1:
@@ -78,6 +126,12 @@ class CyberDashboardApp:
         with tab3:
             self._delete_incident_tab()
 
+        with tab4:
+            self._bulk_actions_tab()
+
+        with tab5:
+            self._archive_tab()
+
     def _create_incident_tab(self):
         st.subheader("Add New Incident")
 
@@ -89,6 +143,7 @@ class CyberDashboardApp:
                 "Status", ["Open", "In Progress", "Resolved", "Closed"]
             )
             description = st.text_area("Description")
+            assigned_to = st.text_input("Assigned To")
 
             submitted = st.form_submit_button("Add Incident")
 
@@ -103,6 +158,7 @@ class CyberDashboardApp:
                         "status": status,
                         "description": description,
                         "reported_by": st.session_state.get("username"),
+                        "assigned_to": assigned_to or None,
                     }
 
                     try:
@@ -115,10 +171,7 @@ class CyberDashboardApp:
     def _update_incident_tab(self):
         st.subheader("Update Incident")
 
-        incident_options = [
-            f"{row['id']}: {row.get('incident_type', 'N/A')} - {row.get('severity', 'N/A')}"
-            for _, row in self.df.iterrows()
-        ]
+        incident_options = self.labels
 
         if incident_options:
             selected_incident_label = st.selectbox(
@@ -129,7 +182,7 @@ class CyberDashboardApp:
 
             if selected_incident_label:
                 selected_id = int(selected_incident_label.split(":")[0])
-                incident = get_incident_by_id(selected_id)
+                incident = get_incident_by_id(selected_id, scope=self.scope)
 
                 if incident:
                     with st.form("update_incident_form"):
@@ -185,6 +238,10 @@ class CyberDashboardApp:
                             "Description",
                             value=incident["description"] or "",
                         )
+                        assigned_to = st.text_input(
+                            "Assigned To",
+                            value=incident["assigned_to"] or "",
+                        )
 
                         submitted = st.form_submit_button("Update Incident")
 
@@ -202,6 +259,8 @@ class CyberDashboardApp:
                                         severity=severity,
                                         status=status,
                                         description=description,
+                                        assigned_to=assigned_to,
+                                        scope=self.scope,
                                     )
                                     st.success(
                                         "Incident updated successfully!"
@@ -217,10 +276,7 @@ class CyberDashboardApp:
     def _delete_incident_tab(self):
         st.subheader("Delete Incident")
 
-        delete_options = [
-            f"{row['id']}: {row.get('incident_type', 'N/A')} - {row.get('severity', 'N/A')}"
-            for _, row in self.df.iterrows()
-        ]
+        delete_options = self.labels
 
         if delete_options:
             selected_delete_label = st.selectbox(
@@ -231,7 +287,7 @@ class CyberDashboardApp:
 
             if selected_delete_label:
                 selected_id = int(selected_delete_label.split(":")[0])
-                incident = get_incident_by_id(selected_id)
+                incident = get_incident_by_id(selected_id, scope=self.scope)
 
                 if incident:
                     st.warning(
@@ -252,7 +308,8 @@ class CyberDashboardApp:
                         key="confirm_delete",
                     ):
                         try:
-                            delete_incident(selected_id)
+                            # Soft delete: restorable until retention archives it
+                            delete_incident(selected_id, soft=True, scope=self.scope)
                             st.success(
                                 "Incident deleted successfully!"
                             )
@@ -264,5 +321,79 @@ class CyberDashboardApp:
         else:
             st.info("No incidents available to delete.")
 
+    def _bulk_actions_tab(self):
+        st.subheader("Bulk Actions")
+
+        statuses = ["Open", "In Progress", "Resolved", "Closed"]
+        select_by_status = st.multiselect(
+            "Select all incidents with status",
+            statuses,
+            key="bulk_incident_status_filter",
+        )
+
+        selected_labels = st.multiselect(
+            "Or pick individual incidents",
+            options=self.labels,
+            key="bulk_incident_select",
+        )
+
+        incident_ids = [int(label.split(":")[0]) for label in selected_labels]
+        filters = {"status": select_by_status} if select_by_status else None
+        if not incident_ids and not filters:
+            st.info("Select incidents or a status to act on.")
+            return
+
+        # With both selected, only the picked incidents having those statuses match
+        target = dict(incident_ids=incident_ids or None, filters=filters, scope=self.scope)
+
+        left, right = st.columns(2)
+        with left:
+            new_status = st.selectbox(
+                "Set status to", statuses, key="bulk_incident_new_status"
+            )
+            if st.button("Apply Status", key="bulk_incident_apply"):
+                try:
+                    count = bulk_update_incidents(**target, status=new_status)
+                    st.success(f"Updated {count} incidents.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error updating incidents: {str(e)}")
+        with right:
+            if st.button(
+                "Delete Selected",
+                type="primary",
+                key="bulk_incident_delete",
+            ):
+                try:
+                    count = bulk_delete_incidents(**target, soft=True)
+                    st.success(f"Deleted {count} incidents.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error deleting incidents: {str(e)}")
+
+    def _archive_tab(self):
+        st.subheader("Deleted Incidents")
+        deleted = get_deleted_incidents(scope=self.scope)
+        if deleted.empty:
+            st.info("No deleted incidents.")
+        else:
+            st.dataframe(deleted, column_order=["deleted_at"] + self.display_columns)
+            restore_labels = build_labels(deleted, "id", "incident_type", "severity")
+            selected = st.selectbox("Incident to restore", restore_labels, key="restore_incident_select")
+            if st.button("Restore", key="restore_incident_button"):
+                restore_incident(int(selected.split(":")[0]), scope=self.scope)
+                st.success("Incident restored.")
+                st.rerun()
+
+        st.subheader("Search Archive")
+        st.caption("Closed incidents past the retention period are moved to the archive.")
+        text = st.text_input("Type or description contains", key="archive_incident_text")
+        if st.button("Search", key="archive_incident_search"):
+            results = search_archive("cyber_incidents", text=text.strip() or None, scope=self.scope)
+            if results.empty:
+                st.info("No archived incidents match.")
+            else:
+                st.dataframe(results, use_container_width=True)
+
 if __name__ == "__main__":
     CyberDashboardApp().run()
\ No newline at end of file
@@ -1,15 +1,30 @@
+import io
+from pathlib import Path
 import streamlit as st
-import pandas as pd
-from app.data.users import get_user_by_username, list_users
+from app.data.users import get_user_by_username, search_users, update_user_role
+from app.data import permissions
 from app.data.datasets import get_all_datasets_metadata
 from app.services.user_service import register_user
+from app.services.user_import import import_users, read_user_csv
+from app.services.dataset_registry import register_dataset, save_upload
+from app.services import dataset_preview
+from app.data.cache import cached
+from app.services.profiling import profile_steps
 
+# Where files uploaded through the dashboard are kept
+UPLOAD_DIR = Path("DATA/datasets")
+# Long or internal columns left out of the datasets table
+HIDDEN_DATASET_COLUMNS = {"created_at", "column_profile", "file_path"}
+USERS_PAGE_SIZE = 50
+
+@profile_steps
 class DashboardApp:
     def run(self):
         self._check_auth()
         self._render_header()
         self._resolve_user_role()
         self._render_logout()
+        self._load_data()
         st.divider()
         self._render_datasets()
         st.divider()
@@ -38,47 +53,88 @@ class DashboardApp:
             st.session_state["user_role"] = None
             st.switch_page("pages/Login.py")
 
+    def _load_data(self):
+        # Users are paged on demand below
+        with st.spinner("Loading dashboard data..."):
+            self.data = {"datasets": cached("datasets_metadata", get_all_datasets_metadata)}
+
     def _render_datasets(self):
         st.subheader("Datasets Metadata")
-        with st.spinner("Loading datasets metadata..."):
-            datasets_df = get_all_datasets_metadata()
+        datasets_df = self.data["datasets"]
 
         if datasets_df.empty:
             st.info("No datasets metadata found.")
         else:
-            display_df = datasets_df.copy()
-            if "created_at" in display_df.columns:
-                display_df = display_df.drop(columns=["created_at"])
-            display_df = display_df.fillna("N/A")
-            st.dataframe(display_df, use_container_width=True)
+            st.dataframe(
+                datasets_df,
+                column_order=[c for c in datasets_df.columns if c not in HIDDEN_DATASET_COLUMNS],
+                use_container_width=True,
+            )
+            self._render_dataset_preview(datasets_df)
+
+        if self.user_role == "admin":
+            self._render_dataset_upload()
+
+    def _render_dataset_preview(self, datasets_df):
+        previewable = datasets_df[datasets_df["file_path"].notna() | datasets_df["table_name"].notna()]
+        if previewable.empty:
+            return
+
+        with st.expander("Preview dataset"):
+            names = dict(zip(previewable["id"], previewable["dataset_name"]))
+            dataset_id = st.selectbox(
+                "Dataset", list(names), format_func=names.get, key="dataset_preview_select"
+            )
+            mode = st.radio(
+                "Rows", dataset_preview.MODES, horizontal=True, key="dataset_preview_mode"
+            )
+            try:
+                st.dataframe(dataset_preview.preview(dataset_id, mode), use_container_width=True)
+                st.write("**Column summary**")
+                st.dataframe(dataset_preview.summarize(dataset_id), use_container_width=True)
+            except (OSError, ValueError, RuntimeError) as e:
+                st.error(f"Cannot preview this dataset: {e}")
+
+    def _render_dataset_upload(self):
+        with st.expander("Register a dataset"):
+            with st.form("dataset_upload_form", clear_on_submit=True):
+                uploaded = st.file_uploader("CSV or Parquet file", type=["csv", "parquet"])
+                category = st.text_input("Category")
+                table_name = st.text_input("Load into table (optional)")
+                submitted = st.form_submit_button("Register")
+
+            if submitted and uploaded is not None:
+                try:
+                    # A fresh file per upload, so another dataset's file is never replaced
+                    path = save_upload(uploaded, uploaded.name, UPLOAD_DIR)
+                except (OSError, ValueError) as e:
+                    st.error(f"Could not save the upload: {e}")
+                    return
+                try:
+                    with st.spinner("Profiling dataset..."):
+                        profile = register_dataset(
+                            path, dataset_name=Path(uploaded.name).stem, category=category or None,
+                            uploaded_by=self.username, table_name=table_name or None,
+                        )
+                except (ValueError, RuntimeError) as e:
+                    path.unlink(missing_ok=True)
+                    st.error(str(e))
+                else:
+                    st.success(f"Registered {uploaded.name}: {profile['row_count']:,} rows.")
+                    st.rerun()
 
     def _render_user_management(self):
         if self.user_role == "admin":
             st.subheader("User Management")
 
-            st.write("**Users List**")
-            users = list_users()
-            if users:
-                users_data = []
-                for user in users:
-                    users_data.append(
-                        {
-                            "ID": user["id"],
-                            "Username": user["username"],
-                            "Role": user["role"],
-                            "Created At": user["created_at"],
-                        }
-                    )
-                users_df = pd.DataFrame(users_data)
-                st.dataframe(users_df, use_container_width=True)
-            else:
-                st.info("No users found.")
+            self._render_users_list()
 
             st.write("**Create New User**")
             with st.form("create_user_form", clear_on_submit=True):
                 new_username = st.text_input("Username")
                 new_password = st.text_input("Password", type="password")
-                new_role = st.selectbox("Role", ["user", "admin"], index=0)
+                roles = permissions.list_roles()
+                new_role = st.selectbox("Role", roles, index=roles.index("user") if "user" in roles else 0)
 
                 submitted = st.form_submit_button("Create User")
 
@@ -94,8 +150,125 @@ class DashboardApp:
                             st.rerun()
                         else:
                             st.error(message)
+
+            self._render_user_import()
+            self._render_access_control()
         else:
             st.info("User management is only available for administrators.")
 
+    def _render_users_list(self):
+        st.write("**Users List**")
+        left, middle, right = st.columns([3, 2, 1])
+        search = left.text_input("Search username", key="users_search")
+        role = middle.selectbox("Role", ["All"] + permissions.list_roles(), key="users_role_filter")
+        page = right.number_input("Page", min_value=1, value=1, step=1, key="users_page")
+
+        search, role = search or None, None if role == "All" else role
+        users_df, total = search_users(search, role, page=page, page_size=USERS_PAGE_SIZE)
+        if total == 0:
+            st.info("No users found.")
+            return
+        pages = -(-total // USERS_PAGE_SIZE)
+        if page > pages:
+            # A narrower search left fewer pages than the one selected
+            page = pages
+            users_df, total = search_users(search, role, page=page, page_size=USERS_PAGE_SIZE)
+        st.dataframe(users_df, use_container_width=True, hide_index=True)
+        st.caption(f"{total:,} users, page {page} of {pages}")
+
+    def _render_user_import(self):
+        with st.expander("Bulk import users"):
+            st.caption(
+                "CSV with a header: username, role (optional), and password or a bcrypt password_hash. "
+                "Existing usernames are skipped."
+            )
+            with st.form("user_import_form", clear_on_submit=True):
+                uploaded = st.file_uploader("Users CSV", type=["csv"])
+                submitted = st.form_submit_button("Import")
+
+            if submitted and uploaded is not None:
+                with st.spinner("Importing users..."):
+                    report = import_users(read_user_csv(io.TextIOWrapper(uploaded, encoding="utf-8")))
+                st.success(report.summary())
+                if report.skipped or report.failed:
+                    st.dataframe(report.problems(), use_container_width=True, hide_index=True)
+
+    def _render_access_control(self):
+        st.subheader("Teams & Access")
+        roles = permissions.list_roles()
+
+        with st.form("user_role_form"):
+            left, right = st.columns(2)
+            username = left.text_input("Username", key="access_role_user")
+            role = right.selectbox("Role", roles, key="access_role_value")
+            if st.form_submit_button("Change Role") and username:
+                if update_user_role(username, role):
+                    st.success(f"{username} is now {role}.")
+                    st.rerun()
+                else:
+                    st.error(f"User '{username}' not found.")
+
+        st.write("**Teams**")
+        teams = permissions.list_teams()
+        if teams.empty:
+            st.info("No teams yet.")
+        else:
+            st.dataframe(teams, use_container_width=True)
+
+        with st.form("create_team_form", clear_on_submit=True):
+            team_name = st.text_input("New team name")
+            if st.form_submit_button("Create Team") and team_name:
+                try:
+                    permissions.create_team(team_name)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error creating team: {str(e)}")
+
+        if not teams.empty:
+            team_names = dict(zip(teams["id"], teams["name"]))
+            with st.form("team_member_form"):
+                left, right = st.columns(2)
+                team_id = left.selectbox("Team", list(team_names), format_func=team_names.get, key="access_team")
+                member = right.text_input("Member username", key="access_team_member")
+                add, remove, delete = st.columns(3)
+                if add.form_submit_button("Add Member") and member:
+                    if get_user_by_username(member):
+                        permissions.add_team_member(team_id, member)
+                        st.rerun()
+                    else:
+                        st.error(f"User '{member}' not found.")
+                if remove.form_submit_button("Remove Member") and member:
+                    permissions.remove_team_member(team_id, member)
+                    st.rerun()
+                if delete.form_submit_button("Delete Team"):
+                    permissions.delete_team(team_id)
+                    st.rerun()
+
+        st.write("**Grants**")
+        grants = permissions.list_grants()
+        st.dataframe(grants, use_container_width=True)
+
+        with st.form("grant_form", clear_on_submit=True):
+            left, middle, right = st.columns(3)
+            subject_type = left.selectbox("Subject type", permissions.SUBJECT_TYPES)
+            subject = middle.text_input("Subject (role, team or username)")
+            resource = right.selectbox("Resource", list(permissions.RESOURCES))
+            left, middle, right = st.columns(3)
+            scope = left.selectbox("Scope", permissions.SCOPES)
+            column_name = middle.text_input("Column (attribute scope)")
+            value = right.text_input("Value (attribute scope)")
+            if st.form_submit_button("Add Grant") and subject:
+                try:
+                    permissions.add_grant(subject_type, subject, resource, scope, column_name, value)
+                    st.rerun()
+                except ValueError as e:
+                    st.error(str(e))
+
+        if not grants.empty:
+            grant_id = st.selectbox("Grant to remove", grants["id"].tolist(), key="access_grant_delete")
+            if st.button("Remove Grant", key="access_grant_delete_button"):
+                permissions.delete_grant(grant_id)
+                st.rerun()
+
 if __name__ == "__main__":
     DashboardApp().run()
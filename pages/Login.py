@@ -1,5 +1,5 @@
 import streamlit as st
-from app.services.user_service import login_user
+from app.services.user_service import login_user, client_address
 
 class LoginApp:
     def run(self):
@@ -19,7 +19,8 @@ class LoginApp:
 
     def _handle_login(self):
         if st.button("Login"):
-            success, message = login_user(self.username, self.password)
+            client = client_address(st.context.ip_address, st.context.headers.get("X-Forwarded-For"))
+            success, message = login_user(self.username, self.password, client=client)
             if success:
                 from app.data.users import get_user_by_username
 
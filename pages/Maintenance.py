@@ -0,0 +1,84 @@
+import streamlit as st
+from app.data.db import get_backend
+from app.data.maintenance import database_stats, table_stats, recent_runs
+from app.services.maintenance import (
+    run_maintenance, MAINTENANCE_INTERVAL, MAINTENANCE_WINDOW, MAINTENANCE_VACUUM_MIN_PAGES,
+)
+
+class MaintenanceApp:
+    def run(self):
+        self._check_auth()
+        self._render_title()
+        self._render_database()
+        st.divider()
+        self._render_tables()
+        st.divider()
+        self._render_runs()
+
+    def _check_auth(self):
+        if not st.session_state.get("logged_in"):
+            st.switch_page("pages/Login.py")
+        if st.session_state.get("user_role") != "admin":
+            st.info("Database maintenance is only available for administrators.")
+            st.stop()
+        if get_backend().name != "sqlite":
+            st.info("Storage maintenance covers the SQLite backend; PostgreSQL runs autovacuum.")
+            st.stop()
+
+    def _render_title(self):
+        st.title("Database Maintenance")
+        schedule = f"every {MAINTENANCE_INTERVAL:g}s" if MAINTENANCE_INTERVAL else "off (MAINTENANCE_INTERVAL=0)"
+        window = f", between {MAINTENANCE_WINDOW} UTC" if MAINTENANCE_WINDOW else ""
+        st.caption(f"Checkpoints, ANALYZE and incremental vacuum run {schedule}{window} while the database is quiet.")
+
+    def _render_database(self):
+        st.subheader("Database File")
+        stats = database_stats()
+        cols = st.columns(4)
+        cols[0].metric("File size", f"{stats['file_bytes'] / 1e6:,.1f} MB")
+        cols[1].metric("Pages", f"{stats['page_count']:,}", help=f"{stats['page_size']} bytes each")
+        cols[2].metric("Free pages", f"{stats['freelist_count']:,}", f"{stats['free_percent']}%", delta_color="off")
+        cols[3].metric("WAL size", f"{stats['wal_bytes'] / 1e6:,.1f} MB")
+
+        if stats["auto_vacuum"] != "incremental":
+            st.warning(
+                f"auto_vacuum is {stats['auto_vacuum']}, so free pages are reused but never returned to the "
+                "filesystem. Run `python -m app.services.maintenance enable-incremental-vacuum` once, "
+                "during a quiet period: it rewrites the whole file and blocks writers while it runs."
+            )
+        elif stats["freelist_count"] > MAINTENANCE_VACUUM_MIN_PAGES:
+            st.caption(f"More than {MAINTENANCE_VACUUM_MIN_PAGES} free pages: the next quiet run will vacuum them.")
+
+        if st.button("Run Maintenance Now", key="maintenance_run"):
+            with st.spinner("Running maintenance..."):
+                results = run_maintenance(force=True)
+            for task, result in results.items():
+                st.write(f"**{task}**: {result}")
+
+    def _render_tables(self):
+        st.subheader("Tables and Indexes")
+        st.caption(
+            "Fill is the share of each page holding data; fragmented is the share of leaf pages not stored "
+            "next to the previous one, i.e. the seeks a full scan makes. Reading every page can take a while "
+            "on a large database."
+        )
+        if st.button("Analyze Fragmentation", key="maintenance_analyze"):
+            with st.spinner("Reading page statistics..."):
+                try:
+                    st.session_state.maintenance_tables = table_stats()
+                except RuntimeError as e:
+                    st.error(str(e))
+        df = st.session_state.get("maintenance_tables")
+        if df is not None:
+            st.dataframe(df, use_container_width=True, hide_index=True)
+
+    def _render_runs(self):
+        st.subheader("Recent Runs")
+        runs = recent_runs()
+        if runs.empty:
+            st.info("No maintenance has run yet.")
+            return
+        st.dataframe(runs, use_container_width=True, hide_index=True)
+
+if __name__ == "__main__":
+    MaintenanceApp().run()
@@ -0,0 +1,67 @@
+import streamlit as st
+import pandas as pd
+from app.data.querylog import top_queries, recent_slow_queries, reset_stats, SLOW_QUERY_MS
+
+class QueryStatsApp:
+    def run(self):
+        self._check_auth()
+        self._render_title()
+        self._render_top_queries()
+        st.divider()
+        self._render_slow_queries()
+
+    def _check_auth(self):
+        if not st.session_state.get("logged_in"):
+            st.switch_page("pages/Login.py")
+        if st.session_state.get("user_role") != "admin":
+            st.info("Query statistics are only available for administrators.")
+            st.stop()
+
+    def _render_title(self):
+        st.title("Query Statistics")
+        st.caption(
+            f"Per-process totals since startup. Statements slower than {SLOW_QUERY_MS:.0f} ms are logged with their query plan."
+        )
+
+    def _render_top_queries(self):
+        st.subheader("Top Queries")
+        order_by = st.selectbox(
+            "Order by",
+            ["total_ms", "calls", "max_ms", "rows"],
+            key="query_stats_order",
+        )
+        entries = top_queries(limit=50, order_by=order_by)
+        if not entries:
+            st.info("No queries recorded yet.")
+            return
+
+        df = pd.DataFrame(
+            {
+                "Total (ms)": [round(e["total_ms"], 2) for e in entries],
+                "Calls": [e["calls"] for e in entries],
+                "Mean (ms)": [round(e["mean_ms"], 3) for e in entries],
+                "Max (ms)": [round(e["max_ms"], 2) for e in entries],
+                "Rows": [e["rows"] for e in entries],
+                "Callers": [
+                    ", ".join(f"{name} ({count})" for name, count in e["callers"].items())
+                    for e in entries
+                ],
+                "Query": [e["fingerprint"] for e in entries],
+            }
+        )
+        st.dataframe(df, use_container_width=True)
+
+        if st.button("Reset Statistics"):
+            reset_stats()
+            st.rerun()
+
+    def _render_slow_queries(self):
+        st.subheader("Recent Slow Queries")
+        slow = recent_slow_queries()
+        if not slow:
+            st.info("No slow queries recorded.")
+            return
+        st.dataframe(pd.DataFrame(slow), use_container_width=True)
+
+if __name__ == "__main__":
+    QueryStatsApp().run()
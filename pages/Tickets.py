@@ -1,52 +1,72 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
+from app.services.frames import shared_frame, frame_labels, build_labels
 from app.data.tickets import (
     get_all_tickets,
+    get_tickets_by_row_ids,
     get_ticket_by_id,
     insert_ticket as create_ticket,
     update_ticket,
     delete_ticket,
+    bulk_update_tickets,
+    bulk_delete_tickets,
+    get_deleted_tickets,
+    restore_ticket,
 )
+from app.data.archive import search_archive
+from app.data.permissions import get_policy
+from app.services.profiling import profile_steps
 
+# How often the overview polls the change log for other users' edits
+LIVE_REFRESH_SECONDS = 5
+
+@profile_steps
 class TicketsDashboardApp:
     def run(self):
         self._check_auth()
+        self._resolve_scope()
         self._render_title()
-        self._load_tickets()
-        self._render_overview()
+        self._render_live_overview()
         self._render_tabs()
 
     def _check_auth(self):
         if not st.session_state.get("logged_in"):
             st.switch_page("pages/Login.py")
 
+    def _resolve_scope(self):
+        # Row-level access: every ticket query below is filtered in SQL
+        self.scope = get_policy(st.session_state.get("username"), "it_tickets")
+
     def _render_title(self):
         st.title("Tickets Dashboard")
 
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+    def _render_live_overview(self):
+        self._load_tickets()
+        self._render_overview()
+
     def _load_tickets(self):
+        # One read-only frame per process, kept current from the change log;
+        # never copy or modify it here.
         with st.spinner("Loading tickets..."):
-            raw = get_all_tickets()
-
-        if isinstance(raw, pd.DataFrame):
-            df = raw.copy()
-        else:
-            df = pd.DataFrame(raw)
-
-        if "created_at" in df.columns:
-            df = df.drop(columns=["created_at"])
-
-        df = df.fillna("None")
+            df = shared_frame(
+                "it_tickets", get_all_tickets, get_tickets_by_row_ids, scope=self.scope
+            )
 
-        if df.empty:
+        if df.empty and self.scope.restricted:
+            # Users who may only see some rows can still create new ones
+            st.info("No tickets are visible to you yet.")
+        elif df.empty:
             st.error("No tickets found.")
             st.stop()
 
         self.df = df
+        self.labels = frame_labels(df, "ticket_id", "status", "priority")
+        self.display_columns = [c for c in df.columns if c != "created_at"]
 
     def _render_overview(self):
         st.subheader("Tickets")
-        st.dataframe(self.df)
+        st.dataframe(self.df, column_order=self.display_columns)
 
         st.subheader("Tickets by Priority")
 
@@ -57,15 +77,15 @@ class TicketsDashboardApp:
         left.metric("High Priority", high_count)
         right.metric("Total Tickets", total_count)
 
-        counts = self.df["priority"].value_counts().reset_index()
+        counts = self.df["priority"].fillna("None").value_counts().reset_index()
         counts.columns = ["priority", "count"]
         st.bar_chart(counts.set_index("priority")["count"])
 
         st.divider()
 
     def _render_tabs(self):
-        tab1, tab2, tab3 = st.tabs(
-            ["Create Ticket", "Update Ticket", "Delete Ticket"]
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(
+            ["Create Ticket", "Update Ticket", "Delete Ticket", "Bulk Actions", "Deleted & Archived"]
         )
 
         with tab1:
@@ -77,6 +97,12 @@ class TicketsDashboardApp:
         with tab3:
             self._delete_ticket_tab()
 
+        with tab4:
+            self._bulk_actions_tab()
+
+        with tab5:
+            self._archive_tab()
+
     def _create_ticket_tab(self):
         st.subheader("Create New Ticket")
 
@@ -126,10 +152,7 @@ class TicketsDashboardApp:
     def _update_ticket_tab(self):
         st.subheader("Update Ticket")
 
-        ticket_options = [
-            f"{row['ticket_id']}: {row.get('status', 'N/A')} - {row.get('priority', 'N/A')}"
-            for _, row in self.df.iterrows()
-        ]
+        ticket_options = self.labels
 
         if ticket_options:
             selected_ticket_label = st.selectbox(
@@ -140,7 +163,7 @@ class TicketsDashboardApp:
 
             if selected_ticket_label:
                 selected_ticket_id = selected_ticket_label.split(":")[0]
-                ticket = get_ticket_by_id(selected_ticket_id)
+                ticket = get_ticket_by_id(selected_ticket_id, scope=self.scope)
 
                 if ticket:
                     ticket_dict = dict(ticket)
@@ -264,6 +287,7 @@ class TicketsDashboardApp:
                                         resolved_date=str(resolved_date)
                                         if resolved_date
                                         else None,
+                                        scope=self.scope,
                                     )
                                     st.success(
                                         "Ticket updated successfully!"
@@ -279,10 +303,7 @@ class TicketsDashboardApp:
     def _delete_ticket_tab(self):
         st.subheader("Delete Ticket")
 
-        delete_options = [
-            f"{row['ticket_id']}: {row.get('status', 'N/A')} - {row.get('priority', 'N/A')}"
-            for _, row in self.df.iterrows()
-        ]
+        delete_options = self.labels
 
         if delete_options:
             selected_delete_label = st.selectbox(
@@ -293,7 +314,7 @@ class TicketsDashboardApp:
 
             if selected_delete_label:
                 selected_ticket_id = selected_delete_label.split(":")[0]
-                ticket = get_ticket_by_id(selected_ticket_id)
+                ticket = get_ticket_by_id(selected_ticket_id, scope=self.scope)
 
                 if ticket:
                     ticket_dict = dict(ticket)
@@ -319,7 +340,8 @@ class TicketsDashboardApp:
                         key="confirm_delete_ticket",
                     ):
                         try:
-                            delete_ticket(selected_ticket_id)
+                            # Soft delete: restorable until retention archives it
+                            delete_ticket(selected_ticket_id, soft=True, scope=self.scope)
                             st.success(
                                 "Ticket deleted successfully!"
                             )
@@ -331,5 +353,79 @@ class TicketsDashboardApp:
         else:
             st.info("No tickets available to delete.")
 
+    def _bulk_actions_tab(self):
+        st.subheader("Bulk Actions")
+
+        statuses = ["Open", "In Progress", "Resolved", "Closed"]
+        select_by_status = st.multiselect(
+            "Select all tickets with status",
+            statuses,
+            key="bulk_ticket_status_filter",
+        )
+
+        selected_labels = st.multiselect(
+            "Or pick individual tickets",
+            options=self.labels,
+            key="bulk_ticket_select",
+        )
+
+        ticket_ids = [label.split(":")[0] for label in selected_labels]
+        filters = {"status": select_by_status} if select_by_status else None
+        if not ticket_ids and not filters:
+            st.info("Select tickets or a status to act on.")
+            return
+
+        # With both selected, only the picked tickets having those statuses match
+        target = dict(ticket_ids=ticket_ids or None, filters=filters, scope=self.scope)
+
+        left, right = st.columns(2)
+        with left:
+            new_status = st.selectbox(
+                "Set status to", statuses, key="bulk_ticket_new_status"
+            )
+            if st.button("Apply Status", key="bulk_ticket_apply"):
+                try:
+                    count = bulk_update_tickets(**target, status=new_status)
+                    st.success(f"Updated {count} tickets.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error updating tickets: {str(e)}")
+        with right:
+            if st.button(
+                "Delete Selected",
+                type="primary",
+                key="bulk_ticket_delete",
+            ):
+                try:
+                    count = bulk_delete_tickets(**target, soft=True)
+                    st.success(f"Deleted {count} tickets.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error deleting tickets: {str(e)}")
+
+    def _archive_tab(self):
+        st.subheader("Deleted Tickets")
+        deleted = get_deleted_tickets(scope=self.scope)
+        if deleted.empty:
+            st.info("No deleted tickets.")
+        else:
+            st.dataframe(deleted, column_order=["deleted_at"] + self.display_columns)
+            restore_labels = build_labels(deleted, "ticket_id", "status", "priority")
+            selected = st.selectbox("Ticket to restore", restore_labels, key="restore_ticket_select")
+            if st.button("Restore", key="restore_ticket_button"):
+                restore_ticket(selected.split(":")[0], scope=self.scope)
+                st.success("Ticket restored.")
+                st.rerun()
+
+        st.subheader("Search Archive")
+        st.caption("Closed and resolved tickets past the retention period are moved to the archive.")
+        text = st.text_input("Ticket ID, subject or description contains", key="archive_ticket_text")
+        if st.button("Search", key="archive_ticket_search"):
+            results = search_archive("it_tickets", text=text.strip() or None, scope=self.scope)
+            if results.empty:
+                st.info("No archived tickets match.")
+            else:
+                st.dataframe(results, use_container_width=True)
+
 if __name__ == "__main__":
     TicketsDashboardApp().run()